@@ -1,3 +1,10 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import ExportJob
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "kind", "format", "status", "rows_written", "total_rows", "created_by", "created_at")
+    list_filter = ("kind", "format", "status")
+    readonly_fields = ("rows_written", "total_rows", "size", "error", "started_at", "finished_at")
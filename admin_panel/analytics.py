@@ -1,39 +1,49 @@
 """
 Analytics and reporting service for admin dashboard.
+
+Sales, category, product and payment figures are read from the daily rollup
+tables (see admin_panel.rollups), so their cost grows with the number of
+days shown rather than the number of orders.
 """
 from collections import defaultdict
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from decimal import Decimal
 from typing import Any
 
-from django.db.models import Count, Sum, Avg, Q, F
+from django.db.models import Count, Sum, Avg, Q
 from django.utils import timezone
 
-from orders.models import Order, OrderItem, Payment
+from orders.models import Order
 from store.models import Product, Category
 from accounts.models import User
 
+from .models import DailyCategorySales, DailyPaymentStats, DailyProductSales, DailySales
+
 
 class AnalyticsService:
     """Service for aggregating analytics data."""
 
+    @staticmethod
+    def _window(days: int) -> date:
+        """First day of the last ``days`` days, today being the last of them."""
+        return timezone.localdate() - timedelta(days=days - 1)
+
     @staticmethod
     def get_sales_overview(days: int = 30) -> dict:
         """Get sales overview for the last N days."""
-        start_date = timezone.now() - timedelta(days=days)
-        orders = Order.objects.filter(created_at__gte=start_date)
-
-        total_sales = orders.aggregate(total=Sum("total"))["total"] or Decimal("0")
-        order_count = orders.count()
-        avg_order_value = orders.aggregate(avg=Avg("total"))["avg"] or Decimal("0")
-
-        # Compare with previous period
-        prev_start = start_date - timedelta(days=days)
-        prev_orders = Order.objects.filter(
-            created_at__gte=prev_start, created_at__lt=start_date
+        start = AnalyticsService._window(days)
+        current, previous = Q(date__gte=start), Q(date__lt=start)
+        sums = DailySales.objects.filter(date__gte=start - timedelta(days=days)).aggregate(
+            sales=Sum("revenue", filter=current),
+            orders=Sum("order_count", filter=current),
+            prev_sales=Sum("revenue", filter=previous),
+            prev_orders=Sum("order_count", filter=previous),
         )
-        prev_total = prev_orders.aggregate(total=Sum("total"))["total"] or Decimal("0")
-        prev_count = prev_orders.count()
+        total_sales = sums["sales"] or Decimal("0")
+        order_count = sums["orders"] or 0
+        prev_total = sums["prev_sales"] or Decimal("0")
+        prev_count = sums["prev_orders"] or 0
+        avg_order_value = (total_sales / order_count).quantize(Decimal("0.01")) if order_count else Decimal("0")
 
         sales_growth = (
             ((total_sales - prev_total) / prev_total * 100) if prev_total > 0 else 0
@@ -53,30 +63,24 @@ class AnalyticsService:
     @staticmethod
     def get_daily_sales_chart_data(days: int = 30) -> dict:
         """Get daily sales data for charting."""
-        from django.db.models.functions import TruncDate
-        
-        start_date = timezone.now() - timedelta(days=days)
-        orders = Order.objects.filter(created_at__gte=start_date).annotate(
-            day=TruncDate("created_at")
-        ).values("day").annotate(
-            total=Sum("total"),
-            count=Count("id")
-        ).order_by("day")
+        start = AnalyticsService._window(days)
+        rows = {
+            row["date"]: row
+            for row in DailySales.objects.filter(date__gte=start).values("date", "revenue", "order_count")
+        }
 
         labels = []
         sales_data = []
         orders_data = []
 
         # Fill in all days (including zeros)
-        current_date = start_date.date()
-        end_date = timezone.now().date()
-        orders_dict = {item["day"]: item for item in orders}
-
+        current_date = start
+        end_date = timezone.localdate()
         while current_date <= end_date:
             labels.append(current_date.strftime("%Y-%m-%d"))
-            day_data = orders_dict.get(current_date)
-            sales_data.append(float(day_data["total"]) if day_data else 0)
-            orders_data.append(day_data["count"] if day_data else 0)
+            day_data = rows.get(current_date)
+            sales_data.append(float(day_data["revenue"]) if day_data else 0)
+            orders_data.append(day_data["order_count"] if day_data else 0)
             current_date += timedelta(days=1)
 
         return {
@@ -88,13 +92,11 @@ class AnalyticsService:
     @staticmethod
     def get_category_sales_data(days: int = 30) -> dict:
         """Get sales by category."""
-        start_date = timezone.now() - timedelta(days=days)
-        items = OrderItem.objects.filter(
-            order__created_at__gte=start_date
-        ).values("product__category__name").annotate(
-            total=Sum(F("quantity") * F("unit_price")),
+        items = DailyCategorySales.objects.filter(
+            date__gte=AnalyticsService._window(days)
+        ).values("category__name").annotate(
+            total=Sum("revenue"),
             quantity=Sum("quantity"),
-            count=Count("id")
         ).order_by("-total")
 
         labels = []
@@ -102,7 +104,7 @@ class AnalyticsService:
         quantity_data = []
 
         for item in items[:10]:  # Top 10 categories
-            labels.append(item["product__category__name"] or "Uncategorized")
+            labels.append(item["category__name"] or "Uncategorized")
             sales_data.append(float(item["total"] or 0))
             quantity_data.append(item["quantity"] or 0)
 
@@ -115,17 +117,17 @@ class AnalyticsService:
     @staticmethod
     def get_top_products(days: int = 30, limit: int = 10) -> list[dict]:
         """Get top selling products."""
-        start_date = timezone.now() - timedelta(days=days)
-        items = OrderItem.objects.filter(
-            order__created_at__gte=start_date
+        items = DailyProductSales.objects.filter(
+            date__gte=AnalyticsService._window(days)
         ).values(
             "product__id",
             "product__title",
             "product__slug"
         ).annotate(
-            total_revenue=Sum(F("quantity") * F("unit_price")),
+            total_revenue=Sum("revenue"),
             total_quantity=Sum("quantity"),
-            order_count=Count("order", distinct=True)
+            # An order falls on one day, so per-day counts add up to distinct orders.
+            total_orders=Sum("order_count"),
         ).order_by("-total_quantity")[:limit]
 
         return [
@@ -135,7 +137,7 @@ class AnalyticsService:
                 "slug": item["product__slug"],
                 "revenue": float(item["total_revenue"] or 0),
                 "quantity": item["total_quantity"] or 0,
-                "orders": item["order_count"],
+                "orders": item["total_orders"],
             }
             for item in items
         ]
@@ -143,13 +145,12 @@ class AnalyticsService:
     @staticmethod
     def get_payment_method_stats(days: int = 30) -> dict:
         """Get payment method distribution."""
-        start_date = timezone.now() - timedelta(days=days)
-        payments = Payment.objects.filter(
-            order__created_at__gte=start_date
+        payments = DailyPaymentStats.objects.filter(
+            date__gte=AnalyticsService._window(days)
         ).values("provider").annotate(
-            count=Count("id"),
-            total=Sum("amount")
-        ).order_by("-total")
+            total_count=Sum("count"),
+            total_amount=Sum("total")
+        ).filter(total_count__gt=0).order_by("-total_amount")
 
         labels = []
         counts = []
@@ -157,8 +158,8 @@ class AnalyticsService:
 
         for payment in payments:
             labels.append(payment["provider"].title())
-            counts.append(payment["count"])
-            totals.append(float(payment["total"] or 0))
+            counts.append(payment["total_count"])
+            totals.append(float(payment["total_amount"] or 0))
 
         return {
             "labels": labels,
@@ -0,0 +1,76 @@
+"""
+Single-range ``Range`` support for downloading large stored files.
+
+``ranged_file_response`` answers ``Range: bytes=a-b`` (and the ``a-`` and
+``-n`` forms) with 206 Partial Content, so a client can resume a download
+where it stopped. ``If-Range`` with a stale ETag, several ranges or a
+malformed header fall back to the whole file, as RFC 9110 allows; a range
+starting past the end is answered with 416.
+"""
+import re
+
+from django.http import HttpResponse, StreamingHttpResponse
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+READ_SIZE = 64 * 1024
+
+
+def parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """
+    The inclusive ``(first, last)`` byte positions requested by ``header``,
+    ``None`` to send the whole file, or ``(size, size)`` when it cannot be
+    satisfied.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if not first:
+        length = int(last)
+        if not length or not size:
+            return size, size
+        return max(size - length, 0), size - 1
+    first = int(first)
+    last = size - 1 if not last else min(int(last), size - 1)
+    if first >= size:
+        return size, size
+    if last < first:
+        return None
+    return first, last
+
+
+def _read(file, length: int):
+    try:
+        while length > 0:
+            data = file.read(min(READ_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        file.close()
+
+
+def ranged_file_response(request, file, size: int, filename: str, content_type: str, etag: str):
+    """Stream the open binary ``file`` of ``size`` bytes, or the part of it ``request`` asks for."""
+    first, last = 0, size - 1
+    requested = request.headers.get("Range")
+    if requested and request.headers.get("If-Range", etag) == etag:
+        span = parse_range(requested, size)
+        if span == (size, size):
+            file.close()
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+        if span is not None:
+            first, last = span
+    file.seek(first)
+    response = StreamingHttpResponse(_read(file, last - first + 1), content_type=content_type)
+    if (first, last) != (0, size - 1):
+        response.status_code = 206
+        response["Content-Range"] = f"bytes {first}-{last}/{size}"
+    response["Content-Length"] = str(last - first + 1)
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
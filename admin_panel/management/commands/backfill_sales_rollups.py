@@ -0,0 +1,42 @@
+"""
+Management command to (re)build the dashboard's daily sales rollups from the
+order, order item and payment tables.
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from admin_panel.rollups import rebuild_rollups
+from orders.models import Order
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily sales rollups, a batch of days at a time"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", help="First day (YYYY-MM-DD); defaults to the first order's day")
+        parser.add_argument("--until", help="Last day (YYYY-MM-DD); defaults to today")
+        parser.add_argument("--batch-days", type=int, default=31)
+
+    def handle(self, *args, **options):
+        last = parse_date(options["until"]) if options["until"] else timezone.localdate()
+        if options["since"]:
+            first = parse_date(options["since"])
+        else:
+            oldest = Order.objects.aggregate(oldest=Min("created_at"))["oldest"]
+            if oldest is None:
+                self.stdout.write("No orders to roll up")
+                return
+            first = timezone.localdate(oldest)
+        if first is None or last is None or first > last:
+            raise CommandError("Give --since and --until as YYYY-MM-DD, in order.")
+
+        days = 0
+        while first <= last:
+            batch_last = min(first + timedelta(days=options["batch_days"] - 1), last)
+            days += rebuild_rollups(first, batch_last)
+            first = batch_last + timedelta(days=1)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt sales rollups for {days} day(s)"))
@@ -1,3 +1,103 @@
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class ExportJob(models.Model):
+    """A CSV or Parquet export written in the background; see admin_panel.exports."""
+
+    class Kind(models.TextChoices):
+        ORDERS = "orders", "Orders"
+        PRODUCTS = "products", "Products"
+
+    class Format(models.TextChoices):
+        CSV = "csv", "CSV"
+        PARQUET = "parquet", "Parquet"
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        RUNNING = "running", "Running"
+        COMPLETED = "completed", "Completed"
+        FAILED = "failed", "Failed"
+
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, related_name="export_jobs", null=True, on_delete=models.SET_NULL
+    )
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    format = models.CharField(max_length=10, choices=Format.choices, default=Format.CSV)
+    # Orders only: export orders created in the last ``days`` days.
+    days = models.PositiveIntegerField(default=30)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    total_rows = models.PositiveIntegerField(default=0)
+    rows_written = models.PositiveIntegerField(default=0)
+    file = models.FileField(upload_to="exports/", blank=True)
+    size = models.PositiveBigIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} export #{self.pk}"
+
+    @property
+    def progress(self) -> float:
+        if self.status == self.Status.COMPLETED:
+            return 1.0
+        if not self.total_rows:
+            return 0.0
+        return min(self.rows_written / self.total_rows, 1.0)
+
+    @property
+    def filename(self) -> str:
+        return f"{self.kind}_{self.created_at:%Y-%m-%d}_{self.pk}.{self.format}"
+
+
+# Daily rollups read by AnalyticsService; maintained by admin_panel.rollups.
+
+
+class DailySales(models.Model):
+    date = models.DateField(unique=True)
+    order_count = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name_plural = "daily sales"
+
+
+class DailyCategorySales(models.Model):
+    date = models.DateField()
+    category = models.ForeignKey("store.Category", related_name="+", on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ("date", "category")
+        verbose_name_plural = "daily category sales"
+
+
+class DailyProductSales(models.Model):
+    date = models.DateField()
+    product = models.ForeignKey("store.Product", related_name="+", on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    order_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("date", "product")
+        verbose_name_plural = "daily product sales"
+
+
+class DailyPaymentStats(models.Model):
+    """Payments by the day their order was placed, as the dashboard has always grouped them."""
+
+    date = models.DateField()
+    provider = models.CharField(max_length=30)
+    count = models.IntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ("date", "provider")
+        verbose_name_plural = "daily payment stats"
@@ -0,0 +1,139 @@
+"""
+Daily sales rollups behind the dashboard.
+
+``DailySales``, ``DailyCategorySales``, ``DailyProductSales`` and
+``DailyPaymentStats`` hold one row per day (and category, product or payment
+provider), so ``AnalyticsService`` reads a row per day in the window instead
+of aggregating every order in it.
+
+They are kept current incrementally: ``admin_panel.signals`` publishes a task
+after each new order and each payment write, and ``add_order`` /
+``add_payment`` add the amounts with ``UPDATE ... SET x = x + n`` on the
+affected rows. ``rebuild_rollups`` recomputes a date range from the raw
+tables; the ``backfill_sales_rollups`` command uses it for history, and a
+nightly task re-derives the last closed days to absorb what increments do not
+see (orders edited or deleted in the admin, lost tasks).
+"""
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from orders.models import Order, OrderItem, Payment
+
+from .models import DailyCategorySales, DailyPaymentStats, DailyProductSales, DailySales
+
+ROLLUPS = (DailySales, DailyCategorySales, DailyProductSales, DailyPaymentStats)
+
+
+def _increment(model, day: date, key_field: str, deltas: dict):
+    """Add ``deltas`` (``{key: {field: amount}}``) to ``model``'s rows for ``day``, creating missing ones."""
+    if not deltas:
+        return
+    model.objects.bulk_create(
+        [model(**{"date": day, key_field: key}) for key in deltas], ignore_conflicts=True
+    )
+    fields = {field for amounts in deltas.values() for field in amounts}
+    model.objects.filter(date=day, **{f"{key_field}__in": list(deltas)}).update(
+        **{
+            field: F(field) + Case(
+                *(When(**{key_field: key}, then=Value(amounts.get(field, 0))) for key, amounts in deltas.items()),
+                default=Value(0),
+                output_field=model._meta.get_field(field),
+            )
+            for field in fields
+        }
+    )
+
+
+def _order_day(order_id: int) -> tuple[date, Decimal] | None:
+    row = Order.objects.filter(pk=order_id).values_list("created_at", "total").first()
+    if row is None:
+        return None
+    return timezone.localdate(row[0]), row[1]
+
+
+@transaction.atomic
+def add_order(order_id: int):
+    """Count a newly placed order and its lines into its day's rollups."""
+    placed = _order_day(order_id)
+    if placed is None:
+        return
+    day, total = placed
+    categories = defaultdict(lambda: {"quantity": 0, "revenue": Decimal("0")})
+    products = defaultdict(lambda: {"quantity": 0, "revenue": Decimal("0"), "order_count": 1})
+    lines = OrderItem.objects.filter(order_id=order_id).values_list(
+        "product_id", "product__category_id", "quantity", "unit_price"
+    )
+    for product_id, category_id, quantity, unit_price in lines:
+        for row in (categories[category_id], products[product_id]):
+            row["quantity"] += quantity
+            row["revenue"] += quantity * unit_price
+    _increment(DailySales, day, "date", {day: {"order_count": 1, "revenue": total}})
+    _increment(DailyCategorySales, day, "category_id", categories)
+    _increment(DailyProductSales, day, "product_id", products)
+
+
+@transaction.atomic
+def add_payment(order_id: int, provider: str, count: int, amount: Decimal):
+    """Add ``count`` payments worth ``amount`` (either may be negative) to the order's day."""
+    placed = _order_day(order_id)
+    if placed is None:
+        return
+    day = placed[0]
+    _increment(DailyPaymentStats, day, "provider", {provider: {"count": count, "total": Decimal(amount)}})
+
+
+def _bounds(first: date, last: date) -> tuple[datetime, datetime]:
+    zone = timezone.get_current_timezone()
+    return (
+        datetime.combine(first, time.min, tzinfo=zone),
+        datetime.combine(last + timedelta(days=1), time.min, tzinfo=zone),
+    )
+
+
+@transaction.atomic
+def rebuild_rollups(first: date, last: date) -> int:
+    """Recompute every rollup row from ``first`` to ``last`` (inclusive); returns the number of days."""
+    start, end = _bounds(first, last)
+    placed = {"order__created_at__gte": start, "order__created_at__lt": end}
+    orders = Order.objects.filter(created_at__gte=start, created_at__lt=end).annotate(day=TruncDate("created_at"))
+    items = OrderItem.objects.filter(**placed).annotate(day=TruncDate("order__created_at"))
+    payments = Payment.objects.filter(**placed).annotate(day=TruncDate("order__created_at"))
+    line_revenue = Sum(F("quantity") * F("unit_price"))
+
+    for model in ROLLUPS:
+        model.objects.filter(date__gte=first, date__lte=last).delete()
+    DailySales.objects.bulk_create(
+        DailySales(date=row["day"], order_count=row["orders"], revenue=row["sales"])
+        for row in orders.values("day").annotate(orders=Count("pk"), sales=Sum("total")).order_by()
+    )
+    DailyCategorySales.objects.bulk_create(
+        DailyCategorySales(
+            date=row["day"], category_id=row["product__category"], quantity=row["units"], revenue=row["sales"]
+        )
+        for row in items.values("day", "product__category")
+        .annotate(units=Sum("quantity"), sales=line_revenue)
+        .order_by()
+    )
+    DailyProductSales.objects.bulk_create(
+        DailyProductSales(
+            date=row["day"],
+            product_id=row["product"],
+            quantity=row["units"],
+            revenue=row["sales"],
+            order_count=row["orders"],
+        )
+        for row in items.values("day", "product")
+        .annotate(units=Sum("quantity"), sales=line_revenue, orders=Count("order", distinct=True))
+        .order_by()
+    )
+    DailyPaymentStats.objects.bulk_create(
+        DailyPaymentStats(date=row["day"], provider=row["provider"], count=row["payments"], total=row["paid"])
+        for row in payments.values("day", "provider").annotate(payments=Count("pk"), paid=Sum("amount")).order_by()
+    )
+    return (last - first).days + 1
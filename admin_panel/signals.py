@@ -0,0 +1,41 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from orders.dispatch import enqueue
+from orders.models import Order, Payment
+
+from .tasks import add_order_to_rollups, add_payment_to_rollups
+
+
+def _payment_delta(payment: Payment, count: int, amount):
+    if count or amount:
+        enqueue(add_payment_to_rollups.si(payment.order_id, str(payment.provider), count, str(amount)))
+
+
+@receiver(post_save, sender=Order)
+def roll_up_new_order(sender, instance, created=False, raw=False, **kwargs):
+    # The task runs after commit, by which time the order's items exist too.
+    if created and not raw:
+        enqueue(add_order_to_rollups.si(instance.pk))
+
+
+@receiver(pre_save, sender=Payment)
+def remember_previous_amount(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or instance.pk is None or (update_fields is not None and "amount" not in update_fields):
+        return
+    instance._previous_amount = Payment.objects.filter(pk=instance.pk).values_list("amount", flat=True).first()
+
+
+@receiver(post_save, sender=Payment)
+def roll_up_payment(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        _payment_delta(instance, 1, instance.amount)
+    elif getattr(instance, "_previous_amount", None) is not None:
+        _payment_delta(instance, 0, instance.amount - instance._previous_amount)
+
+
+@receiver(post_delete, sender=Payment)
+def roll_up_deleted_payment(sender, instance, **kwargs):
+    _payment_delta(instance, -1, -instance.amount)
@@ -0,0 +1,47 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+
+from .exports import run_export
+from .models import ExportJob
+from .rollups import add_order, add_payment, rebuild_rollups
+
+
+@shared_task
+def run_export_job(job_id: int):
+    job = ExportJob.objects.filter(pk=job_id, status=ExportJob.Status.PENDING).first()
+    if job is None:
+        return None
+    run_export(job)
+    return job.rows_written
+
+
+@shared_task
+def purge_export_jobs():
+    cutoff = timezone.now() - timedelta(days=settings.EXPORT_JOB_RETENTION_DAYS)
+    jobs = list(ExportJob.objects.filter(created_at__lt=cutoff))
+    for job in jobs:
+        if job.file:
+            job.file.delete(save=False)
+    ExportJob.objects.filter(pk__in=[job.pk for job in jobs]).delete()
+    return len(jobs)
+
+
+@shared_task
+def add_order_to_rollups(order_id: int):
+    add_order(order_id)
+
+
+@shared_task
+def add_payment_to_rollups(order_id: int, provider: str, count: int, amount: str):
+    add_payment(order_id, provider, count, Decimal(amount))
+
+
+@shared_task
+def rebuild_recent_rollups(days: int = 2):
+    """Re-derive the last ``days`` closed days; today is left to the increments."""
+    yesterday = timezone.localdate() - timedelta(days=1)
+    return rebuild_rollups(yesterday - timedelta(days=days - 1), yesterday)
@@ -1,18 +1,37 @@
 """
 Tests for admin panel - analytics, dashboard, exports
 """
+import shutil
+from io import StringIO
+import tempfile
 from decimal import Decimal
+from unittest import skipUnless
+from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase, Client
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.core.management import call_command
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 from datetime import timedelta
 
 from accounts.models import Address
 from orders.models import Order, OrderItem, Payment
-from store.models import Category, Product
+from store.models import Category, Product, Tag
 from .analytics import AnalyticsService
+from .downloads import parse_range
+from .exports import GroupConcat
+from .models import DailyPaymentStats, DailySales, ExportJob
+from .rollups import rebuild_rollups
+from .tasks import run_export_job
+from .views import MAX_EXPORT_DAYS
+
+try:
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover
+    pyarrow = None
 
 User = get_user_model()
 
@@ -246,11 +265,267 @@ class ExportViewsTest(TestCase):
         response = self.client.get(reverse("admin_panel:export_orders"))
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response["Content-Type"], "text/csv")
-        self.assertIn("Order ID", response.content.decode())
+        self.assertIn("Order ID", b"".join(response.streaming_content).decode())
 
     def test_export_products_csv(self):
         response = self.client.get(reverse("admin_panel:export_products"))
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response["Content-Type"], "text/csv")
-        self.assertIn("ID", response.content.decode())
-        self.assertIn("Test Product", response.content.decode())
+        content = b"".join(response.streaming_content).decode()
+        self.assertIn("ID", content)
+        self.assertIn("Test Product", content)
+
+
+class StreamingExportTest(TestCase):
+    """CSV exports stream from a fixed number of queries, with items, payment and tags folded in by SQL."""
+
+    def setUp(self):
+        self.staff = User.objects.create_user(
+            username="exporter", email="exporter@example.com", password="x", is_staff=True,
+            first_name="Ex", last_name="Porter",
+        )
+        self.client.force_login(self.staff)
+        address = Address.objects.create(
+            user=self.staff, full_name="Ex Porter", phone_number="9999999999",
+            address_line_1="1 Export Road", city="Pune", state="MH", postal_code="411001",
+        )
+        category = Category.objects.create(name="Books", slug="books")
+        self.products = [
+            Product.objects.create(
+                category=category, title=f"Book {number}", slug=f"book-{number}", sku=f"BOOK-{number}",
+                description="", price=Decimal("5.00"), stock=3,
+            )
+            for number in range(3)
+        ]
+        self.products[0].tags.add(Tag.objects.create(name="fiction", slug="fiction"))
+        for number in range(3):
+            order = Order.objects.create(
+                user=self.staff, shipping_address=address, subtotal=Decimal("10"), total=Decimal("10")
+            )
+            for product in self.products[:2]:
+                OrderItem.objects.create(
+                    order=order, product=product, product_title=product.title, quantity=2, unit_price=product.price
+                )
+            Payment.objects.create(order=order, provider="stripe", amount=10)
+            Payment.objects.create(order=order, provider="razorpay", amount=10)
+
+    def _export(self, name):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse(f"admin_panel:{name}"))
+            lines = b"".join(response.streaming_content).decode().splitlines()
+        queries = [q for q in context.captured_queries if "SAVEPOINT" not in q["sql"]]
+        return lines, queries
+
+    def test_orders_export(self):
+        lines, queries = self._export("export_orders")
+        self.assertEqual(len(lines), 4)
+        row = lines[1].split(",", 1)[1]
+        self.assertIn("Ex Porter,exporter@example.com", row)
+        self.assertIn("razorpay", row)
+        self.assertIn("Book 0 x2", row)
+        self.assertIn("1 Export Road, Pune, MH 411001", row)
+        # Session and user for the staff check, then the export itself.
+        self.assertLessEqual(len(queries), 3)
+
+    def test_products_export(self):
+        lines, queries = self._export("export_products")
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[1].endswith(",fiction"))
+        self.assertTrue(lines[2].endswith(","))
+        self.assertLessEqual(len(queries), 3)
+
+    def test_group_concat_mysql_separator_is_a_literal(self):
+        query = Product.objects.values("category").annotate(titles=GroupConcat("title", separator="'; 5%")).query
+        compiler = query.get_compiler(connection=connection)
+        sql, params = query.annotations["titles"].as_mysql(compiler, connection)
+        self.assertTrue(sql.startswith("GROUP_CONCAT("), sql)
+        self.assertTrue(sql.endswith(" SEPARATOR '''; 5%%')"), sql)
+        self.assertEqual(list(params), [])
+
+
+@patch("orders.dispatch.publish")
+class ExportJobTest(TestCase):
+    """Background exports record progress and serve their file with Range support."""
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.staff = User.objects.create_user(
+            username="jobs", email="jobs@example.com", password="x", is_staff=True
+        )
+        self.client.force_login(self.staff)
+        category = Category.objects.create(name="Games", slug="games")
+        for number in range(5):
+            Product.objects.create(
+                category=category, title=f"Game {number}", slug=f"game-{number}", sku=f"GAME-{number}",
+                description="", price=Decimal("20.00"), stock=1,
+            )
+
+    def _run_job(self, publish, **data):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("admin_panel:export_jobs"), {"kind": "products", **data})
+        self.assertEqual(response.status_code, 202)
+        signature = publish.call_args.args[0][0]
+        run_export_job(*signature.args)
+        return ExportJob.objects.get(pk=response.json()["id"])
+
+    def test_job_writes_file_and_reports_progress(self, publish):
+        job = self._run_job(publish)
+        data = self.client.get(reverse("admin_panel:export_job", args=[job.pk])).json()
+        self.assertEqual(
+            (data["status"], data["rows_written"], data["total_rows"], data["progress"]), ("completed", 5, 5, 1.0)
+        )
+        response = self.client.get(data["download_url"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        content = b"".join(response.streaming_content)
+        self.assertEqual(len(content), job.size)
+        self.assertEqual(content.decode().count("\n"), 6)
+
+    def test_range_download_resumes(self, publish):
+        job = self._run_job(publish)
+        url = reverse("admin_panel:export_job_download", args=[job.pk])
+        whole = b"".join(self.client.get(url).streaming_content)
+        response = self.client.get(url, headers={"Range": "bytes=10-"})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes 10-{job.size - 1}/{job.size}")
+        self.assertEqual(b"".join(response.streaming_content), whole[10:])
+
+        stale = self.client.get(url, headers={"Range": "bytes=10-", "If-Range": '"old"'})
+        self.assertEqual(stale.status_code, 200)
+        self.assertEqual(self.client.get(url, headers={"Range": f"bytes={job.size}-"}).status_code, 416)
+
+    def test_parse_range(self, publish):
+        self.assertEqual(parse_range("bytes=0-99", 50), (0, 49))
+        self.assertEqual(parse_range("bytes=-10", 50), (40, 49))
+        self.assertEqual(parse_range("bytes=60-", 50), (50, 50))
+        self.assertIsNone(parse_range("bytes=0-1,5-6", 50))
+        self.assertIsNone(parse_range("bytes=9-3", 50))
+
+    def test_invalid_days_are_rejected(self, publish):
+        for days in ("abc", "", "1.5"):
+            response = self.client.post(reverse("admin_panel:export_jobs"), {"kind": "orders", "days": days})
+            self.assertEqual(response.status_code, 400, days)
+        self.assertFalse(ExportJob.objects.exists())
+
+    def test_days_are_clamped(self, publish):
+        for days, expected in (("-5", 1), ("0", 1), ("7", 7), ("99999999999", MAX_EXPORT_DAYS)):
+            response = self.client.post(reverse("admin_panel:export_jobs"), {"kind": "orders", "days": days})
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(ExportJob.objects.get(pk=response.json()["id"]).days, expected)
+
+    @skipUnless(pyarrow, "Parquet exports need pyarrow")
+    def test_parquet_job_writes_table(self, publish):
+        job = self._run_job(publish, format="parquet")
+        self.assertEqual(job.status, ExportJob.Status.COMPLETED)
+        with job.file.open("rb") as parquet:
+            table = pyarrow.parquet.read_table(parquet)
+        self.assertEqual(table.num_rows, 5)
+        self.assertEqual(table.column_names[:2], ["ID", "Title"])
+        self.assertEqual(sorted(table.column("Title").to_pylist()), [f"Game {number}" for number in range(5)])
+
+    def test_unavailable_format_is_rejected(self, publish):
+        with patch("admin_panel.views.formats", return_value=["csv"]):
+            response = self.client.post(reverse("admin_panel:export_jobs"), {"kind": "orders", "format": "parquet"})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ExportJob.objects.exists())
+
+
+@patch("orders.dispatch.publish")
+class SalesRollupTest(TestCase):
+    """Dashboard figures come from daily rollups kept current by order and payment events."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="roller", email="roller@example.com", password="x")
+        self.address = Address.objects.create(
+            user=self.user, full_name="Roller", phone_number="9999999999",
+            address_line_1="1 Rollup Road", city="Pune", state="MH", postal_code="411001",
+        )
+        self.category = Category.objects.create(name="Toys", slug="toys")
+        self.products = [
+            Product.objects.create(
+                category=self.category, title=f"Toy {number}", slug=f"toy-{number}", sku=f"TOY-{number}",
+                description="", price=Decimal("4.00"), stock=50,
+            )
+            for number in range(2)
+        ]
+
+    def _place(self, publish, quantities, provider="stripe"):
+        publish.side_effect = lambda signatures: [signature.apply() for signature in signatures]
+        with self.captureOnCommitCallbacks(execute=True):
+            total = sum(Decimal("4.00") * quantity for quantity in quantities)
+            order = Order.objects.create(user=self.user, shipping_address=self.address, subtotal=total, total=total)
+            for product, quantity in zip(self.products, quantities):
+                OrderItem.objects.create(
+                    order=order, product=product, product_title=product.title, quantity=quantity,
+                    unit_price=product.price,
+                )
+            payment = Payment.objects.create(order=order, provider=provider, amount=total)
+        return order, payment
+
+    def _snapshot(self):
+        return (
+            AnalyticsService.get_sales_overview(days=7),
+            AnalyticsService.get_category_sales_data(days=7),
+            AnalyticsService.get_top_products(days=7),
+            AnalyticsService.get_payment_method_stats(days=7),
+        )
+
+    def test_orders_and_payments_roll_up(self, publish):
+        self._place(publish, [2, 1])
+        self._place(publish, [1, 0], provider="razorpay")
+        overview, categories, top, payments = self._snapshot()
+        self.assertEqual((overview["total_sales"], overview["order_count"]), (Decimal("16.00"), 2))
+        self.assertEqual(overview["avg_order_value"], Decimal("8.00"))
+        self.assertEqual(categories["quantities"], [4])
+        self.assertEqual([(row["title"], row["quantity"], row["orders"]) for row in top][0], ("Toy 0", 3, 2))
+        self.assertEqual(dict(zip(payments["labels"], payments["counts"])), {"Stripe": 1, "Razorpay": 1})
+        self.assertEqual(AnalyticsService.get_daily_sales_chart_data(days=7)["orders"][-1], 2)
+
+    def test_payment_changes_adjust_totals(self, publish):
+        _, payment = self._place(publish, [1, 1])
+        with self.captureOnCommitCallbacks(execute=True):
+            payment.amount = Decimal("5.00")
+            payment.save(update_fields=["amount"])
+        self.assertEqual(AnalyticsService.get_payment_method_stats(days=7)["totals"], [5.0])
+        with self.captureOnCommitCallbacks(execute=True):
+            payment.delete()
+        self.assertEqual(AnalyticsService.get_payment_method_stats(days=7)["labels"], [])
+
+    def test_rebuild_matches_increments(self, publish):
+        self._place(publish, [2, 1])
+        self._place(publish, [0, 3], provider="razorpay")
+        incremental = self._snapshot()
+        today = timezone.localdate()
+        rebuild_rollups(today - timedelta(days=1), today)
+        self.assertEqual(self._snapshot(), incremental)
+        self.assertEqual(DailySales.objects.get().order_count, 2)
+
+        DailyPaymentStats.objects.all().delete()
+        call_command("backfill_sales_rollups", stdout=StringIO())
+        self.assertEqual(self._snapshot(), incremental)
+
+    def test_flat_sales_show_no_growth(self, publish):
+        today = timezone.localdate()
+        DailySales.objects.bulk_create(
+            DailySales(date=today - timedelta(days=offset), order_count=2, revenue=Decimal("10.00"))
+            for offset in range(60)
+        )
+        overview = AnalyticsService.get_sales_overview(days=30)
+        self.assertEqual((overview["order_count"], overview["total_sales"]), (60, Decimal("300.00")))
+        self.assertEqual((overview["sales_growth"], overview["order_growth"]), (0, 0))
+        chart = AnalyticsService.get_daily_sales_chart_data(days=30)
+        self.assertEqual(len(chart["labels"]), 30)
+        self.assertEqual(chart["labels"][-1], today.strftime("%Y-%m-%d"))
+
+    def test_overview_cost_does_not_grow_with_orders(self, publish):
+        for _ in range(3):
+            self._place(publish, [1, 1])
+        with self.assertNumQueries(1):
+            AnalyticsService.get_sales_overview(days=30)
+        with self.assertNumQueries(1):
+            AnalyticsService.get_daily_sales_chart_data(days=30)
+
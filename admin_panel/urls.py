@@ -3,6 +3,9 @@ from django.urls import path
 from .views import (
     ChartDataAPIView,
     DashboardView,
+    ExportJobDetailView,
+    ExportJobDownloadView,
+    ExportJobListView,
     ExportOrdersCSVView,
     ExportProductsCSVView,
 )
@@ -13,6 +16,9 @@ urlpatterns = [
     path("", DashboardView.as_view(), name="dashboard"),
     path("export/orders/", ExportOrdersCSVView.as_view(), name="export_orders"),
     path("export/products/", ExportProductsCSVView.as_view(), name="export_products"),
+    path("export/jobs/", ExportJobListView.as_view(), name="export_jobs"),
+    path("export/jobs/<int:pk>/", ExportJobDetailView.as_view(), name="export_job"),
+    path("export/jobs/<int:pk>/download/", ExportJobDownloadView.as_view(), name="export_job_download"),
     path("api/chart/<str:chart_type>/", ChartDataAPIView.as_view(), name="chart_data"),
 ]
 
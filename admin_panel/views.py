@@ -1,17 +1,24 @@
-import csv
 from datetime import timedelta
 
 from django.contrib.admin.views.decorators import staff_member_required
 from django.db.models import Count, Sum
-from django.http import HttpResponse, JsonResponse
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django.utils import timezone
 from django.utils.decorators import method_decorator
 from django.views.generic import TemplateView, View
 
-from orders.models import Order, OrderItem
-from store.models import Product
+from orders.dispatch import enqueue
 
 from .analytics import AnalyticsService
+from .downloads import ranged_file_response
+from .exports import ORDER_HEADER, PRODUCT_HEADER, csv_response, formats, order_rows, product_rows
+from .models import ExportJob
+from .tasks import run_export_job
+
+# Orders export jobs look back at most this many days.
+MAX_EXPORT_DAYS = 3650
 
 
 @method_decorator(staff_member_required, name="dispatch")
@@ -49,76 +56,83 @@ class DashboardView(TemplateView):
 
 @method_decorator(staff_member_required, name="dispatch")
 class ExportOrdersCSVView(View):
-    """Export orders to CSV."""
+    """Export orders to CSV, streamed (see admin_panel.exports)."""
 
     def get(self, request):
         days = int(request.GET.get("days", 30))
         start_date = timezone.now() - timedelta(days=days)
-        orders = Order.objects.filter(created_at__gte=start_date).select_related(
-            "user", "shipping_address"
-        ).prefetch_related("items")
-
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = f'attachment; filename="orders_{timezone.now().date()}.csv"'
-
-        writer = csv.writer(response)
-        writer.writerow([
-            "Order ID", "Date", "Customer", "Email", "Total", "Status",
-            "Payment Method", "Items", "Shipping Address"
-        ])
-
-        for order in orders:
-            items_str = ", ".join([f"{item.product_title} x{item.quantity}" for item in order.items.all()])
-            address = order.shipping_address
-            address_str = f"{address.street}, {address.city}, {address.state} {address.postal_code}" if address else "N/A"
-            payment = order.payments.first()
-            payment_method = payment.provider if payment else "N/A"
-
-            writer.writerow([
-                order.id,
-                order.created_at.strftime("%Y-%m-%d %H:%M:%S"),
-                order.user.get_full_name() or order.user.username,
-                order.user.email,
-                order.total,
-                order.status,
-                payment_method,
-                items_str,
-                address_str,
-            ])
-
-        return response
+        return csv_response(f"orders_{timezone.now().date()}.csv", ORDER_HEADER, order_rows(start_date))
 
 
 @method_decorator(staff_member_required, name="dispatch")
 class ExportProductsCSVView(View):
-    """Export products to CSV."""
+    """Export products to CSV, streamed (see admin_panel.exports)."""
 
     def get(self, request):
-        products = Product.objects.select_related("category").prefetch_related("tags")
-
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = f'attachment; filename="products_{timezone.now().date()}.csv"'
-
-        writer = csv.writer(response)
-        writer.writerow([
-            "ID", "Title", "Category", "Price", "Stock", "Status",
-            "Created At", "Tags"
-        ])
-
-        for product in products:
-            tags_str = ", ".join([tag.name for tag in product.tags.all()])
-            writer.writerow([
-                product.id,
-                product.title,
-                product.category.name if product.category else "Uncategorized",
-                product.price,
-                product.stock,
-                "Published" if product.is_published else "Draft",
-                product.created_at.strftime("%Y-%m-%d"),
-                tags_str,
-            ])
-
-        return response
+        return csv_response(f"products_{timezone.now().date()}.csv", PRODUCT_HEADER, product_rows())
+
+
+def _job_data(job: ExportJob) -> dict:
+    return {
+        "id": job.pk,
+        "kind": job.kind,
+        "format": job.format,
+        "status": job.status,
+        "rows_written": job.rows_written,
+        "total_rows": job.total_rows,
+        "progress": round(job.progress, 4),
+        "size": job.size,
+        "error": job.error,
+        "url": reverse("admin_panel:export_job", args=[job.pk]),
+        "download_url": (
+            reverse("admin_panel:export_job_download", args=[job.pk])
+            if job.status == ExportJob.Status.COMPLETED else None
+        ),
+    }
+
+
+@method_decorator(staff_member_required, name="dispatch")
+class ExportJobListView(View):
+    """List recent export jobs, or start one in the background (POST kind, format, days)."""
+
+    def get(self, request):
+        return JsonResponse({"jobs": [_job_data(job) for job in ExportJob.objects.all()[:20]]})
+
+    def post(self, request):
+        kind = request.POST.get("kind", ExportJob.Kind.ORDERS)
+        export_format = request.POST.get("format", ExportJob.Format.CSV)
+        if kind not in ExportJob.Kind.values or export_format not in formats():
+            return JsonResponse({"error": "Invalid export kind or format"}, status=400)
+        try:
+            days = int(request.POST.get("days", 30))
+        except ValueError:
+            return JsonResponse({"error": "Invalid number of days"}, status=400)
+        job = ExportJob.objects.create(
+            created_by=request.user, kind=kind, format=export_format, days=min(max(days, 1), MAX_EXPORT_DAYS)
+        )
+        enqueue(run_export_job.si(job.pk))
+        return JsonResponse(_job_data(job), status=202)
+
+
+@method_decorator(staff_member_required, name="dispatch")
+class ExportJobDetailView(View):
+    """Progress of one export job."""
+
+    def get(self, request, pk):
+        return JsonResponse(_job_data(get_object_or_404(ExportJob, pk=pk)))
+
+
+@method_decorator(staff_member_required, name="dispatch")
+class ExportJobDownloadView(View):
+    """The finished export file; honours ``Range`` so interrupted downloads can resume."""
+
+    def get(self, request, pk):
+        job = get_object_or_404(ExportJob, pk=pk, status=ExportJob.Status.COMPLETED)
+        if not job.file:
+            raise Http404
+        content_type = "text/csv" if job.format == ExportJob.Format.CSV else "application/vnd.apache.parquet"
+        etag = f'"export-{job.pk}-{job.size}-{int(job.finished_at.timestamp())}"'
+        return ranged_file_response(request, job.file.open("rb"), job.size, job.filename, content_type, etag)
 
 
 @method_decorator(staff_member_required, name="dispatch")
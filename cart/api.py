@@ -1,12 +1,18 @@
+import hashlib
+import json
+
+from django.utils.http import parse_etags, quote_etag
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 
 from store.models import Product
 
-from .serializers import CartSerializer, WishlistSerializer
-from .services import get_cart, get_wishlist
+from .models import CartItem
+from .serializers import CartBatchSerializer, CartSerializer, CartSnapshotSerializer, WishlistSerializer
+from .services import add_to_cart, apply_cart_operations, cart_snapshot, get_cart, get_wishlist
 
 
 class CartViewSet(viewsets.ViewSet):
@@ -18,10 +24,12 @@ class CartViewSet(viewsets.ViewSet):
 
     @action(detail=False, methods=["post"])
     def add(self, request):
-        cart = get_cart(request)
-        product = Product.objects.get(pk=request.data["product_id"])
-        quantity = int(request.data.get("quantity", 1))
-        cart.add_item(product, quantity)
+        try:
+            cart = add_to_cart(request, request.data["product_id"], int(request.data.get("quantity", 1)))
+        except Product.DoesNotExist:
+            raise NotFound("No such product.")
+        except (TypeError, ValueError):
+            raise ValidationError({"quantity": "Must be a whole number of at least 1."})
         return Response(CartSerializer(cart).data, status=status.HTTP_201_CREATED)
 
     @action(detail=False, methods=["post"])
@@ -29,14 +37,42 @@ class CartViewSet(viewsets.ViewSet):
         cart = get_cart(request)
         item_id = request.data["item_id"]
         quantity = int(request.data["quantity"])
-        item = cart.items.get(pk=item_id)
-        if quantity <= 0:
-            item.delete()
-        else:
-            item.quantity = quantity
-            item.save(update_fields=["quantity"])
+        try:
+            cart.set_item_quantity(item_id, quantity)
+        except CartItem.DoesNotExist:
+            raise NotFound("No such cart item.")
         return Response(CartSerializer(cart).data)
 
+    @action(detail=False, methods=["post"])
+    def batch(self, request):
+        """
+        Apply ``{"operations": [{"op": "add"|"set"|"remove", "product_id", "quantity"}]}``
+        in order and in one transaction; answers with the compact snapshot.
+        """
+        serializer = CartBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            cart = apply_cart_operations(request, serializer.validated_data["operations"])
+        except Product.DoesNotExist:
+            raise NotFound("No such product.")
+        return self._snapshot_response(request, cart)
+
+    @action(detail=False, methods=["get"])
+    def snapshot(self, request):
+        """The compact snapshot; ``304 Not Modified`` when ``If-None-Match`` still matches."""
+        return self._snapshot_response(request, get_cart(request))
+
+    @staticmethod
+    def _snapshot_response(request, cart):
+        data = CartSnapshotSerializer(cart_snapshot(cart), context={"request": request}).data
+        etag = quote_etag(hashlib.md5(json.dumps(data, sort_keys=True).encode(), usedforsecurity=False).hexdigest())
+        if request.method == "GET" and etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(data)
+        response["ETag"] = etag
+        return response
+
 
 class WishlistViewSet(viewsets.ViewSet):
     permission_classes = [AllowAny]
@@ -1,11 +1,13 @@
-from .services import get_cart
+from django.utils.functional import SimpleLazyObject
+
+from .services import get_cart, get_cart_summary
 
 
 def cart_context(request):
-    """Add cart information to template context."""
-    cart = get_cart(request)
+    """Add cart information to template context, loaded only if a template uses it."""
+    summary = SimpleLazyObject(lambda: get_cart_summary(request))
     return {
-        "cart": cart,
-        "cart_item_count": cart.items.count() if cart else 0,
+        "cart": SimpleLazyObject(lambda: get_cart(request)),
+        "cart_item_count": SimpleLazyObject(lambda: summary["item_count"]),
+        "cart_subtotal": SimpleLazyObject(lambda: summary["subtotal"]),
     }
-
@@ -1,13 +1,30 @@
-from decimal import Decimal
-
 from django.conf import settings
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
 
 from store.models import Product
 
 User = settings.AUTH_USER_MODEL
 
 
+def resolve_operations(current: dict[int, int], operations) -> dict[int, int]:
+    """
+    Final quantity of every product touched by ``operations`` (dicts with
+    ``op`` in add/set/remove, ``product_id`` and ``quantity``), applied in
+    order on top of ``current``. Zero or less means the line goes away.
+    """
+    final = {}
+    for operation in operations:
+        product_id = operation["product_id"]
+        if operation["op"] == "add":
+            final[product_id] = final.get(product_id, current.get(product_id, 0)) + operation["quantity"]
+        elif operation["op"] == "set":
+            final[product_id] = operation["quantity"]
+        else:
+            final[product_id] = 0
+    return final
+
+
 class Cart(models.Model):
     user = models.ForeignKey(User, related_name="carts", on_delete=models.CASCADE, null=True, blank=True)
     session_key = models.CharField(max_length=40, unique=True, null=True, blank=True)
@@ -21,24 +38,144 @@ class Cart(models.Model):
 
     @property
     def subtotal(self):
-        return sum((item.line_total for item in self.items.all()), Decimal("0"))
-
-    def merge_with(self, other: "Cart"):
-        for item in other.items.all():
-            self.add_item(item.product, item.quantity)
+        from .services import cart_totals
+
+        return cart_totals(self, cached=True)["subtotal"]
+
+    def quantities(self) -> dict[int, int]:
+        return dict(self.items.values_list("product_id", "quantity"))
+
+    @transaction.atomic
+    def merge_with(self, other):
+        """
+        Move ``other``'s lines (a ``Cart`` or ``SessionCart``) into this cart
+        and delete ``other``. Quantities of shared products are summed and
+        merged lines are repriced, all in a fixed number of queries. The
+        lines are locked before they are read (see ``_lock_lines``), so
+        concurrent adds to this cart are not overwritten.
+        """
+        from .services import invalidate_cart_summary
+
+        incoming = other.quantities()
+        if incoming:
+            products = Product.objects.only("price", "discount_percentage").in_bulk(incoming)
+            existing = self._lock_lines(products, create=products)
+            CartItem.objects.bulk_create(
+                [
+                    CartItem(
+                        cart=self,
+                        product_id=product_id,
+                        quantity=existing.get(product_id, 0) + quantity,
+                        unit_price=products[product_id].current_price,
+                    )
+                    for product_id, quantity in incoming.items()
+                    if product_id in products
+                ],
+                update_conflicts=True,
+                unique_fields=["cart", "product"],
+                update_fields=["quantity", "unit_price"],
+            )
+            invalidate_cart_summary(self.pk)
         other.delete()
 
+    def _lines_changed(self):
+        # Queryset updates skip CartItem signals, so drop the cached summary here.
+        from .services import invalidate_cart_summary
+
+        invalidate_cart_summary(self.pk)
+
     def add_item(self, product: Product, quantity: int = 1):
-        item, created = CartItem.objects.get_or_create(
-            cart=self,
-            product=product,
-            defaults={"quantity": quantity, "unit_price": product.current_price},
+        """
+        Add ``quantity`` of ``product`` with an ``F("quantity") + n`` UPDATE,
+        falling back to an INSERT for a new line, so concurrent adds never
+        lose an increment. Raises ``ValueError`` unless ``quantity`` is at
+        least 1.
+        """
+        if quantity < 1:
+            raise ValueError("Quantity must be at least 1.")
+        price = product.current_price
+        lines = self.items.filter(product=product)
+        if not lines.update(quantity=F("quantity") + quantity, unit_price=price):
+            try:
+                with transaction.atomic():
+                    CartItem.objects.create(cart=self, product=product, quantity=quantity, unit_price=price)
+            except IntegrityError:
+                # Another request inserted the line first; add on top of it.
+                lines.update(quantity=F("quantity") + quantity, unit_price=price)
+        self._lines_changed()
+
+    def _set_quantity(self, lines, quantity: int) -> bool:
+        changed = lines.delete()[0] if quantity <= 0 else lines.update(quantity=quantity)
+        self._lines_changed()
+        return bool(changed)
+
+    def set_item_quantity(self, item_id: int, quantity: int):
+        """Set a line's quantity in one statement; zero or less removes it."""
+        if not self._set_quantity(self.items.filter(pk=item_id), quantity):
+            raise CartItem.DoesNotExist
+
+    def set_product_quantity(self, product_id: int, quantity: int):
+        if not self._set_quantity(self.items.filter(product_id=product_id), quantity):
+            raise CartItem.DoesNotExist
+
+    def remove_item(self, item_id: int):
+        self._set_quantity(self.items.filter(pk=item_id), 0)
+
+    def _lock_lines(self, product_ids, create=()) -> dict[int, int]:
+        """
+        Lock this cart's lines for ``product_ids`` and return their quantities.
+
+        Missing lines for the ``create`` products are first inserted empty
+        (ignoring conflicts), so a line another request adds in the meantime
+        is locked and counted too, instead of being overwritten by the
+        absolute upsert that follows. Concurrent ``add_item`` calls wait on
+        the locks and add on top.
+        """
+        if create:
+            CartItem.objects.bulk_create(
+                [CartItem(cart=self, product_id=product_id, quantity=0, unit_price=0) for product_id in create],
+                ignore_conflicts=True,
+            )
+        return dict(
+            self.items.select_for_update().filter(product_id__in=product_ids).values_list("product_id", "quantity")
         )
-        if not created:
-            item.quantity += quantity
-            item.unit_price = product.current_price
-            item.save(update_fields=["quantity", "unit_price"])
-        return item
+
+    @transaction.atomic
+    def apply_operations(self, operations):
+        """
+        Apply a batch of add/set/remove operations (see ``resolve_operations``)
+        in one transaction: the touched lines are locked and read once (see
+        ``_lock_lines``), then removals are one DELETE and everything else one
+        bulk upsert. Raises ``Product.DoesNotExist``, rolling the batch back,
+        for unknown products.
+        """
+        product_ids = {operation["product_id"] for operation in operations}
+        written = {operation["product_id"] for operation in operations if operation["op"] != "remove"}
+        products = Product.objects.only("price", "discount_percentage").in_bulk(written)
+        if len(products) != len(written):
+            raise Product.DoesNotExist
+        current = self._lock_lines(product_ids, create=written)
+        final = resolve_operations(current, operations)
+        kept = {product_id: quantity for product_id, quantity in final.items() if quantity > 0}
+        removed = [product_id for product_id in final if product_id not in kept and product_id in current]
+        if removed:
+            self.items.filter(product_id__in=removed).delete()
+        if kept:
+            CartItem.objects.bulk_create(
+                [
+                    CartItem(
+                        cart=self,
+                        product_id=product_id,
+                        quantity=quantity,
+                        unit_price=products[product_id].current_price,
+                    )
+                    for product_id, quantity in kept.items()
+                ],
+                update_conflicts=True,
+                unique_fields=["cart", "product"],
+                update_fields=["quantity", "unit_price"],
+            )
+        self._lines_changed()
 
 
 class CartItem(models.Model):
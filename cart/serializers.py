@@ -1,8 +1,11 @@
 from rest_framework import serializers
 
+from store.compiled_serializers import CompiledSerializerMixin
+from store.models import ProductImage
 from store.serializers import ProductSerializer
 
 from .models import Cart, CartItem, Wishlist, WishlistItem
+from .services import cart_totals
 
 
 class CartItemSerializer(serializers.ModelSerializer):
@@ -13,7 +16,7 @@ class CartItemSerializer(serializers.ModelSerializer):
         fields = ("id", "product", "quantity", "unit_price", "line_total")
 
 
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(CompiledSerializerMixin, serializers.ModelSerializer):
     items = CartItemSerializer(many=True)
     subtotal = serializers.SerializerMethodField()
 
@@ -22,7 +25,55 @@ class CartSerializer(serializers.ModelSerializer):
         fields = ("id", "items", "subtotal")
 
     def get_subtotal(self, obj):
-        return obj.subtotal
+        return cart_totals(obj)["subtotal"]
+
+
+class CartOperationSerializer(serializers.Serializer):
+    OPERATIONS = ("add", "set", "remove")
+
+    op = serializers.ChoiceField(choices=OPERATIONS)
+    product_id = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=0, required=False)
+
+    def validate(self, attrs):
+        if attrs["op"] == "set" and "quantity" not in attrs:
+            raise serializers.ValidationError({"quantity": "This field is required for set."})
+        if attrs["op"] == "add":
+            attrs.setdefault("quantity", 1)
+        return attrs
+
+
+class CartBatchSerializer(serializers.Serializer):
+    MAX_OPERATIONS = 100
+
+    operations = CartOperationSerializer(many=True, allow_empty=False, max_length=MAX_OPERATIONS)
+
+
+class CartSnapshotItemSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    title = serializers.CharField()
+    slug = serializers.CharField()
+    image = serializers.SerializerMethodField()
+    quantity = serializers.IntegerField()
+    unit_price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    line_total = serializers.DecimalField(max_digits=12, decimal_places=2)
+
+    def get_image(self, row):
+        if not row["image"]:
+            return None
+        url = ProductImage._meta.get_field("image").storage.url(row["image"])
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request is not None else url
+
+
+class CartSnapshotSerializer(CompiledSerializerMixin, serializers.Serializer):
+    """Serializes ``services.cart_snapshot()``."""
+
+    id = serializers.IntegerField(allow_null=True)
+    items = CartSnapshotItemSerializer(many=True)
+    item_count = serializers.IntegerField()
+    quantity = serializers.IntegerField()
+    subtotal = serializers.DecimalField(max_digits=12, decimal_places=2)
 
 
 class WishlistItemSerializer(serializers.ModelSerializer):
@@ -33,7 +84,7 @@ class WishlistItemSerializer(serializers.ModelSerializer):
         fields = ("id", "product", "added_at")
 
 
-class WishlistSerializer(serializers.ModelSerializer):
+class WishlistSerializer(CompiledSerializerMixin, serializers.ModelSerializer):
     items = WishlistItemSerializer(many=True)
 
     class Meta:
@@ -1,4 +1,19 @@
-from .models import Cart, Wishlist
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum
+
+from store.models import Product, ProductImage
+
+from .models import Cart, CartItem, Wishlist
+from .session_cart import SessionCart
+
+CART_SESSION_KEY = "cart_id"
+CART_SUMMARY_KEY = "cart:summary:{}"
+CART_SUMMARY_TIMEOUT = 60 * 60
+EMPTY_CART_SUMMARY = {"item_count": 0, "quantity": 0, "subtotal": Decimal("0")}
+LINE_TOTAL = ExpressionWrapper(F("unit_price") * F("quantity"), output_field=DecimalField())
 
 
 def _ensure_session(request):
@@ -7,20 +22,164 @@ def _ensure_session(request):
     return request.session.session_key
 
 
-def get_cart(request):
+def get_cart(request, user=None):
+    """
+    The request's cart: a ``Cart`` row for signed-in users, and for
+    anonymous visitors a ``SessionCart`` when ``CART_STORAGE`` is "session".
+    ``user`` overrides ``request.user``, which login-signal requests may lack.
+    """
+    user = user or request.user
+    if not user.is_authenticated and settings.CART_STORAGE == "session":
+        return SessionCart(request.session)
     session_key = _ensure_session(request)
     cart, _ = Cart.objects.get_or_create(
-        session_key=session_key, defaults={"user": request.user if request.user.is_authenticated else None}
+        session_key=session_key, defaults={"user": user if user.is_authenticated else None}
     )
-    if request.user.is_authenticated and cart.user is None:
-        existing_user_cart = Cart.objects.filter(user=request.user).exclude(pk=cart.pk).first()
+    if user.is_authenticated and cart.user is None:
+        existing_user_cart = Cart.objects.filter(user=user).exclude(pk=cart.pk).first()
         if existing_user_cart:
             cart.merge_with(existing_user_cart)
-        cart.user = request.user
+        cart.user = user
         cart.save(update_fields=["user"])
+    if user.is_authenticated:
+        session_cart = SessionCart(request.session)
+        if session_cart:
+            cart.merge_with(session_cart)
+    if request.session.get(CART_SESSION_KEY) != cart.pk:
+        request.session[CART_SESSION_KEY] = cart.pk
+    return cart
+
+
+def add_to_cart(request, product_id: int, quantity: int = 1):
+    """
+    Atomically add ``quantity`` of a product to the request's cart; returns the
+    cart. Raises ``ValueError`` when ``quantity`` is below 1.
+    """
+    product = Product.objects.only("price", "discount_percentage").get(pk=product_id)
+    cart = get_cart(request)
+    cart.add_item(product, quantity)
+    return cart
+
+
+def update_cart_item(request, product_id: int, quantity: int):
+    """Set the quantity of a product in the request's cart; zero or less removes it."""
+    cart = get_cart(request)
+    cart.set_product_quantity(product_id, quantity)
+    return cart
+
+
+def remove_from_cart(request, product_id: int):
+    cart = get_cart(request)
+    try:
+        cart.set_product_quantity(product_id, 0)
+    except CartItem.DoesNotExist:
+        pass
     return cart
 
 
+def apply_cart_operations(request, operations):
+    """Apply a batch of add/set/remove operations to the request's cart; returns the cart."""
+    cart = get_cart(request)
+    cart.apply_operations(operations)
+    return cart
+
+
+def cart_snapshot(cart) -> dict:
+    """
+    Compact view of ``cart`` for API clients: per line only the product's
+    id, title, slug and primary image, read together with the lines in one
+    query, plus the totals.
+    """
+    if isinstance(cart, SessionCart):
+        lines = cart.lines()
+        rows = [
+            {
+                "product_id": product["id"],
+                "title": product["title"],
+                "slug": product["slug"],
+                "image": product["primary_image"],
+                "quantity": lines[product["id"]][0],
+                "unit_price": lines[product["id"]][1],
+            }
+            for product in Product.objects.filter(pk__in=lines)
+            .with_primary_image()
+            .order_by("pk")
+            .values("id", "title", "slug", "primary_image")
+        ]
+    else:
+        image = ProductImage.objects.filter(product=OuterRef("product_id")).order_by("-is_primary", "pk")
+        rows = list(
+            cart.items.order_by("pk").values(
+                "product_id",
+                "quantity",
+                "unit_price",
+                title=F("product__title"),
+                slug=F("product__slug"),
+                image=Subquery(image.values("image")[:1]),
+            )
+        )
+    for row in rows:
+        row["line_total"] = row["unit_price"] * row["quantity"]
+    return {
+        "id": cart.pk,
+        "items": rows,
+        "item_count": len(rows),
+        "quantity": sum(row["quantity"] for row in rows),
+        "subtotal": sum((row["line_total"] for row in rows), Decimal("0")),
+    }
+
+
+def cart_totals(cart, cached: bool = False) -> dict:
+    """
+    ``item_count``, ``quantity`` and ``subtotal`` of ``cart`` in one aggregate
+    query (none for session carts).
+
+    With ``cached`` the per-cart cache entry is served when present; it is
+    dropped on every cart write (``Cart`` methods and ``CartItem`` signals),
+    but anything that charges money should still read fresh totals.
+    """
+    if isinstance(cart, SessionCart):
+        return cart.summary()
+    if cart.pk is None:
+        return EMPTY_CART_SUMMARY
+    key = CART_SUMMARY_KEY.format(cart.pk)
+    if cached:
+        totals = cache.get(key)
+        if totals is not None:
+            return totals
+    row = cart.items.aggregate(item_count=Count("id"), total_quantity=Sum("quantity"), subtotal=Sum(LINE_TOTAL))
+    totals = {
+        "item_count": row["item_count"],
+        "quantity": row["total_quantity"] or 0,
+        "subtotal": row["subtotal"] or Decimal("0"),
+    }
+    cache.set(key, totals, CART_SUMMARY_TIMEOUT)
+    return totals
+
+
+def get_cart_summary(request) -> dict:
+    """
+    Cart totals (see ``cart_totals``) of the request's cart.
+
+    Served from the cache once the session knows its cart, and free for
+    visitors without a session, who cannot have a cart yet.
+    """
+    if not request.user.is_authenticated and settings.CART_STORAGE == "session":
+        return SessionCart(request.session).summary()
+    if not request.session.session_key:
+        return EMPTY_CART_SUMMARY
+    cart_id = request.session.get(CART_SESSION_KEY)
+    if cart_id is not None:
+        summary = cache.get(CART_SUMMARY_KEY.format(cart_id))
+        if summary is not None:
+            return summary
+    return cart_totals(get_cart(request))
+
+
+def invalidate_cart_summary(cart_id: int):
+    cache.delete(CART_SUMMARY_KEY.format(cart_id))
+
+
 def get_wishlist(request):
     session_key = _ensure_session(request)
     wishlist, _ = Wishlist.objects.get_or_create(
@@ -0,0 +1,168 @@
+"""
+Anonymous carts kept in the session instead of the database.
+
+The session holds a compact ``{product_id: [quantity, unit_price]}`` map, so a
+visitor who never adds anything costs no session and no rows, and one who
+does costs no ``Cart``/``CartItem`` rows until login or checkout persists the
+cart (see ``cart.services.get_cart``). ``SessionCart`` mirrors the parts of
+the ``Cart`` API the views, templates and serializers use.
+"""
+from decimal import Decimal
+
+from store.models import Product
+
+from .models import CartItem, resolve_operations
+
+
+CENT = Decimal("0.01")
+
+
+def _unit_price(product: Product) -> str:
+    # Rounded like CartItem.unit_price is when a Cart row is saved.
+    return str(product.current_price.quantize(CENT))
+
+
+class SessionCartItem:
+    """A cart line backed by the session map; ``id`` is the product id."""
+
+    def __init__(self, product: Product, quantity: int, unit_price: Decimal):
+        self.product = product
+        self.quantity = quantity
+        self.unit_price = unit_price
+
+    @property
+    def id(self):
+        return self.product.pk
+
+    pk = id
+
+    @property
+    def product_id(self):
+        return self.product.pk
+
+    @property
+    def line_total(self):
+        return self.unit_price * self.quantity
+
+
+class SessionCartItems(list):
+    """List of ``SessionCartItem`` answering the manager calls used on ``cart.items``."""
+
+    def all(self):
+        return self
+
+    def select_related(self, *fields):
+        return self
+
+    def count(self):
+        return len(self)
+
+    def exists(self):
+        return bool(self)
+
+    def first(self):
+        return self[0] if self else None
+
+
+class SessionCart:
+    SESSION_KEY = "cart_items"
+
+    pk = id = None
+    user = None
+
+    def __init__(self, session):
+        self.session = session
+
+    @property
+    def _lines(self) -> dict:
+        return self.session.get(self.SESSION_KEY, {})
+
+    def _save(self, lines: dict):
+        if lines:
+            self.session[self.SESSION_KEY] = lines
+        else:
+            self.session.pop(self.SESSION_KEY, None)
+
+    def quantities(self) -> dict[int, int]:
+        return {int(product_id): quantity for product_id, (quantity, _) in self._lines.items()}
+
+    def lines(self) -> dict[int, tuple[int, Decimal]]:
+        """``{product_id: (quantity, unit_price)}`` without touching the database."""
+        return {
+            int(product_id): (quantity, Decimal(unit_price))
+            for product_id, (quantity, unit_price) in self._lines.items()
+        }
+
+    def __len__(self):
+        return len(self._lines)
+
+    @property
+    def items(self) -> SessionCartItems:
+        lines = self._lines
+        products = Product.objects.in_bulk([int(product_id) for product_id in lines])
+        return SessionCartItems(
+            SessionCartItem(products[int(product_id)], quantity, Decimal(unit_price))
+            for product_id, (quantity, unit_price) in lines.items()
+            if int(product_id) in products
+        )
+
+    @property
+    def subtotal(self):
+        return sum(
+            (Decimal(unit_price) * quantity for quantity, unit_price in self._lines.values()), Decimal("0")
+        )
+
+    def summary(self) -> dict:
+        return {
+            "item_count": len(self),
+            "quantity": sum(quantity for quantity, _ in self._lines.values()),
+            "subtotal": self.subtotal,
+        }
+
+    def add_item(self, product: Product, quantity: int = 1):
+        if quantity < 1:
+            raise ValueError("Quantity must be at least 1.")
+        lines = dict(self._lines)
+        current = lines.get(str(product.pk), [0, None])[0]
+        lines[str(product.pk)] = [current + quantity, _unit_price(product)]
+        self._save(lines)
+
+    def set_item_quantity(self, item_id: int, quantity: int):
+        lines = dict(self._lines)
+        if str(item_id) not in lines:
+            raise CartItem.DoesNotExist
+        if quantity <= 0:
+            del lines[str(item_id)]
+        else:
+            lines[str(item_id)] = [quantity, lines[str(item_id)][1]]
+        self._save(lines)
+
+    set_product_quantity = set_item_quantity
+
+    def remove_item(self, item_id: int):
+        lines = dict(self._lines)
+        if lines.pop(str(item_id), None) is not None:
+            self._save(lines)
+
+    def apply_operations(self, operations):
+        """Session counterpart of ``Cart.apply_operations``; nothing is written on error."""
+        final = resolve_operations(self.quantities(), operations)
+        kept = [product_id for product_id, quantity in final.items() if quantity > 0]
+        products = Product.objects.only("price", "discount_percentage").in_bulk(kept)
+        if len(products) != len(kept):
+            raise Product.DoesNotExist
+        lines = dict(self._lines)
+        for product_id, quantity in final.items():
+            if quantity > 0:
+                lines[str(product_id)] = [quantity, _unit_price(products[product_id])]
+            else:
+                lines.pop(str(product_id), None)
+        self._save(lines)
+
+    def merge_with(self, other):
+        for item in other.items.all():
+            self.add_item(item.product, item.quantity)
+        other.delete()
+
+    def delete(self):
+        self._save({})
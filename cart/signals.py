@@ -0,0 +1,25 @@
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Cart, CartItem
+from .services import get_cart, invalidate_cart_summary
+from .session_cart import SessionCart
+
+
+@receiver(post_save, sender=CartItem)
+@receiver(post_delete, sender=CartItem)
+def invalidate_item_cart_summary(sender, instance, **kwargs):
+    invalidate_cart_summary(instance.cart_id)
+
+
+@receiver(post_delete, sender=Cart)
+def invalidate_deleted_cart_summary(sender, instance, **kwargs):
+    invalidate_cart_summary(instance.pk)
+
+
+@receiver(user_logged_in)
+def persist_session_cart(sender, request, user, **kwargs):
+    # get_cart() moves the anonymous session cart into the user's Cart rows.
+    if request is not None and SessionCart(request.session):
+        get_cart(request, user=user)
@@ -1,15 +1,22 @@
 """
 Tests for cart app - cart, wishlist, cart services
 """
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
+from unittest import skipUnless
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase, Client
+from django.core.cache import cache
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from rest_framework.test import APIClient
 
 from store.models import Category, Product
 from .models import Cart, CartItem, Wishlist, WishlistItem
-from .services import get_cart, add_to_cart, remove_from_cart, update_cart_item
+from .services import get_cart, add_to_cart, cart_totals, remove_from_cart, update_cart_item
 
 User = get_user_model()
 
@@ -193,3 +200,300 @@ class WishlistModelTest(TestCase):
         item = WishlistItem.objects.create(wishlist=wishlist, product=self.product)
         self.assertEqual(item.wishlist, wishlist)
         self.assertEqual(item.product, self.product)
+
+
+@override_settings(
+    STORAGES={
+        "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+        "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    }
+)
+class CartContextTest(TestCase):
+    """Test the lazy cart context and cached cart summary."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="shopper", email="shopper@example.com", password="pass")
+        category = Category.objects.create(name="Audio", slug="audio")
+        self.product = Product.objects.create(
+            title="Cable", description="", price=Decimal("5.00"), stock=10, sku="CTX-001", category=category
+        )
+
+    def _cart_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, [query for query in queries if "cart_cart" in query["sql"]]
+
+    def test_anonymous_pages_skip_the_cart(self):
+        response, queries = self._cart_queries(reverse("accounts:login"))
+        self.assertEqual(queries, [])
+        self.assertFalse(Cart.objects.exists())
+        self.assertNotIn("sessionid", response.cookies)
+
+    def test_badge_is_served_from_the_cached_summary(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse("cart:add", args=[self.product.pk]), {"quantity": 2})
+        response, _ = self._cart_queries(reverse("accounts:login"))
+        self.assertEqual(str(response.context["cart_item_count"]), "1")
+        _, queries = self._cart_queries(reverse("accounts:login"))
+        self.assertEqual(queries, [])
+
+        self.client.post(reverse("cart:add", args=[self.product.pk]), {"quantity": 1})
+        response, _ = self._cart_queries(reverse("accounts:login"))
+        self.assertEqual(response.context["cart_subtotal"], Decimal("15.00"))
+
+
+@override_settings(
+    CART_STORAGE="session",
+    STORAGES={
+        "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+        "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    },
+)
+class SessionCartTest(TestCase):
+    """Test anonymous carts kept in the session until login."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="visitor", email="visitor@example.com", password="pass")
+        category = Category.objects.create(name="Audio", slug="audio")
+        self.product = Product.objects.create(
+            title="Cable", description="", price=Decimal("5.00"), stock=10, sku="SES-001", category=category
+        )
+
+    def test_anonymous_cart_writes_no_rows(self):
+        self.client.post(reverse("cart:add", args=[self.product.pk]), {"quantity": 2})
+        self.client.post(reverse("cart:add", args=[self.product.pk]), {"quantity": 1})
+        self.assertFalse(Cart.objects.exists())
+        response = self.client.get(reverse("cart:detail"))
+        self.assertEqual(response.context["cart"].subtotal, Decimal("15.00"))
+        self.assertEqual([item.quantity for item in response.context["items"]], [3])
+
+        self.client.post(reverse("cart:item", args=[self.product.pk]), {"quantity": 1})
+        self.assertEqual(self.client.get(reverse("cart:detail")).context["cart"].subtotal, Decimal("5.00"))
+
+    def test_login_persists_the_session_cart(self):
+        self.client.post(reverse("cart:add", args=[self.product.pk]), {"quantity": 2})
+        self.client.login(username="visitor", password="pass")
+        cart = Cart.objects.get(user=self.user)
+        self.assertEqual(list(cart.items.values_list("product_id", "quantity")), [(self.product.pk, 2)])
+        self.assertEqual(cart.subtotal, Decimal("10.00"))
+
+
+class CartMergeTest(TestCase):
+    """Test the set-based cart merge."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="merger", email="merger@example.com", password="pass")
+        category = Category.objects.create(name="Audio", slug="audio")
+        self.products = [
+            Product.objects.create(
+                title=f"Cable {number}", description="", price=Decimal("5.00"), stock=10, sku=f"MRG-{number:03d}",
+                category=category,
+            )
+            for number in range(30)
+        ]
+
+    def _merge_queries(self, size):
+        target = Cart.objects.create(user=self.user)
+        source = Cart.objects.create(session_key=f"merge-{size}")
+        CartItem.objects.create(cart=target, product=self.products[0], quantity=1, unit_price=Decimal("4.00"))
+        for product in self.products[:size]:
+            CartItem.objects.create(cart=source, product=product, quantity=2, unit_price=product.price)
+        with CaptureQueriesContext(connection) as queries:
+            target.merge_with(source)
+        self.assertFalse(Cart.objects.filter(pk=source.pk).exists())
+        self.assertEqual(target.items.count(), size)
+        self.assertEqual(target.items.get(product=self.products[0]).quantity, 3)
+        self.assertEqual(target.items.get(product=self.products[0]).unit_price, Decimal("5.00"))
+        return len(queries)
+
+    def test_merge_runs_a_fixed_number_of_queries(self):
+        self.assertEqual(self._merge_queries(3), self._merge_queries(30))
+
+
+class AtomicCartUpdateTest(TestCase):
+    """Test F-expression cart line updates."""
+
+    def setUp(self):
+        category = Category.objects.create(name="Audio", slug="audio")
+        self.product = Product.objects.create(
+            title="Cable", description="", price=Decimal("5.00"), stock=10, sku="ATOM-001", category=category
+        )
+        self.cart = Cart.objects.create(session_key="atomic")
+
+    def test_adds_from_stale_instances_are_not_lost(self):
+        first, second = Cart.objects.get(pk=self.cart.pk), Cart.objects.get(pk=self.cart.pk)
+        first.add_item(self.product, 1)
+        second.add_item(self.product, 2)
+        with self.assertNumQueries(1):
+            first.add_item(self.product, 3)
+        self.assertEqual(self.cart.items.get().quantity, 6)
+
+    def test_set_quantity_is_one_statement(self):
+        self.cart.add_item(self.product, 1)
+        item = self.cart.items.get()
+        with self.assertNumQueries(1):
+            self.cart.set_item_quantity(item.pk, 4)
+        self.assertEqual(self.cart.items.get().quantity, 4)
+        self.cart.set_item_quantity(item.pk, 0)
+        self.assertFalse(self.cart.items.exists())
+        with self.assertRaises(CartItem.DoesNotExist):
+            self.cart.set_item_quantity(item.pk, 1)
+
+    def test_adds_below_one_are_rejected(self):
+        for quantity in (0, -1):
+            with self.assertRaises(ValueError):
+                self.cart.add_item(self.product, quantity)
+        self.assertFalse(self.cart.items.exists())
+        self.cart.add_item(self.product, 2)
+        with self.assertRaises(ValueError):
+            self.cart.add_item(self.product, -5)
+        self.assertEqual(self.cart.items.get().quantity, 2)
+
+    def test_add_views_answer_400_for_bad_quantities(self):
+        for quantity in ("0", "-3", "abc"):
+            response = self.client.post(reverse("cart:add", args=[self.product.pk]), {"quantity": quantity})
+            self.assertEqual(response.status_code, 400, quantity)
+            response = APIClient().post(
+                reverse("cart-add"), {"product_id": self.product.pk, "quantity": quantity}, format="json"
+            )
+            self.assertEqual(response.status_code, 400, quantity)
+        self.assertFalse(CartItem.objects.exists())
+
+
+class CartBatchAPITest(TestCase):
+    """Test the batch cart operations endpoint."""
+
+    def setUp(self):
+        category = Category.objects.create(name="Audio", slug="audio")
+        self.products = [
+            Product.objects.create(
+                title=f"Cable {number}", description="", price=Decimal("5.00"), stock=10, sku=f"BATCH-{number:03d}",
+                category=category,
+            )
+            for number in range(3)
+        ]
+        self.user = User.objects.create_user(username="batcher", email="batcher@example.com", password="pass")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse("cart-batch")
+
+    def _batch(self, operations):
+        return self.client.post(self.url, {"operations": operations}, format="json")
+
+    def test_operations_apply_in_order(self):
+        first, second, third = (product.pk for product in self.products)
+        self._batch([{"op": "add", "product_id": third, "quantity": 1}])
+        response = self._batch(
+            [
+                {"op": "add", "product_id": first, "quantity": 2},
+                {"op": "add", "product_id": first},
+                {"op": "set", "product_id": second, "quantity": 4},
+                {"op": "remove", "product_id": third},
+            ]
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({item["product_id"]: item["quantity"] for item in response.data["items"]}, {first: 3, second: 4})
+        self.assertEqual(response.data["subtotal"], "35.00")
+        self.assertEqual(response.data["quantity"], 7)
+        self.assertEqual(response.data["items"][0]["title"], "Cable 0")
+
+    def test_unknown_product_rolls_back_the_batch(self):
+        response = self._batch(
+            [{"op": "add", "product_id": self.products[0].pk}, {"op": "add", "product_id": 999999}]
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_lines_that_end_at_zero_leave_no_row(self):
+        first, second = (product.pk for product in self.products[:2])
+        response = self._batch(
+            [
+                {"op": "add", "product_id": first, "quantity": 2},
+                {"op": "remove", "product_id": first},
+                {"op": "set", "product_id": second, "quantity": 0},
+            ]
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_snapshot_honours_the_etag(self):
+        etag = self._batch([{"op": "add", "product_id": self.products[0].pk}])["ETag"]
+        snapshot_url = reverse("cart-snapshot")
+        self.assertEqual(self.client.get(snapshot_url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self._batch([{"op": "add", "product_id": self.products[0].pk}])
+        response = self.client.get(snapshot_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+class CartTotalsTest(TestCase):
+    """Test the aggregate cart totals service."""
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name="Audio", slug="audio")
+        self.products = [
+            Product.objects.create(
+                title=f"Cable {number}", description="", price=Decimal("5.00"), stock=10, sku=f"TOT-{number:03d}",
+                category=category,
+            )
+            for number in range(3)
+        ]
+        self.cart = Cart.objects.create(session_key="totals")
+        for quantity, product in enumerate(self.products, start=1):
+            self.cart.add_item(product, quantity)
+
+    def test_totals_are_one_query(self):
+        cart = Cart.objects.get(pk=self.cart.pk)
+        with self.assertNumQueries(1):
+            totals = cart_totals(cart)
+        self.assertEqual(totals, {"item_count": 3, "quantity": 6, "subtotal": Decimal("30.00")})
+
+    def test_cached_totals_are_dropped_on_writes(self):
+        cart_totals(self.cart)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.cart.subtotal, Decimal("30.00"))
+        self.cart.add_item(self.products[0], 1)
+        self.assertEqual(cart_totals(self.cart, cached=True)["quantity"], 7)
+        self.cart.items.get(product=self.products[2]).delete()
+        self.assertEqual(cart_totals(self.cart, cached=True)["subtotal"], Decimal("20.00"))
+
+
+@skipUnless(connection.features.has_select_for_update, "needs row locks for concurrent writers")
+class ConcurrentCartWriteTest(TransactionTestCase):
+    """Test that concurrent writers to one cart never lose an increment."""
+
+    def setUp(self):
+        category = Category.objects.create(name="Audio", slug="audio")
+        self.product = Product.objects.create(
+            title="Cable", description="", price=Decimal("5.00"), stock=10, sku="RACE-001", category=category
+        )
+        self.cart = Cart.objects.create(session_key="race")
+
+    def _concurrently(self, calls):
+        barrier = threading.Barrier(len(calls))
+
+        def run(call):
+            barrier.wait()
+            try:
+                call()
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(len(calls)) as pool:
+            list(pool.map(run, calls))
+
+    def test_batch_adds_to_a_new_line_all_count(self):
+        add = [{"op": "add", "product_id": self.product.pk, "quantity": 1}]
+        self._concurrently([lambda: Cart.objects.get(pk=self.cart.pk).apply_operations(add)] * 8)
+        self.assertEqual(self.cart.items.get().quantity, 8)
+
+    def test_merge_keeps_concurrent_adds(self):
+        sources = [Cart.objects.create(session_key=f"race-{number}") for number in range(4)]
+        for source in sources:
+            CartItem.objects.create(cart=source, product=self.product, quantity=2, unit_price=self.product.price)
+        calls = [lambda source=source: Cart.objects.get(pk=self.cart.pk).merge_with(source) for source in sources]
+        calls += [lambda: Cart.objects.get(pk=self.cart.pk).add_item(self.product, 1)] * 4
+        self._concurrently(calls)
+        self.assertEqual(self.cart.items.get().quantity, 12)
@@ -1,11 +1,12 @@
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, redirect
 from django.views import View
 from django.views.generic import TemplateView
 
 from store.models import Product
 
-from .services import get_cart, get_wishlist
+from .models import CartItem
+from .services import add_to_cart, cart_totals, get_cart, get_wishlist
 
 
 class CartDetailView(TemplateView):
@@ -21,32 +22,30 @@ class CartDetailView(TemplateView):
 
 class AddToCartView(View):
     def post(self, request, *args, **kwargs):
-        product = get_object_or_404(Product, pk=kwargs["pk"])
-        cart = get_cart(request)
-        cart.add_item(product, int(request.POST.get("quantity", 1)))
+        try:
+            cart = add_to_cart(request, kwargs["pk"], int(request.POST.get("quantity", 1)))
+        except Product.DoesNotExist:
+            raise Http404("No such product.")
+        except ValueError:
+            return JsonResponse({"error": "Quantity must be a whole number of at least 1."}, status=400)
         if request.headers.get("HX-Request") or request.headers.get("X-Requested-With") == "XMLHttpRequest":
-            return JsonResponse({"subtotal": cart.subtotal})
+            return JsonResponse(cart_totals(cart))
         return redirect("cart:detail")
 
 
 class UpdateCartItemView(View):
     def post(self, request, *args, **kwargs):
         cart = get_cart(request)
-        item = get_object_or_404(cart.items, pk=kwargs["item_id"])
         action = request.POST.get("action")
-        if action == "remove":
-            item.delete()
-        else:
-            quantity = int(request.POST.get("quantity", 1))
-            if quantity <= 0:
-                item.delete()
-            else:
-                item.quantity = quantity
-                item.save(update_fields=["quantity"])
+        quantity = 0 if action == "remove" else int(request.POST.get("quantity", 1))
+        try:
+            cart.set_item_quantity(kwargs["item_id"], quantity)
+        except CartItem.DoesNotExist:
+            raise Http404("No such cart item.")
         
         # Check if it's an AJAX request
         if request.headers.get("HX-Request") or request.headers.get("X-Requested-With") == "XMLHttpRequest":
-            return JsonResponse({"subtotal": cart.subtotal})
+            return JsonResponse(cart_totals(cart))
         return redirect("cart:detail")
 
 
@@ -77,6 +77,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "orders.dispatch.TaskBatchMiddleware",
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -241,10 +242,39 @@ CELERY_BEAT_SCHEDULE = {
     "low-stock-digest": {
         "task": "orders.tasks.send_low_stock_digest",
         "schedule": crontab(minute=0, hour=9),
-    }
+    },
+    "release-expired-stock-holds": {
+        "task": "orders.tasks.release_expired_stock_holds",
+        "schedule": 60.0,
+    },
+    "process-pending-webhooks": {
+        "task": "orders.tasks.process_pending_webhooks",
+        "schedule": 5 * 60.0,
+    },
+    "rebuild-sales-rollups": {
+        "task": "admin_panel.tasks.rebuild_recent_rollups",
+        "schedule": crontab(minute=15, hour=2),
+    },
+    "purge-export-jobs": {
+        "task": "admin_panel.tasks.purge_export_jobs",
+        "schedule": crontab(minute=30, hour=3),
+    },
 }
 
 LOW_STOCK_THRESHOLD = int(os.getenv("LOW_STOCK_THRESHOLD", 5))
+# How long stock stays reserved for a cart on the checkout page.
+STOCK_HOLD_SECONDS = int(os.getenv("STOCK_HOLD_SECONDS", 10 * 60))
+
+# Product search backend (see store/search_backends.py); leave empty to pick
+# one for the active database vendor.
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "")
+# Redis holding the search analytics buckets; counts stay in-process when unset.
+SEARCH_ANALYTICS_REDIS_URL = os.getenv("SEARCH_ANALYTICS_REDIS_URL", "")
+# "session" keeps anonymous carts in the session until login or checkout;
+# "database" stores every visitor's cart as Cart rows.
+CART_STORAGE = os.getenv("CART_STORAGE", "session")
+# Background admin exports (admin_panel.exports) and their files are deleted after this many days.
+EXPORT_JOB_RETENTION_DAYS = int(os.getenv("EXPORT_JOB_RETENTION_DAYS", 7))
 
 # Production Security Settings
 if not DEBUG:
@@ -263,13 +293,22 @@ PAYMENT_GATEWAYS = {
         "secret_key": os.getenv("STRIPE_SECRET_KEY", ""),
         "public_key": os.getenv("STRIPE_PUBLIC_KEY", ""),
         "webhook_secret": os.getenv("STRIPE_WEBHOOK_SECRET", ""),
+        "api_base": os.getenv("STRIPE_API_BASE", "https://api.stripe.com"),
     },
     "razorpay": {
         "key_id": os.getenv("RAZORPAY_KEY_ID", ""),
         "key_secret": os.getenv("RAZORPAY_KEY_SECRET", ""),
         "webhook_secret": os.getenv("RAZORPAY_WEBHOOK_SECRET", ""),
+        "api_base": os.getenv("RAZORPAY_API_BASE", "https://api.razorpay.com"),
     },
 }
+# Pooled gateway HTTP clients (see orders/payment_gateways.py).
+PAYMENT_GATEWAY_TIMEOUT = (
+    float(os.getenv("PAYMENT_GATEWAY_CONNECT_TIMEOUT", 3.05)),
+    float(os.getenv("PAYMENT_GATEWAY_READ_TIMEOUT", 10)),
+)
+PAYMENT_GATEWAY_RETRIES = int(os.getenv("PAYMENT_GATEWAY_RETRIES", 2))
+PAYMENT_GATEWAY_POOL_SIZE = int(os.getenv("PAYMENT_GATEWAY_POOL_SIZE", 10))
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
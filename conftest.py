@@ -0,0 +1,16 @@
+"""
+Test database setup that ``--nomigrations`` skips: the search shadow tables
+exist only in a ``RunSQL`` migration, so apply its operations here.
+"""
+from importlib import import_module
+
+import pytest
+from django.db import connection
+
+
+@pytest.fixture(scope="session")
+def django_db_setup(django_db_setup, django_db_blocker):
+    shadow_tables = import_module("store.migrations.0004_search_shadow_tables")
+    with django_db_blocker.unblock(), connection.schema_editor() as schema_editor:
+        for operation in shadow_tables.Migration.operations:
+            operation.database_forwards("store", schema_editor, None, None)
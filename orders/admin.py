@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from .models import Coupon, InventoryLog, Order, OrderEvent, OrderItem, Payment
+from .models import Coupon, InventoryLog, Order, OrderEvent, OrderItem, Payment, StockHold, WebhookEvent
+from .webhooks import replay_events
 
 
 class OrderItemInline(admin.TabularInline):
@@ -20,3 +21,21 @@ admin.site.register(Coupon)
 admin.site.register(Payment)
 admin.site.register(InventoryLog)
 admin.site.register(OrderEvent)
+
+
+@admin.register(StockHold)
+class StockHoldAdmin(admin.ModelAdmin):
+    list_display = ("product", "cart", "quantity", "expires_at")
+    list_select_related = ("product",)
+
+
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = ("event_id", "provider", "event_type", "order_reference", "status", "attempts", "occurred_at")
+    list_filter = ("provider", "status", "event_type")
+    search_fields = ("event_id", "order_reference")
+    actions = ["replay"]
+
+    @admin.action(description="Replay selected events")
+    def replay(self, request, queryset):
+        self.message_user(request, f"Replayed {replay_events(queryset)} event(s).")
@@ -1,10 +1,12 @@
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
 from accounts.models import Address
 from cart.services import get_cart
+from .inventory import OutOfStock, hold_stock
 from .models import Payment
 from .serializers import CheckoutSerializer, OrderSerializer
 from .services import create_order_from_cart, initiate_payment
@@ -15,7 +17,7 @@ class OrderViewSet(viewsets.ModelViewSet):
     serializer_class = OrderSerializer
 
     def get_queryset(self):
-        return self.request.user.orders.prefetch_related("items__product")
+        return self.request.user.orders.with_latest_payment().prefetch_related("items__product")
 
     @action(detail=False, methods=["post"])
     def checkout(self, request):
@@ -23,16 +25,32 @@ class OrderViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         address = Address.objects.get(pk=serializer.validated_data["address_id"], user=request.user)
         cart = get_cart(request)
-        order = create_order_from_cart(
-            request.user,
-            address,
-            cart,
-            serializer.validated_data.get("coupon_code"),
-            serializer.validated_data["delivery_fee"],
-        )
+        try:
+            order = create_order_from_cart(
+                request.user,
+                address,
+                cart,
+                serializer.validated_data.get("coupon_code"),
+                serializer.validated_data["delivery_fee"],
+            )
+        except OutOfStock as exc:
+            raise ValidationError({"detail": str(exc), "out_of_stock": exc.titles})
         payment_method = str(serializer.validated_data.get("payment_method") or Payment.Provider.COD)
         payload = initiate_payment(order, payment_method)
         data = OrderSerializer(order).data
         data["payment"] = payload
         return Response(data, status=status.HTTP_201_CREATED)
 
+    @action(detail=False, methods=["post"])
+    def hold(self, request):
+        """Reserve the cart's stock for ``STOCK_HOLD_SECONDS`` ahead of checkout."""
+        try:
+            holds = hold_stock(get_cart(request))
+        except OutOfStock as exc:
+            raise ValidationError({"detail": str(exc), "out_of_stock": exc.titles})
+        return Response(
+            {
+                "expires_at": holds[0].expires_at if holds else None,
+                "items": [{"product_id": hold.product_id, "quantity": hold.quantity} for hold in holds],
+            }
+        )
@@ -0,0 +1,79 @@
+"""
+Post-commit, batched Celery task publishing.
+
+``enqueue(signature)`` holds a task back until the surrounding transaction
+commits, so a worker never reads rows that are not committed yet or were
+rolled back. Tasks dropped with a rolled-back savepoint are never sent.
+Committed signatures are collected by the outermost ``collect_tasks()``
+scope, which is every request through ``TaskBatchMiddleware``, and published
+together as one group when the scope exits. Outside any scope each task is
+published as soon as it commits.
+"""
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+
+from celery import group
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+_collected = ContextVar("collected_tasks", default=None)
+
+
+def publish(signatures: list):
+    """Send ``signatures`` to the broker in one go; failures are logged, not raised."""
+    if not signatures:
+        return
+    try:
+        if len(signatures) == 1:
+            signatures[0].apply_async()
+        else:
+            group(signatures).apply_async()
+    except Exception:
+        # The data is committed already; a lost notification must not fail the request.
+        logger.exception("Could not publish %d task(s)", len(signatures))
+
+
+def _committed(signature):
+    collected = _collected.get()
+    if collected is None:
+        publish([signature])
+    else:
+        collected.append(signature)
+
+
+def enqueue(signature, using=None):
+    """Publish ``signature`` (e.g. ``task.si(...)``) once the current transaction commits."""
+    transaction.on_commit(partial(_committed, signature), using=using)
+
+
+@contextmanager
+def collect_tasks():
+    """
+    Publish the tasks committed inside the block as one batch when it exits.
+    Nested scopes leave the work to the outermost one.
+    """
+    if _collected.get() is not None:
+        yield
+        return
+    token = _collected.set([])
+    try:
+        yield
+    finally:
+        signatures = _collected.get()
+        _collected.reset(token)
+        if signatures:
+            publish(signatures)
+
+
+class TaskBatchMiddleware:
+    """Collect every task a request commits and publish them after the response is built."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with collect_tasks():
+            return self.get_response(request)
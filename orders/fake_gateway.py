@@ -0,0 +1,186 @@
+"""
+Local stand-in for the Stripe and Razorpay endpoints used by
+``orders.payment_gateways``, for tests and latency benchmarks.
+
+It answers ``POST /v1/payment_intents`` and ``POST /v1/orders`` after an
+optional delay, replays responses for a repeated ``Idempotency-Key``, can
+fail the first requests with 503, and counts requests and TCP connections
+so tests can check retries and connection reuse. ``stripe_webhook`` and
+``razorpay_webhook`` build signed webhook deliveries. Standard library only::
+
+    python -m orders.fake_gateway --port 8765 --latency 0.1
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so pooled clients can reuse connections
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+    def setup(self):
+        super().setup()
+        self.server.fake.count("connections")
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        fake = self.server.fake
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        number = fake.count("requests")
+        time.sleep(fake.latency)
+        if number <= fake.fail_first:
+            return self._reply(503, {"error": {"message": "Injected failure"}})
+        key = self.headers.get("Idempotency-Key")
+        with fake.lock:
+            if key and key in fake.replies:
+                return self._reply(200, fake.replies[key])
+        if self.path == "/v1/payment_intents":
+            reply = self._payment_intent(dict(parse_qsl(body.decode())), number)
+        elif self.path == "/v1/orders":
+            reply = self._order(json.loads(body or b"{}"), number)
+        else:
+            return self._reply(404, {"error": {"message": "Unknown endpoint"}})
+        if key:
+            with fake.lock:
+                reply = fake.replies.setdefault(key, reply)
+        self._reply(200, reply)
+
+    @staticmethod
+    def _payment_intent(data: dict, number: int) -> dict:
+        intent_id = f"pi_fake_{number}"
+        return {
+            "id": intent_id,
+            "object": "payment_intent",
+            "amount": int(data.get("amount", 0)),
+            "currency": data.get("currency", "inr"),
+            "client_secret": f"{intent_id}_secret_fake",
+            "description": data.get("description", ""),
+            "metadata": {key[9:-1]: value for key, value in data.items() if key.startswith("metadata[")},
+            "status": "requires_payment_method",
+        }
+
+    @staticmethod
+    def _order(data: dict, number: int) -> dict:
+        return {
+            "id": f"order_fake_{number}",
+            "entity": "order",
+            "amount": data.get("amount", 0),
+            "currency": data.get("currency", "INR"),
+            "receipt": data.get("receipt"),
+            "notes": data.get("notes", {}),
+            "status": "created",
+        }
+
+    def _reply(self, status: int, payload: dict):
+        body = json.dumps(payload).encode()
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except ConnectionError:
+            # The client gave up (timeout tests); nothing left to answer.
+            self.close_connection = True
+
+
+class FakeGatewayServer:
+    """Threaded fake gateway; ``start()`` serves in the background on ``url``."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, fail_first: int = 0):
+        self.latency = latency
+        self.fail_first = fail_first
+        self.replies: dict[str, dict] = {}
+        self.totals: dict[str, int] = {}
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.fake = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, name: str) -> int:
+        with self.lock:
+            self.totals[name] = self.totals.get(name, 0) + 1
+            return self.totals[name]
+
+    @property
+    def requests(self) -> int:
+        return self.totals.get("requests", 0)
+
+    @property
+    def connections(self) -> int:
+        return self.totals.get("connections", 0)
+
+    def reset(self, fail_first: int = 0):
+        with self.lock:
+            self.totals.clear()
+            self.replies.clear()
+        self.fail_first = fail_first
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="fake-gateway", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def _hmac(secret: str, message: bytes) -> str:
+    return hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+def stripe_webhook(secret: str, event: dict, timestamp: int | None = None) -> tuple[bytes, dict]:
+    """``(body, headers)`` for a Stripe delivery of ``event`` signed with ``secret``."""
+    body = json.dumps(event).encode()
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    signature = _hmac(secret, f"{timestamp}.".encode() + body)
+    return body, {"Stripe-Signature": f"t={timestamp},v1={signature}"}
+
+
+def razorpay_webhook(secret: str, event: dict, event_id: str = "") -> tuple[bytes, dict]:
+    """``(body, headers)`` for a Razorpay delivery of ``event`` signed with ``secret``."""
+    body = json.dumps(event).encode()
+    headers = {"X-Razorpay-Signature": _hmac(secret, body)}
+    if event_id:
+        headers["X-Razorpay-Event-Id"] = event_id
+    return body, headers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Stripe/Razorpay API for local testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before each reply")
+    parser.add_argument("--fail-first", type=int, default=0, help="Answer the first N requests with 503")
+    options = parser.parse_args()
+    server = FakeGatewayServer(options.host, options.port, options.latency, options.fail_first)
+    print(f"Fake payment gateway on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
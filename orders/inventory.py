@@ -0,0 +1,161 @@
+"""
+Stock reservation.
+
+Stock leaves ``Product.stock`` the moment it is reserved, either by a
+checkout or by a time-limited ``StockHold`` placed while a shopper is on the
+checkout page. Every writer first locks the product rows it touches in
+primary-key order, so concurrent checkouts queue behind each other instead
+of deadlocking. The decrement itself is a conditional ``UPDATE ... WHERE
+stock >= n``, which cannot oversell even where ``FOR UPDATE`` is a no-op
+(SQLite). Expired holds go back to stock through ``release_expired_holds``.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Q, When
+from django.utils import timezone
+
+from store.models import Product
+from store.result_cache import ResultPageCache
+
+from .models import StockHold
+
+
+class OutOfStock(ValueError):
+    def __init__(self, titles: list[str]):
+        self.titles = titles
+        verb = "is" if len(titles) == 1 else "are"
+        super().__init__(f"{', '.join(titles)} {verb} out of stock.")
+
+
+def lock_products(product_ids, *fields: str) -> dict[int, Product]:
+    """Lock ``product_ids`` in primary-key order and return them (``fields`` only)."""
+    return Product.objects.select_for_update().only(*fields).order_by("pk").in_bulk(list(product_ids))
+
+
+def _stock_changed(product_ids):
+    product_ids = list(product_ids)
+
+    def bump():
+        for product_id in product_ids:
+            ResultPageCache.bump_product(product_id)
+
+    transaction.on_commit(bump)
+
+
+def _shift_stock(deltas: dict[int, int], condition: Q) -> int:
+    return Product.objects.filter(condition).update(
+        stock=Case(
+            *(When(pk=product_id, then=F("stock") + delta) for product_id, delta in deltas.items()),
+            output_field=PositiveIntegerField(),
+        )
+    )
+
+
+@transaction.atomic
+def take_stock(quantities: dict[int, int], products: dict[int, Product] | None = None) -> dict[int, Product]:
+    """
+    Take ``quantities`` off stock in one conditional UPDATE, or raise
+    ``OutOfStock`` naming every product that is short.
+
+    ``products`` are rows already locked with ``lock_products``; the locked
+    rows (with their stock before the update) are returned.
+    """
+    quantities = {product_id: quantity for product_id, quantity in quantities.items() if quantity > 0}
+    if products is None:
+        products = lock_products(quantities, "title", "stock")
+    if not quantities:
+        return products
+    short = [
+        products[product_id].title if product_id in products else f"Product #{product_id}"
+        for product_id, quantity in sorted(quantities.items())
+        if product_id not in products or products[product_id].stock < quantity
+    ]
+    if short:
+        raise OutOfStock(short)
+    enough = Q()
+    for product_id, quantity in quantities.items():
+        enough |= Q(pk=product_id, stock__gte=quantity)
+    deltas = {product_id: -quantity for product_id, quantity in quantities.items()}
+    if _shift_stock(deltas, enough) != len(quantities):
+        # Only reachable without row locks: another writer got there first.
+        raise OutOfStock([products[product_id].title for product_id in sorted(quantities)])
+    _stock_changed(quantities)
+    return products
+
+
+@transaction.atomic
+def return_stock(quantities: dict[int, int]):
+    quantities = {product_id: quantity for product_id, quantity in quantities.items() if quantity > 0}
+    if not quantities:
+        return
+    lock_products(quantities, "pk")
+    _shift_stock(quantities, Q(pk__in=quantities))
+    _stock_changed(quantities)
+
+
+def _held(holds) -> dict[int, int]:
+    held = Counter()
+    for product_id, quantity in holds.values_list("product_id", "quantity"):
+        held[product_id] += quantity
+    return dict(held)
+
+
+@transaction.atomic
+def hold_stock(cart, seconds: int | None = None) -> list[StockHold]:
+    """
+    Reserve ``cart``'s quantities for ``seconds`` (``STOCK_HOLD_SECONDS``).
+
+    Calling it again moves only the difference against the cart's current
+    holds and renews their expiry. Raises ``OutOfStock`` without holding
+    anything if a line cannot be covered.
+    """
+    seconds = settings.STOCK_HOLD_SECONDS if seconds is None else seconds
+    holds = StockHold.objects.select_for_update().filter(cart=cart)
+    held = _held(holds)
+    wanted = cart.quantities()
+    products = lock_products(set(held) | set(wanted), "title", "stock")
+    take_stock({product_id: quantity - held.get(product_id, 0) for product_id, quantity in wanted.items()}, products)
+    return_stock({product_id: quantity - wanted.get(product_id, 0) for product_id, quantity in held.items()})
+    holds.delete()
+    expires_at = timezone.now() + timedelta(seconds=seconds)
+    return StockHold.objects.bulk_create(
+        StockHold(cart=cart, product_id=product_id, quantity=quantity, expires_at=expires_at)
+        for product_id, quantity in wanted.items()
+    )
+
+
+def holds_cover(cart) -> bool:
+    """Whether ``cart`` has unexpired holds for exactly its current quantities."""
+    holds = StockHold.objects.filter(cart=cart, expires_at__gt=timezone.now())
+    return _held(holds) == cart.quantities()
+
+
+@transaction.atomic
+def consume_holds(cart) -> dict[int, int]:
+    """Remove ``cart``'s holds without returning their stock; ``{product_id: held quantity}``."""
+    holds = StockHold.objects.select_for_update().filter(cart=cart)
+    held = _held(holds)
+    if held:
+        holds.delete()
+    return held
+
+
+@transaction.atomic
+def release_holds(holds) -> int:
+    """Put the stock of ``holds`` (a queryset) back and delete them."""
+    holds = list(holds.select_for_update(skip_locked=True).values_list("pk", "product_id", "quantity"))
+    if not holds:
+        return 0
+    returned = Counter()
+    for _, product_id, quantity in holds:
+        returned[product_id] += quantity
+    return_stock(returned)
+    StockHold.objects.filter(pk__in=[pk for pk, _, _ in holds]).delete()
+    return len(holds)
+
+
+def release_expired_holds(now=None) -> int:
+    return release_holds(StockHold.objects.filter(expires_at__lte=now or timezone.now()))
@@ -0,0 +1,109 @@
+"""
+Management command that runs concurrent checkouts against one scarce product
+and reports throughput and oversell.
+
+Fixture rows are committed (worker threads need to see them) and deleted
+afterwards. Order emails and stock alerts are not sent.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+
+from accounts.models import Address
+from cart.models import Cart, CartItem
+from orders.inventory import OutOfStock
+from orders.models import Order
+from orders.services import create_order_from_cart
+from store.models import Category, Product
+
+PREFIX = "checkout-benchmark"
+
+
+class Command(BaseCommand):
+    help = "Run concurrent checkouts for one product and report throughput and oversell"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--shoppers", type=int, default=200)
+        parser.add_argument("--workers", type=int, default=8)
+        parser.add_argument("--stock", type=int, default=50)
+        parser.add_argument("--quantity", type=int, default=1)
+        parser.add_argument("--retries", type=int, default=100, help="Retries per checkout on lock timeouts")
+
+    def handle(self, *args, **options):
+        product, shoppers = self._fixtures(options["shoppers"], options["stock"], options["quantity"])
+        outcomes = {"placed": 0, "rejected": 0, "failed": 0}
+        try:
+            started = time.perf_counter()
+            with mock.patch.multiple(
+                "orders.services", send_order_created_email=mock.DEFAULT, send_low_stock_alert=mock.DEFAULT
+            ), ThreadPoolExecutor(options["workers"]) as pool:
+                for outcome in pool.map(lambda shopper: self._checkout(shopper, options["retries"]), shoppers):
+                    outcomes[outcome] += 1
+            elapsed = time.perf_counter() - started
+            product.refresh_from_db(fields=["stock"])
+            sold = outcomes["placed"] * options["quantity"]
+            oversold = max(0, sold - options["stock"])
+            self.stdout.write(
+                f"{outcomes['placed']} placed, {outcomes['rejected']} out of stock, {outcomes['failed']} failed "
+                f"in {elapsed:.2f}s ({len(shoppers) / elapsed:.1f} checkouts/s)"
+            )
+            self.stdout.write(f"stock {options['stock']} -> {product.stock}, sold {sold}, oversold {oversold}")
+            if oversold or sold + product.stock != options["stock"]:
+                self.stderr.write(self.style.ERROR("Stock does not add up"))
+        finally:
+            self._cleanup()
+
+    @staticmethod
+    def _checkout(shopper, retries: int) -> str:
+        user, address, cart = shopper
+        try:
+            for _ in range(retries + 1):
+                try:
+                    create_order_from_cart(user, address, cart)
+                    return "placed"
+                except OutOfStock:
+                    return "rejected"
+                except OperationalError:
+                    # SQLite answers concurrent writers with "database is locked".
+                    time.sleep(0.01)
+            return "failed"
+        finally:
+            connection.close()
+
+    def _fixtures(self, count: int, stock: int, quantity: int):
+        category = Category.objects.create(name="Checkout benchmark", slug=PREFIX)
+        product = Product.objects.create(
+            title="Checkout benchmark product", slug=PREFIX, description="Benchmark product",
+            price=Decimal("10.00"), stock=stock, sku=f"{PREFIX}-0", category=category,
+        )
+        users = get_user_model().objects.bulk_create(
+            get_user_model()(username=f"{PREFIX}-{number}", email=f"{PREFIX}-{number}@example.com")
+            for number in range(count)
+        )
+        addresses = Address.objects.bulk_create(
+            Address(
+                user=user, full_name="Bench", phone_number="100", address_line_1="1 Road", city="City",
+                state="State", postal_code="100001",
+            )
+            for user in users
+        )
+        carts = Cart.objects.bulk_create(Cart(user=user) for user in users)
+        CartItem.objects.bulk_create(
+            CartItem(cart=cart, product=product, quantity=quantity, unit_price=product.price) for cart in carts
+        )
+        return product, list(zip(users, addresses, carts))
+
+    @staticmethod
+    def _cleanup():
+        users = get_user_model().objects.filter(username__startswith=PREFIX)
+        Order.objects.filter(user__in=users).delete()
+        Cart.objects.filter(user__in=users).delete()
+        Address.objects.filter(user__in=users).delete()
+        users.delete()
+        Product.objects.filter(slug=PREFIX).delete()
+        Category.objects.filter(slug=PREFIX).delete()
@@ -0,0 +1,64 @@
+"""
+Management command to time payment intent creation against the local fake
+gateway: a new client per call (the old behaviour), the pooled client, and
+the async variant issuing calls concurrently.
+"""
+import asyncio
+import time
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from orders.fake_gateway import FakeGatewayServer
+from orders.payment_gateways import (
+    GatewayClient,
+    acreate_stripe_payment_intent,
+    create_stripe_payment_intent,
+    reset_clients,
+)
+
+
+class Command(BaseCommand):
+    help = "Benchmark gateway calls against a local fake gateway: unpooled, pooled and async"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--calls", type=int, default=50)
+        parser.add_argument("--latency", type=float, default=0.05, help="Fake gateway delay per request, seconds")
+
+    def handle(self, *args, **options):
+        calls = options["calls"]
+        orders = [SimpleNamespace(pk=number, id=number, total=Decimal("10.00")) for number in range(1, calls + 1)]
+        with FakeGatewayServer(latency=options["latency"]) as server, override_settings(
+            PAYMENT_GATEWAYS={"stripe": {"secret_key": "sk_test_benchmark", "api_base": server.url}}
+        ):
+            cases = [
+                ("unpooled", lambda: [self._unpooled(server.url, order) for order in orders]),
+                ("pooled", lambda: [create_stripe_payment_intent(order) for order in orders]),
+                ("async", lambda: asyncio.run(self._concurrent(orders))),
+            ]
+            for label, run in cases:
+                server.reset()
+                started = time.perf_counter()
+                run()
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"{label:<9} {elapsed * 1000 / calls:7.1f} ms/call  {calls / elapsed:7.1f} calls/s  "
+                    f"{server.connections} connection(s)"
+                )
+        reset_clients()
+
+    @staticmethod
+    def _unpooled(url, order):
+        client = GatewayClient(
+            "stripe", url, ("sk_test_benchmark", ""), retry_posts=True, timeout=10, retries=0, pool_size=1
+        )
+        try:
+            return client.post("/v1/payment_intents", data={"amount": 1000, "metadata[order_id]": order.id})
+        finally:
+            client.close()
+
+    @staticmethod
+    async def _concurrent(orders):
+        return await asyncio.gather(*(acreate_stripe_payment_intent(order) for order in orders))
@@ -0,0 +1,109 @@
+"""
+Management command to time webhook ingestion through ``PaymentWebhookView``
+(signature check and inbox insert, duplicates included) and then the
+batched processing of the stored events.
+
+Everything runs inside a transaction that is rolled back at the end, with
+test webhook secrets, so no rows are left behind and no tasks are published.
+"""
+import time
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from django.test.utils import override_settings
+
+from accounts.models import Address
+from orders.fake_gateway import stripe_webhook
+from orders.models import Order, WebhookEvent
+from orders.views import PaymentWebhookView
+from orders.webhooks import process_pending_events
+
+SECRET = "whsec_benchmark"
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Benchmark webhook ingestion and processing (rolled back afterwards)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=50)
+        parser.add_argument("--events", type=int, default=4, help="Events per order")
+        parser.add_argument("--duplicates", type=int, default=1, help="Extra deliveries of each event")
+
+    def handle(self, *args, **options):
+        settings = {
+            "stripe": {"secret_key": "sk_test_benchmark", "webhook_secret": SECRET},
+            "razorpay": {},
+        }
+        try:
+            with override_settings(PAYMENT_GATEWAYS=settings), mock.patch("orders.services.send_order_receipt_email"), \
+                    mock.patch("orders.dispatch.publish"), transaction.atomic():
+                self._run(options)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _run(self, options):
+        deliveries = self._deliveries(self._orders(options["orders"]), options["events"])
+        deliveries *= options["duplicates"] + 1
+        view = PaymentWebhookView.as_view()
+        factory = RequestFactory()
+        started = time.perf_counter()
+        statuses = [
+            view(
+                factory.post(
+                    "/orders/webhook/stripe/", body, content_type="application/json",
+                    headers=headers,
+                ),
+                provider="stripe",
+            ).status_code
+            for body, headers in deliveries
+        ]
+        ingest = time.perf_counter() - started
+        stored = WebhookEvent.objects.count()
+        self.stdout.write(
+            f"ingest   {len(deliveries)} deliveries in {ingest:.2f}s ({len(deliveries) / ingest:.0f}/s), "
+            f"{stored} stored, {statuses.count(200)} acknowledged"
+        )
+        started = time.perf_counter()
+        handled = process_pending_events()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"process  {handled} events in {elapsed:.2f}s ({handled / elapsed:.0f}/s)")
+
+    @staticmethod
+    def _orders(count: int) -> list[Order]:
+        user = get_user_model().objects.create_user(
+            username="webhook-benchmark", email="webhook-benchmark@example.com", password="x"
+        )
+        address = Address.objects.create(
+            user=user, full_name="Benchmark", phone_number="0000000000", address_line_1="1 Test Street",
+            city="Pune", state="MH", postal_code="411001",
+        )
+        return Order.objects.bulk_create(
+            Order(user=user, shipping_address=address, subtotal=Decimal("10.00"), total=Decimal("10.00"))
+            for _ in range(count)
+        )
+
+    @staticmethod
+    def _deliveries(orders, per_order: int) -> list[tuple[bytes, dict]]:
+        deliveries = []
+        for order in orders:
+            for number in range(per_order):
+                succeeded = number == per_order - 1
+                event = {
+                    "id": f"evt_{order.pk}_{number}",
+                    "type": "payment_intent.succeeded" if succeeded else "payment_intent.payment_failed",
+                    "created": 1_700_000_000 + number,
+                    "data": {"object": {
+                        "id": f"pi_{order.pk}", "amount": 1000, "metadata": {"order_id": str(order.pk)},
+                    }},
+                }
+                deliveries.append(stripe_webhook(SECRET, event))
+        return deliveries
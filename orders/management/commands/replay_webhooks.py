@@ -0,0 +1,53 @@
+"""
+Management command to re-run stored payment webhooks, e.g. failed ones
+after a fix is deployed, without asking the gateway to redeliver them.
+"""
+from django.core.management.base import BaseCommand
+from django.utils.dateparse import parse_datetime
+
+from orders.dispatch import enqueue
+from orders.models import WebhookEvent
+from orders.tasks import process_order_webhooks
+from orders.webhooks import replay_events
+
+
+class Command(BaseCommand):
+    help = "Reset stored webhook events to pending and apply them again"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--status", default=WebhookEvent.Status.FAILED, choices=WebhookEvent.Status.values)
+        parser.add_argument("--provider")
+        parser.add_argument("--event-id", dest="event_ids", action="append", default=[])
+        parser.add_argument("--order", help="Order id the events refer to")
+        parser.add_argument("--since", help="Only events received at or after this ISO datetime")
+        parser.add_argument("--dry-run", action="store_true")
+        parser.add_argument("--async", dest="run_async", action="store_true", help="Queue Celery tasks instead")
+
+    def handle(self, *args, **options):
+        events = WebhookEvent.objects.all()
+        if not options["event_ids"]:
+            events = events.filter(status=options["status"])
+        else:
+            events = events.filter(event_id__in=options["event_ids"])
+        if options["provider"]:
+            events = events.filter(provider=options["provider"].lower())
+        if options["order"]:
+            events = events.filter(order_reference=options["order"])
+        if options["since"]:
+            events = events.filter(received_at__gte=parse_datetime(options["since"]))
+
+        if options["dry_run"]:
+            for event in events.order_by("occurred_at"):
+                self.stdout.write(f"{event.provider} {event.event_id} {event.event_type} order={event.order_reference}")
+            self.stdout.write(f"{events.count()} event(s) would be replayed")
+            return
+
+        if options["run_async"]:
+            references = set(events.values_list("order_reference", flat=True))
+            count = events.update(status=WebhookEvent.Status.PENDING, error="", processed_at=None)
+            for reference in references:
+                if reference:
+                    enqueue(process_order_webhooks.si(reference))
+            self.stdout.write(self.style.SUCCESS(f"Queued {count} event(s)"))
+            return
+        self.stdout.write(self.style.SUCCESS(f"Replayed {replay_events(events)} event(s)"))
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.14 on 2026-10-17 05:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_stock_hold'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider', models.CharField(choices=[('stripe', 'Stripe'), ('razorpay', 'Razorpay'), ('cod', 'Cash on Delivery')], max_length=30)),
+                ('event_id', models.CharField(max_length=120)),
+                ('event_type', models.CharField(blank=True, max_length=80)),
+                ('order_reference', models.CharField(blank=True, max_length=40)),
+                ('payload', models.JSONField(default=dict)),
+                ('occurred_at', models.DateTimeField()),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processed', 'Processed'), ('skipped', 'Skipped'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['order_reference', 'status', 'occurred_at'], name='webhook_order_status_idx')],
+                'unique_together': {('provider', 'event_id')},
+            },
+        ),
+    ]
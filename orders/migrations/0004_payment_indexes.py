@@ -0,0 +1,21 @@
+# Generated by Django 5.0.14 on 2026-10-17 05:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_webhook_event'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['order', '-created_at'], name='payment_order_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['provider', 'transaction_id'], name='payment_provider_txn_idx'),
+        ),
+    ]
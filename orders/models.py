@@ -48,6 +48,20 @@ class Coupon(models.Model):
         return discount
 
 
+class OrderQuerySet(models.QuerySet):
+    def with_latest_payment(self):
+        """
+        Annotate ``latest_payment_status`` and ``latest_payment_provider`` from
+        the newest payment (``None`` without one), read off the
+        ``payment_order_created_idx`` index instead of a query per order.
+        """
+        latest = Payment.objects.filter(order=models.OuterRef("pk")).order_by("-created_at", "-pk")
+        return self.annotate(
+            latest_payment_status=models.Subquery(latest.values("status")[:1]),
+            latest_payment_provider=models.Subquery(latest.values("provider")[:1]),
+        )
+
+
 class Order(models.Model):
     class Status(models.TextChoices):
         CREATED = "created", "Created"
@@ -71,12 +85,17 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = OrderQuerySet.as_manager()
+
     def __str__(self):
         return f"Order #{self.pk}"
 
     @property
     def payment_status(self):
-        payment = self.payments.order_by("-created_at").first()
+        """Status of the newest payment; free on ``Order.objects.with_latest_payment()`` rows."""
+        if hasattr(self, "latest_payment_status"):
+            return self.latest_payment_status or "pending"
+        payment = self.payments.order_by("-created_at", "-pk").first()
         return payment.status if payment else "pending"
 
 
@@ -113,6 +132,14 @@ class Payment(models.Model):
     payload = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Newest payment per order (OrderQuerySet.with_latest_payment).
+            models.Index(fields=["order", "-created_at"], name="payment_order_created_idx"),
+            # Gateway references (record_payment, webhooks).
+            models.Index(fields=["provider", "transaction_id"], name="payment_provider_txn_idx"),
+        ]
+
 
 class InventoryLog(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
@@ -121,6 +148,52 @@ class InventoryLog(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
 
+class StockHold(models.Model):
+    """Stock taken off ``Product.stock`` for a cart while it checks out; see orders.inventory."""
+
+    product = models.ForeignKey(Product, related_name="stock_holds", on_delete=models.CASCADE)
+    # Kept when the cart goes away so the expiry sweep still returns the stock.
+    cart = models.ForeignKey("cart.Cart", related_name="stock_holds", null=True, on_delete=models.SET_NULL)
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("cart", "product")
+
+
+class WebhookEvent(models.Model):
+    """A verified gateway webhook, stored as received and applied later; see orders.webhooks."""
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        PROCESSED = "processed", "Processed"
+        SKIPPED = "skipped", "Skipped"
+        FAILED = "failed", "Failed"
+
+    provider = models.CharField(max_length=30, choices=Payment.Provider.choices)
+    event_id = models.CharField(max_length=120)
+    event_type = models.CharField(max_length=80, blank=True)
+    # Raw order id from the event; the order may not exist.
+    order_reference = models.CharField(max_length=40, blank=True)
+    payload = models.JSONField(default=dict)
+    occurred_at = models.DateTimeField()
+    received_at = models.DateTimeField(auto_now_add=True)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ("provider", "event_id")
+        indexes = [
+            models.Index(fields=["order_reference", "status", "occurred_at"], name="webhook_order_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.provider} {self.event_type} {self.event_id}"
+
+
 class OrderEvent(models.Model):
     order = models.ForeignKey(Order, related_name="events", on_delete=models.CASCADE)
     status = models.CharField(max_length=20)
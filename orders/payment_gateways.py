@@ -1,7 +1,31 @@
+"""
+Payment gateway clients.
+
+Stripe PaymentIntents and Razorpay orders are created through each
+gateway's REST API with one pooled ``requests.Session`` per gateway and
+process. Connections are kept alive, every call has (connect, read)
+timeouts, and failed attempts are retried with exponential backoff. Stripe
+requests carry an ``Idempotency-Key`` derived from the order, so retries and
+repeated checkouts return the same PaymentIntent. Razorpay has no such
+header, so its calls are only retried when the request never reached the
+server, and the same key is sent as the order ``receipt``.
+
+The ``a*`` variants are coroutines for ASGI code: they run the pooled
+clients on a bounded thread pool, so the event loop never waits on a
+gateway. Webhook signatures are still verified with the official SDKs.
+"""
+import asyncio
+import hashlib
 import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
 
+import requests
 from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 try:
     import stripe
@@ -14,22 +38,174 @@ except ImportError:  # pragma: no cover
     razorpay = None
 
 
+DEFAULT_API_BASES = {
+    "stripe": "https://api.stripe.com",
+    "razorpay": "https://api.razorpay.com",
+}
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class GatewayError(ValueError):
+    """A gateway call failed after retries; ``str()`` is safe to show to shoppers."""
+
+    def __init__(self, provider: str, status: int | None = None, detail: str = ""):
+        self.provider = provider
+        self.status = status
+        self.detail = detail
+        super().__init__(f"{provider.title()} is not responding right now. Please try again.")
+
+
 def _paise(amount: Decimal) -> int:
     return int(Decimal(amount) * 100)
 
 
+def idempotency_key(order, provider: str) -> str:
+    """Stable per order, gateway and amount; a changed total gets a new key."""
+    digest = hashlib.sha256(f"{provider}:{order.pk}:{_paise(order.total)}".encode()).hexdigest()
+    return f"order-{order.pk}-{digest[:16]}"
+
+
+class GatewayClient:
+    """Keep-alive HTTP client for one gateway API, with timeouts and retries."""
+
+    def __init__(self, provider: str, base_url: str, auth, *, retry_posts: bool, timeout, retries: int, pool_size: int):
+        self.provider = provider
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        retry = Retry(
+            total=retries,
+            backoff_factor=0.5,
+            status_forcelist=RETRY_STATUSES,
+            # POSTs are only replayed when the request is idempotent on the gateway side;
+            # connection errors (nothing was sent) are retried either way.
+            allowed_methods=Retry.DEFAULT_ALLOWED_METHODS | {"POST"} if retry_posts else Retry.DEFAULT_ALLOWED_METHODS,
+            raise_on_status=False,
+        )
+        self.session = requests.Session()
+        self.session.auth = auth
+        self.session.mount(self.base_url, HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry))
+
+    def post(self, path: str, *, data=None, json=None, idempotency_key: str | None = None) -> dict:
+        headers = {"Idempotency-Key": idempotency_key} if idempotency_key else None
+        try:
+            response = self.session.post(
+                f"{self.base_url}{path}", data=data, json=json, headers=headers, timeout=self.timeout
+            )
+        except requests.RequestException as exc:
+            raise GatewayError(self.provider, detail=str(exc)) from exc
+        if response.status_code >= 400:
+            raise GatewayError(self.provider, response.status_code, response.text[:500])
+        return response.json()
+
+    def close(self):
+        self.session.close()
+
+
+_clients: dict[str, GatewayClient | None] = {}
+_executor = None
+_owner_pid = None
+_lock = threading.Lock()
+
+
+def _build_client(provider: str) -> GatewayClient | None:
+    creds = settings.PAYMENT_GATEWAYS.get(provider, {})
+    if provider == "stripe":
+        if not creds.get("secret_key"):
+            return None
+        auth = (creds["secret_key"], "")
+    else:
+        if not creds.get("key_id") or not creds.get("key_secret"):
+            return None
+        auth = (creds["key_id"], creds["key_secret"])
+    return GatewayClient(
+        provider,
+        creds.get("api_base") or DEFAULT_API_BASES[provider],
+        auth,
+        retry_posts=provider == "stripe",
+        timeout=settings.PAYMENT_GATEWAY_TIMEOUT,
+        retries=settings.PAYMENT_GATEWAY_RETRIES,
+        pool_size=settings.PAYMENT_GATEWAY_POOL_SIZE,
+    )
+
+
+def _check_owner():
+    # Pooled sockets and threads must not be shared with forked workers.
+    global _executor, _owner_pid
+    if _owner_pid != os.getpid():
+        _clients.clear()
+        _executor = None
+        _owner_pid = os.getpid()
+
+
+def get_client(provider: str) -> GatewayClient | None:
+    """The process-wide client for ``provider``, or ``None`` if it is not configured."""
+    with _lock:
+        _check_owner()
+        if provider not in _clients:
+            _clients[provider] = _build_client(provider)
+        return _clients[provider]
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        _check_owner()
+        if _executor is None:
+            _executor = ThreadPoolExecutor(settings.PAYMENT_GATEWAY_POOL_SIZE, thread_name_prefix="payment-gateway")
+        return _executor
+
+
+def reset_clients():
+    """Close pooled connections; clients are rebuilt from settings on next use."""
+    with _lock:
+        for client in _clients.values():
+            if client is not None:
+                client.close()
+        _clients.clear()
+
+
 def create_stripe_payment_intent(order):
-    creds = settings.PAYMENT_GATEWAYS.get("stripe", {})
-    if not creds.get("secret_key") or stripe is None:
+    client = get_client("stripe")
+    if client is None:
+        return None
+    return client.post(
+        "/v1/payment_intents",
+        data={
+            "amount": _paise(order.total),
+            "currency": "inr",
+            "metadata[order_id]": order.id,
+            "description": f"{settings.APP_NAME} order #{order.id}",
+        },
+        idempotency_key=idempotency_key(order, "stripe"),
+    )
+
+
+def create_razorpay_order(order):
+    client = get_client("razorpay")
+    if client is None:
         return None
-    stripe.api_key = creds["secret_key"]
-    intent = stripe.PaymentIntent.create(
-        amount=_paise(order.total),
-        currency="inr",
-        metadata={"order_id": order.id},
-        description=f"{settings.APP_NAME} order #{order.id}",
+    return client.post(
+        "/v1/orders",
+        json={
+            "amount": _paise(order.total),
+            "currency": "INR",
+            "payment_capture": 1,
+            "receipt": idempotency_key(order, "razorpay"),
+            "notes": {"order_id": str(order.id)},
+        },
     )
-    return intent
+
+
+async def _in_pool(function, order):
+    return await asyncio.get_running_loop().run_in_executor(_get_executor(), function, order)
+
+
+async def acreate_stripe_payment_intent(order):
+    return await _in_pool(create_stripe_payment_intent, order)
+
+
+async def acreate_razorpay_order(order):
+    return await _in_pool(create_razorpay_order, order)
 
 
 def verify_stripe_event(payload: bytes, signature: str):
@@ -43,22 +219,6 @@ def verify_stripe_event(payload: bytes, signature: str):
         return None
 
 
-def create_razorpay_order(order):
-    creds = settings.PAYMENT_GATEWAYS.get("razorpay", {})
-    key_id = creds.get("key_id")
-    key_secret = creds.get("key_secret")
-    if not key_id or not key_secret or razorpay is None:
-        return None
-    client = razorpay.Client(auth=(key_id, key_secret))
-    data = {
-        "amount": _paise(order.total),
-        "currency": "INR",
-        "payment_capture": 1,
-        "notes": {"order_id": str(order.id)},
-    }
-    return client.order.create(data=data)
-
-
 def verify_razorpay_signature(payload: bytes, signature: str):
     creds = settings.PAYMENT_GATEWAYS.get("razorpay", {})
     secret = creds.get("webhook_secret") or creds.get("key_secret")
@@ -66,7 +226,7 @@ def verify_razorpay_signature(payload: bytes, signature: str):
         return None
     body = payload.decode("utf-8")
     try:
-        razorpay.Utility.verify_webhook_signature(body, signature, secret)
+        razorpay.Utility().verify_webhook_signature(body, signature, secret)
     except razorpay.errors.SignatureVerificationError:
         return None
     return json.loads(body)
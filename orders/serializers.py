@@ -1,6 +1,7 @@
 from rest_framework import serializers
 
 from accounts.serializers import AddressSerializer
+from store.compiled_serializers import CompiledSerializerMixin
 from store.serializers import ProductSerializer
 
 from .models import Order, OrderItem, Payment
@@ -14,7 +15,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
         fields = ("id", "product", "product_title", "quantity", "unit_price")
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(CompiledSerializerMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
     shipping_address = AddressSerializer()
 
@@ -23,6 +24,7 @@ class OrderSerializer(serializers.ModelSerializer):
         fields = (
             "id",
             "status",
+            "payment_status",
             "subtotal",
             "discount",
             "delivery_fee",
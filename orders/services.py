@@ -1,14 +1,22 @@
 from decimal import Decimal
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.db import transaction
 
 from accounts.models import Address
 from cart.models import Cart
-from store.models import Product
+from cart.services import cart_totals
 
+from .dispatch import collect_tasks, enqueue
+from .inventory import consume_holds, lock_products, return_stock, take_stock
 from .models import Coupon, InventoryLog, Order, OrderItem, Payment
-from .payment_gateways import create_razorpay_order, create_stripe_payment_intent
+from .payment_gateways import (
+    acreate_razorpay_order,
+    acreate_stripe_payment_intent,
+    create_razorpay_order,
+    create_stripe_payment_intent,
+)
 from .tasks import (
     send_low_stock_alert,
     send_order_created_email,
@@ -16,9 +24,26 @@ from .tasks import (
 )
 
 
+@collect_tasks()
 @transaction.atomic
 def create_order_from_cart(user, address: Address, cart: Cart, coupon_code: str | None = None, delivery_fee: Decimal = Decimal("0")):
-    subtotal = Decimal(cart.subtotal)
+    """
+    Turn ``cart`` into an order in a fixed number of statements, whatever
+    the cart size: one locked stock read, one conditional stock UPDATE and
+    one bulk INSERT each for order items and inventory logs. Stock already
+    held for the cart (``orders.inventory.hold_stock``) is used first.
+    Emails and low-stock alerts (one per product) are published as one
+    batch once the order commits. Raises ``OutOfStock`` if any line cannot be covered.
+    """
+    lines = list(cart.items.order_by("pk").values_list("product_id", "quantity", "unit_price"))
+    quantities = {product_id: quantity for product_id, quantity, _ in lines}
+    held = consume_holds(cart)
+    products = lock_products(set(quantities) | set(held), "title", "stock")
+    need = {product_id: quantity - held.get(product_id, 0) for product_id, quantity in quantities.items()}
+    take_stock(need, products)
+    return_stock({product_id: quantity - quantities.get(product_id, 0) for product_id, quantity in held.items()})
+
+    subtotal = cart_totals(cart)["subtotal"]
     coupon = None
     discount = Decimal("0")
     if coupon_code:
@@ -35,34 +60,39 @@ def create_order_from_cart(user, address: Address, cart: Cart, coupon_code: str
         delivery_fee=delivery_fee,
         total=total,
     )
-    send_order_created_email.delay(order.id)
-    for item in cart.items.select_related("product"):
-        product: Product = item.product
-        if product.stock < item.quantity:
-            raise ValueError(f"{product.title} is out of stock.")
-        product.stock -= item.quantity
-        product.save(update_fields=["stock"])
-        if product.stock <= settings.LOW_STOCK_THRESHOLD:
-            InventoryLog.objects.create(
-                product=product, change=0, reason="Low stock alert"
-            )
-            send_low_stock_alert.delay(product.id)
-        OrderItem.objects.create(
+
+    OrderItem.objects.bulk_create(
+        OrderItem(
             order=order,
-            product=product,
-            product_title=product.title,
-            quantity=item.quantity,
-            unit_price=item.unit_price,
-        )
-        InventoryLog.objects.create(
-            product=product,
-            change=-item.quantity,
-            reason=f"Order #{order.id}",
+            product_id=product_id,
+            product_title=products[product_id].title,
+            quantity=quantity,
+            unit_price=unit_price,
         )
+        for product_id, quantity, unit_price in lines
+    )
+    low_stock = sorted(
+        product_id
+        for product_id, quantity, _ in lines
+        if products[product_id].stock - need[product_id] <= settings.LOW_STOCK_THRESHOLD
+    )
+    InventoryLog.objects.bulk_create(
+        [InventoryLog(product_id=product_id, change=0, reason="Low stock alert") for product_id in low_stock]
+        + [
+            InventoryLog(product_id=product_id, change=-quantity, reason=f"Order #{order.id}")
+            for product_id, quantity, _ in lines
+        ]
+    )
     cart.items.all().delete()
+
+    enqueue(send_order_created_email.si(order.id))
+    for product_id in low_stock:
+        enqueue(send_low_stock_alert.si(product_id))
     return order
 
 
+@collect_tasks()
+@transaction.atomic
 def record_payment(
     order: Order,
     provider,
@@ -92,7 +122,7 @@ def record_payment(
     if status_value == Payment.Status.COMPLETED:
         order.status = Order.Status.PAID
         order.save(update_fields=["status"])
-        send_order_receipt_email.delay(order.id)
+        enqueue(send_order_receipt_email.si(order.id))
     else:
         order.status = Order.Status.PENDING
         order.save(update_fields=["status"])
@@ -102,51 +132,66 @@ def record_payment(
 def initiate_payment(order: Order, method: str):
     method = (method or "").lower()
     if method == Payment.Provider.STRIPE:
-        intent = create_stripe_payment_intent(order)
-        if not intent:
+        return _start_gateway_payment(order, method, create_stripe_payment_intent(order))
+    if method == Payment.Provider.RAZORPAY:
+        return _start_gateway_payment(order, method, create_razorpay_order(order))
+
+    # default COD
+    record_payment(
+        order,
+        Payment.Provider.COD,
+        order.total,
+        Payment.Status.PENDING,
+        f"cod-{order.id}",
+        {"note": "Cash on delivery"},
+    )
+    return {"provider": "cod", "status": "placed"}
+
+
+async def ainitiate_payment(order: Order, method: str):
+    """``initiate_payment`` for async (ASGI) views; the gateway call never blocks the event loop."""
+    method = (method or "").lower()
+    if method == Payment.Provider.STRIPE:
+        response = await acreate_stripe_payment_intent(order)
+    elif method == Payment.Provider.RAZORPAY:
+        response = await acreate_razorpay_order(order)
+    else:
+        return await sync_to_async(initiate_payment)(order, method)
+    return await sync_to_async(_start_gateway_payment)(order, method, response)
+
+
+def _start_gateway_payment(order: Order, method: str, response: dict | None):
+    if method == Payment.Provider.STRIPE:
+        if not response:
             raise ValueError("Stripe is not configured.")
         record_payment(
             order,
             Payment.Provider.STRIPE,
             order.total,
             Payment.Status.PENDING,
-            intent["id"],
-            intent,
+            response["id"],
+            response,
         )
         return {
             "provider": "stripe",
-            "client_secret": intent["client_secret"],
+            "client_secret": response["client_secret"],
             "publishable_key": settings.PAYMENT_GATEWAYS.get("stripe", {}).get("public_key", ""),
-            "payment_intent": intent["id"],
-        }
-    if method == Payment.Provider.RAZORPAY:
-        razorpay_order = create_razorpay_order(order)
-        if not razorpay_order:
-            raise ValueError("Razorpay is not configured.")
-        record_payment(
-            order,
-            Payment.Provider.RAZORPAY,
-            order.total,
-            Payment.Status.PENDING,
-            razorpay_order["id"],
-            razorpay_order,
-        )
-        return {
-            "provider": "razorpay",
-            "order_id": razorpay_order["id"],
-            "amount": razorpay_order["amount"],
-            "currency": razorpay_order["currency"],
-            "key_id": settings.PAYMENT_GATEWAYS.get("razorpay", {}).get("key_id", ""),
+            "payment_intent": response["id"],
         }
-
-    # default COD
+    if not response:
+        raise ValueError("Razorpay is not configured.")
     record_payment(
         order,
-        Payment.Provider.COD,
+        Payment.Provider.RAZORPAY,
         order.total,
         Payment.Status.PENDING,
-        f"cod-{order.id}",
-        {"note": "Cash on delivery"},
+        response["id"],
+        response,
     )
-    return {"provider": "cod", "status": "placed"}
-
+    return {
+        "provider": "razorpay",
+        "order_id": response["id"],
+        "amount": response["amount"],
+        "currency": response["currency"],
+        "key_id": settings.PAYMENT_GATEWAYS.get("razorpay", {}).get("key_id", ""),
+    }
@@ -0,0 +1,10 @@
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .payment_gateways import reset_clients
+
+
+@receiver(setting_changed)
+def reset_gateway_clients_on_setting_change(sender, setting, **kwargs):
+    if setting.startswith("PAYMENT_GATEWAY"):
+        reset_clients()
@@ -6,6 +6,7 @@ from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.utils import timezone
 
+from .inventory import release_expired_holds
 from .models import Order
 from store.models import Product
 
@@ -71,3 +72,22 @@ def send_low_stock_digest():
     body = "\n".join(lines)
     send_mail(subject, body, settings.DEFAULT_FROM_EMAIL, _admin_recipients())
 
+
+@shared_task
+def release_expired_stock_holds():
+    return release_expired_holds()
+
+
+@shared_task
+def process_order_webhooks(order_reference: str):
+    # Imported here: orders.webhooks enqueues this task.
+    from .webhooks import process_order_events
+
+    return process_order_events(order_reference)
+
+
+@shared_task
+def process_pending_webhooks():
+    from .webhooks import process_pending_events
+
+    return process_pending_events(older_than_seconds=60)
@@ -1,17 +1,34 @@
 """
 Tests for orders app - checkout, payments, coupons, order services
 """
+import asyncio
+from datetime import timedelta
 from decimal import Decimal
+from io import StringIO
+from types import SimpleNamespace
+from unittest import skipUnless
+from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase, Client
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
 
 from accounts.models import Address
 from cart.models import Cart, CartItem
 from store.models import Category, Product
-from .models import Order, OrderItem, Payment, Coupon
+from .dispatch import collect_tasks, enqueue
+from .fake_gateway import FakeGatewayServer, razorpay_webhook, stripe_webhook
+from .inventory import OutOfStock, hold_stock, release_expired_holds, take_stock
+from .models import InventoryLog, Order, OrderItem, Payment, Coupon, StockHold, WebhookEvent
+from .payment_gateways import GatewayError, acreate_razorpay_order, create_stripe_payment_intent, idempotency_key
 from .services import create_order_from_cart, record_payment, initiate_payment
+from .tasks import send_low_stock_alert
+from .webhooks import process_order_events, replay_events
 
 User = get_user_model()
 
@@ -267,3 +284,375 @@ class OrderViewsTest(TestCase):
         response = self.client.get(reverse("orders:detail", args=[order.id]))
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.context["order"], order)
+
+
+@patch("orders.dispatch.publish")
+@patch("orders.services.send_low_stock_alert")
+@patch("orders.services.send_order_created_email")
+class SetBasedCheckoutTest(TestCase):
+    """Test that checkout runs in bulk phases."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="buyer", email="buyer@example.com", password="pass")
+        self.address = Address.objects.create(
+            user=self.user, full_name="Buyer", phone_number="100", address_line_1="1 Road", city="City",
+            state="State", postal_code="100001",
+        )
+        self.category = Category.objects.create(name="Audio", slug="audio")
+
+    def _cart(self, size, stock=10):
+        cart = Cart.objects.create(user=self.user)
+        products = Product.objects.bulk_create(
+            Product(
+                title=f"Cable {size}-{number}", slug=f"cable-{size}-{number}", description="", price=Decimal("5.00"),
+                stock=stock, sku=f"CHK-{size}-{number:03d}", category=self.category,
+            )
+            for number in range(size)
+        )
+        CartItem.objects.bulk_create(
+            CartItem(cart=cart, product=product, quantity=2, unit_price=product.price) for product in products
+        )
+        return cart, products
+
+    def _checkout_queries(self, size):
+        cart, _ = self._cart(size)
+        with CaptureQueriesContext(connection) as queries:
+            create_order_from_cart(self.user, self.address, cart)
+        return len([query for query in queries if "SAVEPOINT" not in query["sql"]])
+
+    def test_statement_count_is_flat(self, order_email, low_stock_alert, publish):
+        self.assertEqual(self._checkout_queries(3), self._checkout_queries(30))
+
+    def test_stock_items_and_alerts(self, order_email, low_stock_alert, publish):
+        cart, products = self._cart(3, stock=6)
+        # As in a request: TaskBatchMiddleware's scope outlives the commit.
+        with collect_tasks(), self.captureOnCommitCallbacks(execute=True):
+            order = create_order_from_cart(self.user, self.address, cart)
+        self.assertEqual(order.subtotal, Decimal("30.00"))
+        self.assertEqual(order.items.count(), 3)
+        stock = Product.objects.filter(pk__in=[product.pk for product in products]).values_list("stock", flat=True)
+        self.assertEqual(set(stock), {4})
+        self.assertEqual(InventoryLog.objects.filter(change=-2).count(), 3)
+        self.assertEqual(low_stock_alert.si.call_count, 3)
+        order_email.si.assert_called_once_with(order.pk)
+        publish.assert_called_once()
+        # Order email, three stock alerts and the dashboard rollup (admin_panel.signals).
+        self.assertEqual(len(publish.call_args.args[0]), 5)
+        self.assertFalse(cart.items.exists())
+
+    def test_out_of_stock_rolls_back(self, order_email, low_stock_alert, publish):
+        cart, products = self._cart(2)
+        Product.objects.filter(pk=products[1].pk).update(stock=1)
+        with self.assertRaises(ValueError):
+            create_order_from_cart(self.user, self.address, cart)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(Product.objects.get(pk=products[0].pk).stock, 10)
+        self.assertEqual(cart.items.count(), 2)
+        publish.assert_not_called()
+
+
+@patch("orders.dispatch.publish")
+@patch("orders.services.send_low_stock_alert")
+@patch("orders.services.send_order_created_email")
+@override_settings(
+    STORAGES={
+        "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+        "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    }
+)
+class StockReservationTest(TestCase):
+    """Test stock holds and the all-or-nothing decrement."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="holder", email="holder@example.com", password="pass")
+        self.address = Address.objects.create(
+            user=self.user, full_name="Holder", phone_number="100", address_line_1="1 Road", city="City",
+            state="State", postal_code="100001",
+        )
+        category = Category.objects.create(name="Audio", slug="audio")
+        self.product = Product.objects.create(
+            title="Cable", description="", price=Decimal("5.00"), stock=10, sku="HOLD-001", category=category
+        )
+        self.cart = Cart.objects.create(user=self.user)
+        self.cart.add_item(self.product, 3)
+
+    def _stock(self, product=None):
+        return Product.objects.get(pk=(product or self.product).pk).stock
+
+    def test_held_stock_is_taken_once_at_checkout(self, order_email, low_stock_alert, publish):
+        hold_stock(self.cart)
+        self.assertEqual(self._stock(), 7)
+        self.cart.set_product_quantity(self.product.pk, 5)
+        hold_stock(self.cart)
+        self.assertEqual(self._stock(), 5)
+        create_order_from_cart(self.user, self.address, self.cart)
+        self.assertEqual(self._stock(), 5)
+        self.assertFalse(StockHold.objects.exists())
+
+    def _sign_in(self):
+        self.client.force_login(self.user)
+        Cart.objects.filter(pk=self.cart.pk).update(session_key=self.client.session.session_key)
+
+    def test_checkout_page_holds_once(self, order_email, low_stock_alert, publish):
+        self._sign_in()
+        self.client.get(reverse("orders:checkout"))
+        self.assertEqual(self._stock(), 7)
+        expires_at = StockHold.objects.get().expires_at
+        self.client.get(reverse("orders:checkout"))
+        self.assertEqual(StockHold.objects.get().expires_at, expires_at)
+
+        self.cart.set_product_quantity(self.product.pk, 4)
+        self.client.get(reverse("orders:checkout"))
+        self.assertEqual(self._stock(), 6)
+        StockHold.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.client.get(reverse("orders:checkout"))
+        self.assertGreater(StockHold.objects.get().expires_at, timezone.now())
+        self.assertEqual(self._stock(), 6)
+
+    def test_failed_checkout_renders_without_holding(self, order_email, low_stock_alert, publish):
+        Product.objects.filter(pk=self.product.pk).update(stock=1)
+        self._sign_in()
+        response = self.client.post(
+            reverse("orders:checkout"), {"address_id": self.address.pk, "payment_method": Payment.Provider.COD}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertTemplateUsed(response, "orders/checkout.html")
+        self.assertFalse(StockHold.objects.exists())
+        self.assertEqual(self._stock(), 1)
+
+    def test_expired_holds_go_back_to_stock(self, order_email, low_stock_alert, publish):
+        hold_stock(self.cart, seconds=60)
+        self.assertEqual(release_expired_holds(), 0)
+        self.assertEqual(release_expired_holds(now=timezone.now() + timedelta(minutes=2)), 1)
+        self.assertEqual(self._stock(), 10)
+        self.assertFalse(StockHold.objects.exists())
+
+    def test_shortage_takes_nothing(self, order_email, low_stock_alert, publish):
+        scarce = Product.objects.create(
+            title="Plug", description="", price=Decimal("5.00"), stock=1, sku="HOLD-002", category=self.product.category
+        )
+        with self.assertRaisesMessage(OutOfStock, "Plug is out of stock."):
+            take_stock({self.product.pk: 3, scarce.pk: 2})
+        self.assertEqual((self._stock(), self._stock(scarce)), (10, 1))
+
+
+@skipUnless(connection.features.has_select_for_update, "needs row locks for concurrent writers")
+class ConcurrentCheckoutTest(TransactionTestCase):
+    """Test that concurrent checkouts never oversell."""
+
+    def test_no_oversell(self):
+        out = StringIO()
+        call_command("benchmark_checkout", shoppers=40, workers=8, stock=10, stdout=out)
+        self.assertIn("placed", out.getvalue())
+        self.assertIn("sold 10, oversold 0", out.getvalue())
+
+
+@patch("orders.dispatch.publish")
+class TaskDispatchTest(TestCase):
+    """Test post-commit, batched task publishing."""
+
+    def test_tasks_go_out_together_after_commit(self, publish):
+        with collect_tasks():
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    enqueue(send_low_stock_alert.si(1))
+                    enqueue(send_low_stock_alert.si(2))
+                publish.assert_not_called()
+            publish.assert_not_called()
+        publish.assert_called_once()
+        self.assertEqual([signature.args for signature in publish.call_args.args[0]], [(1,), (2,)])
+
+    def test_rolled_back_tasks_are_dropped(self, publish):
+        with collect_tasks(), self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                enqueue(send_low_stock_alert.si(1))
+                try:
+                    with transaction.atomic():
+                        enqueue(send_low_stock_alert.si(2))
+                        raise ValueError
+                except ValueError:
+                    pass
+        self.assertEqual([signature.args for signature in publish.call_args.args[0]], [(1,)])
+
+
+class PaymentGatewayClientTest(SimpleTestCase):
+    """Test the pooled gateway clients against the local fake gateway."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FakeGatewayServer().start()
+        cls.addClassCleanup(cls.server.stop)
+        gateways = {
+            "stripe": {"secret_key": "sk_test", "api_base": cls.server.url},
+            "razorpay": {"key_id": "rzp_test", "key_secret": "secret", "api_base": cls.server.url},
+        }
+        cls.enterClassContext(override_settings(PAYMENT_GATEWAYS=gateways, PAYMENT_GATEWAY_RETRIES=2))
+
+    def setUp(self):
+        self.server.reset()
+        self.order = SimpleNamespace(pk=7, id=7, total=Decimal("10.50"))
+
+    def test_retries_reuse_one_connection_and_one_intent(self):
+        self.server.reset(fail_first=1)
+        first = create_stripe_payment_intent(self.order)
+        second = create_stripe_payment_intent(self.order)
+        self.assertEqual(first["id"], second["id"])
+        self.assertEqual(first["amount"], 1050)
+        self.assertEqual(first["metadata"], {"order_id": "7"})
+        self.assertEqual(self.server.requests, 3)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_async_variant(self):
+        razorpay_order = asyncio.run(acreate_razorpay_order(self.order))
+        self.assertEqual(razorpay_order["receipt"], idempotency_key(self.order, "razorpay"))
+        self.assertEqual(razorpay_order["notes"], {"order_id": "7"})
+
+    def test_timeouts_surface_as_gateway_errors(self):
+        self.server.latency = 0.5
+        try:
+            with override_settings(PAYMENT_GATEWAY_TIMEOUT=(1, 0.05), PAYMENT_GATEWAY_RETRIES=0):
+                with self.assertRaises(GatewayError):
+                    create_stripe_payment_intent(self.order)
+        finally:
+            self.server.latency = 0
+
+
+@override_settings(
+    PAYMENT_GATEWAYS={
+        "stripe": {"secret_key": "sk_test", "webhook_secret": "whsec_test"},
+        "razorpay": {"key_id": "rzp_test", "key_secret": "rzp_secret", "webhook_secret": "rzp_whsec"},
+    }
+)
+@patch("orders.services.send_order_receipt_email")
+@patch("orders.dispatch.publish")
+class WebhookInboxTest(TestCase):
+    """Payment webhooks are stored once, acknowledged, and applied per order in event order."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="hooks", email="hooks@example.com", password="x")
+        self.address = Address.objects.create(
+            user=self.user, full_name="Hook Buyer", phone_number="9999999999",
+            address_line_1="1 Hook Lane", city="Pune", state="MH", postal_code="411001",
+        )
+        self.order = Order.objects.create(
+            user=self.user, shipping_address=self.address, subtotal=Decimal("10.00"), total=Decimal("10.00"),
+        )
+        self.url = reverse("orders:webhook", args=["stripe"])
+
+    def _stripe_event(self, event_id, event_type, created, order_id=None):
+        return {
+            "id": event_id,
+            "type": event_type,
+            "created": created,
+            "data": {"object": {
+                "id": "pi_hook", "amount": 1000, "metadata": {"order_id": str(order_id or self.order.pk)},
+            }},
+        }
+
+    def _deliver(self, event):
+        body, headers = stripe_webhook("whsec_test", event)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(self.url, body, content_type="application/json", headers=headers)
+
+    def test_redelivery_is_stored_once(self, publish, receipt):
+        event = self._stripe_event("evt_1", "payment_intent.succeeded", 1_700_000_000)
+        self.assertEqual(self._deliver(event).status_code, 200)
+        self.assertEqual(self._deliver(event).status_code, 200)
+        self.assertEqual(WebhookEvent.objects.filter(event_id="evt_1").count(), 1)
+        self.assertEqual(publish.call_count, 1)
+        self.assertFalse(Payment.objects.exists())
+
+    def test_bad_signature_is_rejected(self, publish, receipt):
+        body, _ = stripe_webhook("whsec_test", self._stripe_event("evt_1", "payment_intent.succeeded", 1))
+        response = self.client.post(
+            self.url, body, content_type="application/json", headers={"Stripe-Signature": "t=1,v1=bad"}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(WebhookEvent.objects.exists())
+
+    def test_razorpay_signature(self, publish, receipt):
+        event = {
+            "event": "payment.captured",
+            "created_at": 1_700_000_000,
+            "payload": {"payment": {"entity": {"id": "pay_1", "amount": 1000, "notes": {"order_id": self.order.pk}}}},
+        }
+        body, headers = razorpay_webhook("rzp_whsec", event, event_id="rzp_evt_1")
+        url = reverse("orders:webhook", args=["razorpay"])
+        response = self.client.post(url, body, content_type="application/json", headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(WebhookEvent.objects.get().event_id, "rzp_evt_1")
+
+    def test_events_apply_in_order_and_stale_ones_are_skipped(self, publish, receipt):
+        # Delivered out of order: the success (t=2) arrives before the failure (t=1).
+        self._deliver(self._stripe_event("evt_ok", "payment_intent.succeeded", 1_700_000_002))
+        self._deliver(self._stripe_event("evt_fail", "payment_intent.payment_failed", 1_700_000_001))
+        self.assertEqual(process_order_events(str(self.order.pk)), 2)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Order.Status.PAID)
+        self.assertEqual(Payment.objects.get().status, Payment.Status.COMPLETED)
+
+        self._deliver(self._stripe_event("evt_late", "payment_intent.payment_failed", 1_700_000_000))
+        process_order_events(str(self.order.pk))
+        self.assertEqual(WebhookEvent.objects.get(event_id="evt_late").status, WebhookEvent.Status.SKIPPED)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Order.Status.PAID)
+
+    def test_unknown_order_fails_and_can_be_replayed(self, publish, receipt):
+        self._deliver(self._stripe_event("evt_1", "payment_intent.succeeded", 1_700_000_000, order_id=self.order.pk + 1))
+        process_order_events(str(self.order.pk + 1))
+        event = WebhookEvent.objects.get()
+        self.assertEqual(event.status, WebhookEvent.Status.FAILED)
+
+        WebhookEvent.objects.update(order_reference=str(self.order.pk))
+        self.assertEqual(replay_events(WebhookEvent.objects.filter(status=WebhookEvent.Status.FAILED)), 1)
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts), (WebhookEvent.Status.PROCESSED, 2))
+
+    def test_replay_command_dry_run(self, publish, receipt):
+        self._deliver(self._stripe_event("evt_1", "payment_intent.succeeded", 1_700_000_000))
+        WebhookEvent.objects.update(status=WebhookEvent.Status.FAILED)
+        out = StringIO()
+        call_command("replay_webhooks", "--dry-run", stdout=out)
+        self.assertIn("1 event(s) would be replayed", out.getvalue())
+        self.assertEqual(WebhookEvent.objects.get().status, WebhookEvent.Status.FAILED)
+
+
+
+class LatestPaymentTest(TestCase):
+    """Order lists read the newest payment from an annotation, not a query per order."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="payer", email="payer@example.com", password="x")
+        address = Address.objects.create(
+            user=self.user, full_name="Payer", phone_number="9999999999",
+            address_line_1="1 Pay Street", city="Pune", state="MH", postal_code="411001",
+        )
+        self.orders = [
+            Order.objects.create(user=self.user, shipping_address=address, subtotal=Decimal("10"), total=Decimal("10"))
+            for _ in range(3)
+        ]
+        Payment.objects.create(order=self.orders[0], provider="stripe", amount=10, status=Payment.Status.FAILED)
+        Payment.objects.create(order=self.orders[0], provider="razorpay", amount=10, status=Payment.Status.COMPLETED)
+
+    def test_annotation_matches_property(self):
+        annotated = {order.pk: order for order in Order.objects.with_latest_payment()}
+        first = annotated[self.orders[0].pk]
+        self.assertEqual((first.latest_payment_status, first.latest_payment_provider), ("completed", "razorpay"))
+        for order in self.orders:
+            fresh = Order.objects.get(pk=order.pk)
+            self.assertEqual(annotated[order.pk].payment_status, fresh.payment_status)
+        with self.assertNumQueries(0):
+            self.assertEqual(annotated[self.orders[1].pk].payment_status, "pending")
+
+    def test_api_list_query_count_is_flat(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with CaptureQueriesContext(connection) as context:
+            response = client.get("/api/orders/")
+        self.assertEqual(response.status_code, 200)
+        rows = response.json()
+        rows = rows.get("results", rows) if isinstance(rows, dict) else rows
+        self.assertIn("completed", [row["payment_status"] for row in rows])
+        payment_queries = [q for q in context.captured_queries if q["sql"].startswith('SELECT "orders_payment"')]
+        self.assertEqual(payment_queries, [])
@@ -4,18 +4,34 @@ from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.http import HttpResponse, JsonResponse
+from django.utils.decorators import method_decorator
 from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import DetailView, ListView, TemplateView
 
 from accounts.models import Address
 from cart.services import get_cart
+from .inventory import OutOfStock, hold_stock, holds_cover
 from .models import Order, Payment
-from .services import create_order_from_cart, initiate_payment, record_payment
+from .services import create_order_from_cart, initiate_payment
+from .webhooks import receive_webhook
 
 
 class CheckoutView(LoginRequiredMixin, TemplateView):
     template_name = "orders/checkout.html"
 
+    def get(self, request, *args, **kwargs):
+        # Keep the cart's stock reserved while the shopper fills in the form.
+        # Reloads leave live holds alone; a changed cart or lapsed hold is
+        # reserved again.
+        cart = get_cart(request)
+        if not holds_cover(cart):
+            try:
+                hold_stock(cart)
+            except OutOfStock as exc:
+                messages.warning(request, str(exc))
+        return super().get(request, *args, **kwargs)
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["addresses"] = self.request.user.addresses.all()
@@ -36,7 +52,7 @@ class CheckoutView(LoginRequiredMixin, TemplateView):
             payment_payload = initiate_payment(order, payment_method)
         except ValueError as exc:
             messages.error(request, str(exc))
-            return self.get(request, *args, **kwargs)
+            return self.render_to_response(self.get_context_data(**kwargs), status=400)
 
         return JsonResponse({"order_id": order.id, "total": order.total, **payment_payload})
 
@@ -46,7 +62,7 @@ class OrderListView(LoginRequiredMixin, ListView):
     paginate_by = 10
 
     def get_queryset(self):
-        return self.request.user.orders.prefetch_related("items__product")
+        return self.request.user.orders.with_latest_payment().prefetch_related("items__product")
 
 
 class OrderDetailView(LoginRequiredMixin, DetailView):
@@ -54,51 +70,13 @@ class OrderDetailView(LoginRequiredMixin, DetailView):
     model = Order
 
     def get_queryset(self):
-        return self.request.user.orders.prefetch_related("items__product", "events")
+        return self.request.user.orders.with_latest_payment().prefetch_related("items__product", "events")
 
 
+@method_decorator(csrf_exempt, name="dispatch")
 class PaymentWebhookView(View):
+    """Verify and store the event, then acknowledge; orders.webhooks applies it in Celery."""
+
     def post(self, request, provider, *args, **kwargs):
-        provider = provider.lower()
-        payload = request.body
-        if provider == "stripe":
-            from .payment_gateways import verify_stripe_event
-
-            event = verify_stripe_event(payload, request.META.get("HTTP_STRIPE_SIGNATURE", ""))
-            if not event:
-                return HttpResponse(status=400)
-            intent = event["data"]["object"]
-            order_id = intent["metadata"].get("order_id")
-            order = Order.objects.filter(id=order_id).first()
-            if not order:
-                return HttpResponse(status=404)
-            amount = Decimal(intent.get("amount_received") or intent["amount"]) / Decimal("100")
-            status = (
-                Payment.Status.COMPLETED
-                if event["type"] == "payment_intent.succeeded"
-                else Payment.Status.FAILED
-            )
-            record_payment(order, Payment.Provider.STRIPE, amount, status, intent["id"], intent)
-            return HttpResponse(status=200)
-
-        if provider == "razorpay":
-            from .payment_gateways import verify_razorpay_signature
-
-            event = verify_razorpay_signature(payload, request.META.get("HTTP_X_RAZORPAY_SIGNATURE", ""))
-            if not event:
-                return HttpResponse(status=400)
-            notes = event.get("payload", {}).get("payment", {}).get("entity", {}).get("notes", {})
-            order_id = notes.get("order_id")
-            order = Order.objects.filter(id=order_id).first()
-            if not order:
-                return HttpResponse(status=404)
-            entity = event.get("payload", {}).get("payment", {}).get("entity", {})
-            amount = Decimal(entity.get("amount", 0)) / Decimal("100")
-            status = (
-                Payment.Status.COMPLETED
-                if event.get("event") == "payment.captured"
-                else Payment.Status.FAILED
-            )
-            record_payment(order, Payment.Provider.RAZORPAY, amount, status, entity.get("id", ""), event)
-            return HttpResponse(status=200)
-        return HttpResponse(status=400)
+        event = receive_webhook(provider.lower(), request.body, request.headers)
+        return HttpResponse(status=400 if event is None else 200)
@@ -0,0 +1,160 @@
+"""
+Payment webhook inbox.
+
+``receive_webhook`` only verifies the signature and stores the event as a
+``WebhookEvent`` keyed by (provider, event id), so the view can answer 200
+straight away. A redelivered event hits the unique key and is acknowledged
+without doing anything else. Events are applied later in Celery, one order
+at a time (``process_order_events``). The order row is locked and its
+pending events are applied oldest first, so concurrent deliveries for one
+order never interleave. An event older than one already applied is skipped
+rather than allowed to move the order back.
+"""
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .dispatch import enqueue
+from .models import Order, Payment, WebhookEvent
+from .payment_gateways import verify_razorpay_signature, verify_stripe_event
+from .services import record_payment
+from .tasks import process_order_webhooks
+
+
+def _timestamp(value) -> datetime:
+    if not value:
+        return timezone.now()
+    return datetime.fromtimestamp(int(value), tz=dt_timezone.utc)
+
+
+def _razorpay_entity(event: dict) -> dict:
+    return event.get("payload", {}).get("payment", {}).get("entity", {})
+
+
+def parse_webhook(provider: str, payload: bytes, headers) -> WebhookEvent | None:
+    """An unsaved ``WebhookEvent`` for a correctly signed payload, else ``None``."""
+    if provider == Payment.Provider.STRIPE:
+        if not verify_stripe_event(payload, headers.get("Stripe-Signature", "")):
+            return None
+        event = json.loads(payload)
+        return WebhookEvent(
+            provider=provider,
+            event_id=event["id"],
+            event_type=event.get("type", ""),
+            order_reference=str(event["data"]["object"].get("metadata", {}).get("order_id") or ""),
+            payload=event,
+            occurred_at=_timestamp(event.get("created")),
+        )
+    if provider == Payment.Provider.RAZORPAY:
+        event = verify_razorpay_signature(payload, headers.get("X-Razorpay-Signature", ""))
+        if not event:
+            return None
+        return WebhookEvent(
+            provider=provider,
+            # Razorpay names each delivery in a header; fall back to the body's hash.
+            event_id=headers.get("X-Razorpay-Event-Id") or hashlib.sha256(payload).hexdigest(),
+            event_type=event.get("event", ""),
+            order_reference=str(_razorpay_entity(event).get("notes", {}).get("order_id") or ""),
+            payload=event,
+            occurred_at=_timestamp(event.get("created_at")),
+        )
+    return None
+
+
+def receive_webhook(provider: str, payload: bytes, headers) -> WebhookEvent | None:
+    """
+    Store a signed webhook and schedule its order for processing. Returns
+    ``None`` for bad signatures or providers; redeliveries return the
+    event without storing or scheduling anything.
+    """
+    event = parse_webhook(provider, payload, headers)
+    if event is None:
+        return None
+    if not event.order_reference:
+        event.status = WebhookEvent.Status.SKIPPED
+        event.error = "No order reference."
+    try:
+        with transaction.atomic():
+            event.save()
+    except IntegrityError:
+        return event
+    if event.order_reference:
+        enqueue(process_order_webhooks.si(event.order_reference))
+    return event
+
+
+def _apply(order: Order, event: WebhookEvent):
+    if event.provider == Payment.Provider.STRIPE:
+        intent = event.payload["data"]["object"]
+        amount = Decimal(intent.get("amount_received") or intent["amount"]) / Decimal("100")
+        succeeded = event.event_type == "payment_intent.succeeded"
+        transaction_id, payload = intent["id"], intent
+    else:
+        entity = _razorpay_entity(event.payload)
+        amount = Decimal(entity.get("amount", 0)) / Decimal("100")
+        succeeded = event.event_type == "payment.captured"
+        transaction_id, payload = entity.get("id", ""), event.payload
+    status = Payment.Status.COMPLETED if succeeded else Payment.Status.FAILED
+    record_payment(order, event.provider, amount, status, transaction_id, payload)
+
+
+@transaction.atomic
+def process_order_events(order_reference: str) -> int:
+    """Apply the pending events of one order, oldest first; returns how many were handled."""
+    order = None
+    if order_reference.isdigit():
+        order = Order.objects.select_for_update().filter(pk=order_reference).first()
+    events = list(
+        WebhookEvent.objects.select_for_update()
+        .filter(order_reference=order_reference, status=WebhookEvent.Status.PENDING)
+        .order_by("occurred_at", "pk")
+    )
+    if not events:
+        return 0
+    latest = (
+        WebhookEvent.objects.filter(order_reference=order_reference, status=WebhookEvent.Status.PROCESSED)
+        .aggregate(latest=Max("occurred_at"))["latest"]
+    )
+    now = timezone.now()
+    for event in events:
+        event.attempts += 1
+        event.processed_at = now
+        event.error = ""
+        if order is None:
+            event.status, event.error = WebhookEvent.Status.FAILED, "Unknown order."
+        elif latest is not None and event.occurred_at < latest:
+            event.status, event.error = WebhookEvent.Status.SKIPPED, "Older than an event already applied."
+        else:
+            try:
+                with transaction.atomic():
+                    _apply(order, event)
+            except Exception as exc:
+                event.status, event.error = WebhookEvent.Status.FAILED, repr(exc)
+            else:
+                event.status, latest = WebhookEvent.Status.PROCESSED, event.occurred_at
+    WebhookEvent.objects.bulk_update(events, ["status", "attempts", "error", "processed_at"])
+    return len(events)
+
+
+def process_pending_events(older_than_seconds: int = 0) -> int:
+    """Process every order with pending events, e.g. ones whose task was lost."""
+    cutoff = timezone.now() - timedelta(seconds=older_than_seconds)
+    references = (
+        WebhookEvent.objects.filter(status=WebhookEvent.Status.PENDING, received_at__lte=cutoff)
+        .order_by()
+        .values_list("order_reference", flat=True)
+        .distinct()
+    )
+    return sum(process_order_events(reference) for reference in list(references))
+
+
+def replay_events(events) -> int:
+    """Put ``events`` (a queryset) back to pending and process their orders now."""
+    references = set(events.values_list("order_reference", flat=True))
+    events.update(status=WebhookEvent.Status.PENDING, error="", processed_at=None)
+    return sum(process_order_events(reference) for reference in references if reference)
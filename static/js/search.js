@@ -90,8 +90,11 @@
 
             this.suggestionsContainer.innerHTML = suggestions.map(item => {
                 const matchClass = item.match_type || '';
+                const href = item.match_type === 'tag'
+                    ? `/?q=${encodeURIComponent(item.title)}`
+                    : `/product/${item.slug}/`;
                 return `
-                    <a href="/products/${item.slug}/" class="dropdown-item search-suggestion ${matchClass}">
+                    <a href="${href}" class="dropdown-item search-suggestion ${matchClass}">
                         <strong>${this.highlightMatch(item.title, this.currentQuery)}</strong>
                     </a>
                 `;
@@ -15,6 +15,7 @@ class ProductAdmin(admin.ModelAdmin):
         "category",
         "price",
         "stock",
+        "rating_avg",
         "is_trending",
         "is_published",
     )
@@ -1,15 +1,20 @@
+from django.db.models import Prefetch
 from rest_framework import viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
-from .models import Product
-from .serializers import ProductSerializer
+from .models import Product, Review
+from .pagination import KeysetPagination
+from .result_cache import ResultPageCache
+from .search_analytics import DEFAULT_WINDOW, WINDOWS
+from .serializers import ProductListSerializer, ProductSerializer
 from .search_service import SearchService
 
 
 class ProductViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Product.objects.filter(is_published=True).select_related("category")
     serializer_class = ProductSerializer
+    pagination_class = KeysetPagination
     filterset_fields = ("category__slug", "tags__slug", "is_trending")
     search_fields = ("title", "description", "tags__name")
     ordering_fields = ("created_at", "price", "is_trending")
@@ -27,14 +32,54 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
         if query:
             min_price_float = float(min_price) if min_price else None
             max_price_float = float(max_price) if max_price else None
-            return SearchService.search_products(
+            queryset = SearchService.search_products(
                 query=query,
                 category=category,
                 min_price=min_price_float,
                 max_price=max_price_float,
                 ordering=ordering,
             )
-        return queryset
+        if self.action == "list":
+            return self.get_list_queryset(queryset)
+        return queryset.prefetch_related(
+            "images", "tags", Prefetch("reviews", queryset=Review.objects.select_related("user"))
+        )
+
+    def get_list_queryset(self, queryset):
+        """Load exactly the columns and relations the requested list fields need."""
+        names, _ = ProductListSerializer.requested_fields(self.request)
+        queryset = queryset.select_related(None).prefetch_related(None).defer("metadata")
+        if "description" not in names:
+            queryset = queryset.defer("description")
+        if "category" in names:
+            queryset = queryset.select_related("category")
+        if "image" in names:
+            queryset = queryset.with_primary_image()
+        lookups = [name for name in ("tags", "images") if name in names]
+        if "reviews" in names:
+            lookups.append(Prefetch("reviews", queryset=Review.objects.select_related("user")))
+        return queryset.prefetch_related(*lookups)
+
+    def get_serializer_class(self):
+        if self.action == "list":
+            return ProductListSerializer
+        return super().get_serializer_class()
+
+    def list(self, request, *args, **kwargs):
+        """List products, serving whole pages from ``ResultPageCache`` when warm."""
+        if "cursor" not in request.query_params:
+            SearchService.track_query(request.query_params.get("q", ""))
+        params = {key: request.query_params.getlist(key) for key in request.query_params}
+        key = ResultPageCache.make_key("api", {"host": request.get_host(), **params})
+        categories = {request.query_params.get(name) for name in ("category", "category__slug")} - {None, ""}
+        category = categories.pop() if len(categories) == 1 else None
+
+        def build():
+            response = super(ProductViewSet, self).list(request, *args, **kwargs)
+            results = response.data["results"] if "results" in response.data else response.data
+            return response.data, [item["id"] for item in results]
+
+        return Response(ResultPageCache.get_or_build(key, build, category=category))
 
     @action(detail=False, methods=["get"])
     def suggestions(self, request):
@@ -46,8 +91,11 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
 
     @action(detail=False, methods=["get"])
     def popular_searches(self, request):
-        """Get popular search queries."""
+        """Get popular search queries over the last ``hour``, ``day`` or ``week``."""
         limit = int(request.query_params.get("limit", 10))
-        results = SearchService.get_popular_searches(limit=limit)
-        return Response({"queries": results})
+        window = request.query_params.get("window", DEFAULT_WINDOW)
+        if window not in WINDOWS:
+            window = DEFAULT_WINDOW
+        results = SearchService.get_popular_searches(limit=limit, window=window)
+        return Response({"queries": results, "window": window})
 
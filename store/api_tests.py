@@ -4,11 +4,14 @@ API tests for store endpoints
 from decimal import Decimal
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 
-from .models import Category, Product
+from .models import Category, Product, ProductImage, Review
 
 User = get_user_model()
 
@@ -62,4 +65,104 @@ class ProductAPITest(APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn("queries", response.data)
+        self.assertEqual(response.data["window"], "day")
 
+
+
+class ProductListCacheAPITest(APITestCase):
+    """Test that product list pages are served from the result page cache."""
+
+    def setUp(self):
+        self.category = Category.objects.create(
+            name="Electronics", slug="electronics", is_active=True
+        )
+        self.product = Product.objects.create(
+            title="Test Product",
+            slug="test-product",
+            description="A test product",
+            price=Decimal("99.99"),
+            stock=10,
+            sku="TEST-001",
+            category=self.category,
+            is_published=True,
+        )
+
+    def test_warm_list_page_needs_no_sql(self):
+        url = reverse("product-list")
+        self.client.get(url, {"category": "electronics"})
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {"category": "electronics"})
+        self.assertEqual([item["id"] for item in response.data["results"]], [self.product.id])
+
+        self.product.title = "Renamed Product"
+        self.product.save()
+        response = self.client.get(url, {"category": "electronics"})
+        self.assertEqual(response.data["results"][0]["title"], "Renamed Product")
+
+    def test_list_is_cursor_paginated(self):
+        for number in range(2, 15):
+            Product.objects.create(
+                title=f"Product {number}", description="", price=Decimal(number), sku=f"TEST-{number:03d}",
+                category=self.category,
+            )
+        response = self.client.get(reverse("product-list"), {"ordering": "price"})
+        self.assertNotIn("count", response.data)
+        self.assertIsNone(response.data["previous"])
+        second = self.client.get(response.data["next"])
+        prices = [item["price"] for item in response.data["results"] + second.data["results"]]
+        self.assertEqual(len(prices), 14)
+        self.assertEqual(prices, sorted(prices, key=Decimal))
+        self.assertIsNone(second.data["next"])
+
+        response = self.client.get(reverse("product-list"), {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ProductListFieldsAPITest(APITestCase):
+    """Test the compact product list representation and sparse fieldsets."""
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Audio", slug="audio")
+        self.user = User.objects.create_user(username="reviewer", email="reviewer@example.com", password="pass")
+        self.url = reverse("product-list")
+
+    def _create_products(self, count, offset=0):
+        for number in range(offset, offset + count):
+            product = Product.objects.create(
+                title=f"Speaker {number}", description="Loud", price=Decimal("10.00"), sku=f"LIST-{number:03d}",
+                category=self.category,
+            )
+            ProductImage.objects.create(product=product, image=f"products/{number}.jpg")
+            Review.objects.create(product=product, user=self.user, rating=4, headline="Good", body="")
+
+    def _query_count(self, params):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, len(queries)
+
+    def test_list_rows_are_compact(self):
+        self._create_products(1)
+        row = self.client.get(self.url).data["results"][0]
+        self.assertNotIn("reviews", row)
+        self.assertNotIn("description", row)
+        self.assertEqual(row["category"], "audio")
+        self.assertTrue(row["image"].endswith("products/0.jpg"))
+
+    def test_sparse_fieldsets(self):
+        self._create_products(1)
+        response = self.client.get(self.url, {"fields": "title,price", "expand": "reviews"})
+        row = response.data["results"][0]
+        self.assertEqual(set(row), {"id", "title", "price", "reviews"})
+        self.assertEqual(row["reviews"][0]["user"], str(self.user))
+
+    def test_query_count_does_not_grow_with_rows(self):
+        params = {"expand": "images,reviews,category"}
+        self._create_products(2)
+        _, small = self._query_count(params)
+        self._create_products(8, offset=2)
+        response, large = self._query_count(params)
+        self.assertEqual(len(response.data["results"]), 10)
+        self.assertEqual(small, large)
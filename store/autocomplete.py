@@ -0,0 +1,185 @@
+"""
+In-memory autocomplete over published product titles and tag names.
+
+Every title and tag name is stored in one sorted array under its full
+lowercased text plus one key per later word, so ``bisect`` finds both
+"starts with" and "word starts with" completions without touching the
+database. The array is patched in place by model signals.
+"""
+from bisect import bisect_left, insort
+
+from .search_backends import TOKEN_RE, SharedGenerationMixin
+
+PRODUCT = 0
+TAG = 1
+
+MATCH_TYPE_PRIORITY = {"exact": 0, "starts_with": 1, "contains": 2, "tag": 3}
+
+
+def _keys(text: str) -> list[tuple[str, bool]]:
+    """``(key, is_full_text)`` pairs for ``text`` and each word after the first."""
+    lowered = text.lower()
+    keys = [(lowered, True)]
+    for match in TOKEN_RE.finditer(lowered):
+        if match.start():
+            keys.append((lowered[match.start():], False))
+    return keys
+
+
+def _entries(kind: int, object_id: int, text: str) -> list[tuple[str, int, int, bool]]:
+    return [(key, kind, object_id, is_full) for key, is_full in _keys(text)]
+
+
+class AutocompleteIndex:
+    """Sorted ``(key, kind, object_id, is_full_text)`` entries plus display data."""
+
+    MAX_SCAN = 200
+
+    def __init__(self):
+        self.entries: list[tuple[str, int, int, bool]] = []
+        self.products: dict[int, tuple[str, str]] = {}
+        self.product_tags: dict[int, frozenset[int]] = {}
+        self.tags: dict[int, tuple[str, str]] = {}
+        self.tag_counts: dict[int, int] = {}
+
+    @classmethod
+    def build(cls, tags, products) -> "AutocompleteIndex":
+        """
+        An index over ``tags`` (``(id, name, slug)``) and ``products``
+        (``(id, title, slug, tag_ids)``), with the entries sorted once at
+        the end rather than inserted one by one.
+        """
+        index = cls()
+        for tag_id, name, slug in tags:
+            index.tags[tag_id] = (name, slug)
+            index.entries.extend(_entries(TAG, tag_id, name))
+        for product_id, title, slug, tag_ids in products:
+            index._remember_product(product_id, title, slug, tag_ids)
+            index.entries.extend(_entries(PRODUCT, product_id, title))
+        index.entries.sort()
+        return index
+
+    def _insert(self, kind: int, object_id: int, text: str):
+        for entry in _entries(kind, object_id, text):
+            insort(self.entries, entry)
+
+    def _delete(self, kind: int, object_id: int, text: str):
+        for entry in _entries(kind, object_id, text):
+            position = bisect_left(self.entries, entry)
+            if position < len(self.entries) and self.entries[position] == entry:
+                del self.entries[position]
+
+    def _remember_product(self, product_id: int, title: str, slug: str, tag_ids):
+        self.products[product_id] = (title, slug)
+        self.product_tags[product_id] = frozenset(tag_ids)
+        for tag_id in self.product_tags[product_id]:
+            self.tag_counts[tag_id] = self.tag_counts.get(tag_id, 0) + 1
+
+    def set_product(self, product_id: int, title: str, slug: str, tag_ids):
+        self.remove_product(product_id)
+        self._remember_product(product_id, title, slug, tag_ids)
+        self._insert(PRODUCT, product_id, title)
+
+    def remove_product(self, product_id: int):
+        existing = self.products.pop(product_id, None)
+        if existing is None:
+            return
+        self._delete(PRODUCT, product_id, existing[0])
+        for tag_id in self.product_tags.pop(product_id, ()):
+            self.tag_counts[tag_id] -= 1
+
+    def set_tag(self, tag_id: int, name: str, slug: str):
+        self.remove_tag(tag_id)
+        self.tags[tag_id] = (name, slug)
+        self._insert(TAG, tag_id, name)
+
+    def remove_tag(self, tag_id: int):
+        existing = self.tags.pop(tag_id, None)
+        if existing is not None:
+            self._delete(TAG, tag_id, existing[0])
+
+    def suggest(self, query: str, limit: int) -> list[dict]:
+        query = query.strip().lower()
+        if not query:
+            return []
+        position = bisect_left(self.entries, (query,))
+        seen = set()
+        suggestions = []
+        for key, kind, object_id, is_full in self.entries[position:position + self.MAX_SCAN]:
+            if not key.startswith(query):
+                break
+            if (kind, object_id) in seen:
+                continue
+            if kind == TAG:
+                if not self.tag_counts.get(object_id):
+                    continue
+                title, slug = self.tags[object_id]
+                match_type = "tag"
+            else:
+                title, slug = self.products[object_id]
+                if not is_full:
+                    match_type = "contains"
+                else:
+                    match_type = "exact" if key == query else "starts_with"
+            seen.add((kind, object_id))
+            suggestions.append({"title": title, "slug": slug, "match_type": match_type})
+        suggestions.sort(key=lambda item: (MATCH_TYPE_PRIORITY[item["match_type"]], len(item["title"])))
+        return suggestions[:limit]
+
+
+class Autocomplete(SharedGenerationMixin):
+    """Process-wide autocomplete index, built lazily and patched by signals."""
+
+    GENERATION_KEY = "search:autocomplete:generation"
+
+    def _build(self) -> AutocompleteIndex:
+        from .models import Product, Tag
+
+        tag_ids: dict[int, list[int]] = {}
+        links = Product.tags.through.objects.filter(product__is_published=True)
+        for product_id, tag_id in links.values_list("product_id", "tag_id"):
+            tag_ids.setdefault(product_id, []).append(tag_id)
+        products = Product.objects.filter(is_published=True).values_list("id", "title", "slug")
+        return AutocompleteIndex.build(
+            Tag.objects.values_list("id", "name", "slug"),
+            (
+                (product_id, title, slug, tag_ids.get(product_id, ()))
+                for product_id, title, slug in products.iterator(chunk_size=2000)
+            ),
+        )
+
+    def suggest(self, query: str, limit: int = 5) -> list[dict]:
+        index = self._ensure_index()
+        with self._lock:
+            return index.suggest(query, limit)
+
+    def index_product(self, product) -> None:
+        with self._lock:
+            if self._index is not None:
+                if product.is_published:
+                    tag_ids = list(product.tags.values_list("id", flat=True))
+                    self._index.set_product(product.pk, product.title, product.slug, tag_ids)
+                else:
+                    self._index.remove_product(product.pk)
+            self._bump_generation()
+
+    def remove_product(self, product_id: int) -> None:
+        with self._lock:
+            if self._index is not None:
+                self._index.remove_product(product_id)
+            self._bump_generation()
+
+    def index_tag(self, tag) -> None:
+        with self._lock:
+            if self._index is not None:
+                self._index.set_tag(tag.pk, tag.name, tag.slug)
+            self._bump_generation()
+
+    def remove_tag(self, tag_id: int) -> None:
+        with self._lock:
+            if self._index is not None:
+                self._index.remove_tag(tag_id)
+            self._bump_generation()
+
+
+autocomplete = Autocomplete()
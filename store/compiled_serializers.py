@@ -0,0 +1,160 @@
+"""
+Precompiled representation plans for hot read serializers.
+
+DRF walks every field of every nested serializer for every object:
+``get_attribute`` with its error handling, ``PKOnlyObject`` wrapping, ``None``
+checks and ``to_representation`` dispatch. For the product, cart and order
+shapes the field list is fixed per request, so ``compile_serializer`` resolves
+it once into a flat list of ``(name, getter)`` steps, and nested serializers are
+inlined as their own plans. Output is identical to ``Serializer.to_representation``;
+the per-field ``to_representation`` of each DRF field is still used for
+formatting (decimals, datetimes, file URLs).
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from operator import attrgetter
+
+from django.core.exceptions import FieldDoesNotExist, ObjectDoesNotExist
+from django.db import models
+from rest_framework import relations, serializers
+from rest_framework.fields import get_attribute
+
+_enabled = ContextVar("compiled_serializers_enabled", default=True)
+
+
+@contextmanager
+def uncompiled():
+    """Serialize through plain DRF inside the block (benchmarks and tests)."""
+    token = _enabled.set(False)
+    try:
+        yield
+    finally:
+        _enabled.reset(token)
+
+
+def _model(serializer):
+    return getattr(getattr(serializer, "Meta", None), "model", None)
+
+
+def _model_field(serializer, attr: str):
+    model = _model(serializer)
+    if model is None:
+        return None
+    try:
+        return model._meta.get_field(attr)
+    except FieldDoesNotExist:
+        return None
+
+
+def _related_rows(attr: str):
+    """Read a to-many relation straight from the prefetch cache when it is warm."""
+
+    def get(instance):
+        cache = getattr(instance, "_prefetched_objects_cache", None)
+        if cache and attr in cache:
+            return cache[attr]
+        return getattr(instance, attr)
+
+    return get
+
+
+def _related_object(attr: str):
+    def get(instance):
+        try:
+            return getattr(instance, attr)
+        except ObjectDoesNotExist:
+            return None
+
+    return get
+
+
+def _getter(field):
+    """Callable that reads ``field``'s source, following ``rest_framework.fields.get_attribute``."""
+    if field.source == "*":
+        return lambda instance: instance
+    attrs = field.source_attrs
+    if len(attrs) == 1:
+        attr = attrs[0]
+        model_field = _model_field(field.parent, attr)
+        if model_field is None:
+            if isinstance(getattr(_model(field.parent), attr, None), property):
+                return attrgetter(attr)
+        elif model_field.one_to_many or model_field.many_to_many:
+            return _related_rows(attr)
+        elif model_field.is_relation:
+            return _related_object(attr)
+        elif model_field.concrete:
+            return attrgetter(attr)
+    return lambda instance: get_attribute(instance, attrs)
+
+
+def _iterate(value):
+    return value.all() if isinstance(value, models.manager.BaseManager) else value
+
+
+def _compile_field(field):
+    if isinstance(field, serializers.SerializerMethodField):
+        return getattr(field.parent, field.method_name)
+
+    if isinstance(field, serializers.ListSerializer):
+        child = compile_serializer(field.child)
+        get = _getter(field)
+        return lambda instance: [child(item) for item in _iterate(get(instance))]
+
+    if isinstance(field, serializers.BaseSerializer):
+        nested = compile_serializer(field)
+        get = _getter(field)
+
+        def represent_nested(instance):
+            value = get(instance)
+            return None if value is None else nested(value)
+
+        return represent_nested
+
+    if isinstance(field, relations.ManyRelatedField):
+        child = field.child_relation.to_representation
+        get = _getter(field)
+
+        def represent_many(instance):
+            if getattr(instance, "pk", True) is None:
+                return []
+            return [child(item) for item in _iterate(get(instance))]
+
+        return represent_many
+
+    if isinstance(field, relations.PrimaryKeyRelatedField) and field.pk_field is None and len(field.source_attrs) == 1:
+        model_field = _model_field(field.parent, field.source_attrs[0])
+        if model_field is not None and model_field.many_to_one:
+            # Same shortcut as DRF's pk-only optimization: read the ``_id`` column.
+            return attrgetter(model_field.attname)
+
+    to_representation = field.to_representation
+    get = _getter(field)
+
+    def represent(instance):
+        value = get(instance)
+        return None if value is None else to_representation(value)
+
+    return represent
+
+
+def compile_serializer(serializer):
+    """Return ``represent(instance) -> dict`` equivalent to ``serializer.to_representation``."""
+    steps = [(field.field_name, _compile_field(field)) for field in serializer._readable_fields]
+
+    def represent(instance):
+        return {name: step(instance) for name, step in steps}
+
+    return represent
+
+
+class CompiledSerializerMixin:
+    """Serialize through a plan compiled once per serializer instance."""
+
+    def to_representation(self, instance):
+        if not _enabled.get():
+            return super().to_representation(instance)
+        plan = self.__dict__.get("_compiled_plan")
+        if plan is None:
+            plan = self._compiled_plan = compile_serializer(self)
+        return plan(instance)
@@ -0,0 +1,110 @@
+"""
+Management command to time product, cart and order serialization with and
+without the compiled representation plans.
+
+Fixture rows are created inside a transaction that is rolled back afterwards.
+"""
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounts.models import Address
+from cart.models import Cart, CartItem
+from cart.serializers import CartSerializer
+from orders.models import Order, OrderItem
+from orders.serializers import OrderSerializer
+from store.compiled_serializers import uncompiled
+from store.models import Category, Product, ProductImage, Review, Tag
+from store.serializers import ProductSerializer
+
+PRODUCT_PREFETCHES = ("images", "tags", "reviews__user")
+
+
+class Command(BaseCommand):
+    help = "Benchmark serializer time per 1,000 objects, plain DRF vs compiled plans"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--objects", type=int, default=1000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        count, repeat = options["objects"], options["repeat"]
+        with transaction.atomic():
+            cases = self._fixtures(count)
+            for label, render in cases:
+                with uncompiled():
+                    before = self._best(render, repeat)
+                after = self._best(render, repeat)
+                self.stdout.write(
+                    f"{label:<10} DRF {before * 1000 / count * 1000:8.1f} ms/1k   "
+                    f"compiled {after * 1000 / count * 1000:8.1f} ms/1k   x{before / after:.1f}"
+                )
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def _best(render, repeat: int) -> float:
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            render()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
+
+    def _fixtures(self, count: int):
+        user = get_user_model().objects.create_user(
+            username="serializer-benchmark", email="serializer-benchmark@example.com", password="benchmark"
+        )
+        category = Category.objects.create(name="Serializer benchmark", slug="serializer-benchmark")
+        tags = [Tag.objects.create(name=f"serializer-benchmark-{number}") for number in range(2)]
+        products = Product.objects.bulk_create(
+            Product(
+                title=f"Benchmark product {number}",
+                slug=f"serializer-benchmark-{number}",
+                description="Benchmark product",
+                price=Decimal("19.99"),
+                stock=10,
+                sku=f"SERBENCH-{number:05d}",
+                category=category,
+            )
+            for number in range(count)
+        )
+        ProductImage.objects.bulk_create(
+            ProductImage(product=product, image=f"products/bench-{product.pk}.jpg", is_primary=True)
+            for product in products
+        )
+        Product.tags.through.objects.bulk_create(
+            Product.tags.through(product=product, tag=tag) for product in products for tag in tags
+        )
+        Review.objects.bulk_create(
+            Review(product=product, user=user, rating=4, headline="Good", body="Works") for product in products
+        )
+        cart = Cart.objects.create(user=user)
+        CartItem.objects.bulk_create(
+            CartItem(cart=cart, product=product, quantity=2, unit_price=product.price) for product in products
+        )
+        address = Address.objects.create(
+            user=user, full_name="Bench", phone_number="100", address_line_1="1 Road", city="City",
+            state="State", postal_code="100001",
+        )
+        order = Order.objects.create(
+            user=user, shipping_address=address, subtotal=Decimal("0"), total=Decimal("0")
+        )
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, product=product, product_title=product.title, quantity=1, unit_price=product.price)
+            for product in products
+        )
+
+        product_rows = list(
+            Product.objects.filter(category=category).select_related("category").prefetch_related(*PRODUCT_PREFETCHES)
+        )
+        item_prefetches = [f"items__product__{name}" for name in PRODUCT_PREFETCHES] + ["items__product__category"]
+        cart = Cart.objects.prefetch_related(*item_prefetches).get(pk=cart.pk)
+        order = Order.objects.select_related("shipping_address").prefetch_related(*item_prefetches).get(pk=order.pk)
+        return [
+            ("products", lambda: ProductSerializer(product_rows, many=True).data),
+            ("cart", lambda: CartSerializer(cart).data),
+            ("order", lambda: OrderSerializer(order).data),
+        ]
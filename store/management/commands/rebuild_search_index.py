@@ -0,0 +1,15 @@
+"""
+Management command to rebuild the product search index.
+"""
+from django.core.management.base import BaseCommand
+
+from store.search_backends import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the product search index for the configured search backend"
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt search index using {type(backend).__name__}"))
@@ -0,0 +1,22 @@
+"""
+Management command to recompute denormalized product rating aggregates.
+"""
+from django.core.management.base import BaseCommand
+
+from store.models import Product
+from store.ratings import refresh_product_ratings
+
+
+class Command(BaseCommand):
+    help = "Recompute rating_avg, rating_count and rating_histogram for every product"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        product_ids = list(Product.objects.order_by("pk").values_list("pk", flat=True))
+        updated = 0
+        for start in range(0, len(product_ids), batch_size):
+            updated += refresh_product_ratings(product_ids[start:start + batch_size])
+        self.stdout.write(self.style.SUCCESS(f"Recomputed ratings for {updated} products"))
@@ -0,0 +1,48 @@
+# Generated by Django 5.0.14 on 2026-10-17 04:33
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def backfill_ratings(apps, schema_editor):
+    Product = apps.get_model('store', 'Product')
+    Review = apps.get_model('store', 'Review')
+    histograms = {}
+    rows = Review.objects.values('product_id', 'rating').annotate(votes=models.Count('id'))
+    for row in rows:
+        histograms.setdefault(row['product_id'], {})[str(row['rating'])] = row['votes']
+    products = list(Product.objects.filter(pk__in=histograms).only('pk'))
+    for product in products:
+        histogram = histograms[product.pk]
+        count = sum(histogram.values())
+        product.rating_count = count
+        product.rating_histogram = histogram
+        product.rating_avg = round(Decimal(sum(int(stars) * votes for stars, votes in histogram.items())) / count, 2)
+    Product.objects.bulk_update(products, ['rating_avg', 'rating_count', 'rating_histogram'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_avg',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=3),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_histogram',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,78 @@
+"""
+Full-text shadow tables read by ``store.search_backends``: an FTS5 table on
+SQLite and a weighted ``tsvector`` table on PostgreSQL. Only the active
+vendor's table is created, filled from the published catalog. Neither
+references ``store_product``; the product signals drop deleted rows.
+"""
+from django.db import migrations
+
+from store.search_backends import SQLiteFTSSearchBackend
+
+
+class VendorRunSQL(migrations.RunSQL):
+    """``RunSQL`` applied only on ``vendor``; on SQLite also only where FTS5 is compiled in."""
+
+    def __init__(self, *args, vendor, **kwargs):
+        self.vendor = vendor
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, args, kwargs = super().deconstruct()
+        return name, args, {**kwargs, "vendor": self.vendor}
+
+    def _applies(self, connection):
+        if connection.vendor != self.vendor:
+            return False
+        return self.vendor != "sqlite" or SQLiteFTSSearchBackend.is_supported(connection)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if self._applies(schema_editor.connection):
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if self._applies(schema_editor.connection):
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0003_product_keyset_indexes'),
+    ]
+
+    operations = [
+        VendorRunSQL(
+            vendor='sqlite',
+            sql=[
+                "CREATE VIRTUAL TABLE IF NOT EXISTS store_product_fts "
+                "USING fts5(title, description, tags, tokenize='porter unicode61')",
+                "DELETE FROM store_product_fts",
+                "INSERT INTO store_product_fts (rowid, title, description, tags) "
+                "SELECT p.id, p.title, p.description, COALESCE(("
+                "SELECT group_concat(t.name, ' ') FROM store_product_tags pt "
+                "INNER JOIN store_tag t ON t.id = pt.tag_id WHERE pt.product_id = p.id), '') "
+                "FROM store_product p WHERE p.is_published",
+            ],
+            reverse_sql="DROP TABLE IF EXISTS store_product_fts",
+        ),
+        VendorRunSQL(
+            vendor='postgresql',
+            sql=[
+                "CREATE TABLE IF NOT EXISTS store_product_search ("
+                "product_id bigint PRIMARY KEY, document tsvector NOT NULL)",
+                "CREATE INDEX IF NOT EXISTS store_product_search_document_idx "
+                "ON store_product_search USING GIN (document)",
+                "DELETE FROM store_product_search",
+                "INSERT INTO store_product_search (product_id, document) "
+                "SELECT p.id, "
+                "setweight(to_tsvector('english', p.title), 'A') || "
+                "setweight(to_tsvector('english', COALESCE(tags.names, '')), 'B') || "
+                "setweight(to_tsvector('english', p.description), 'C') "
+                "FROM store_product p LEFT JOIN ("
+                "SELECT pt.product_id, string_agg(t.name, ' ') AS names FROM store_product_tags pt "
+                "INNER JOIN store_tag t ON t.id = pt.tag_id GROUP BY pt.product_id"
+                ") tags ON tags.product_id = p.id WHERE p.is_published",
+            ],
+            reverse_sql="DROP TABLE IF EXISTS store_product_search",
+        ),
+    ]
@@ -1,6 +1,6 @@
 from django.conf import settings
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
 from django.utils.text import slugify
 
 User = settings.AUTH_USER_MODEL
@@ -40,6 +40,46 @@ class Tag(models.Model):
         return self.name
 
 
+class ProductQuerySet(models.QuerySet):
+    CARD_FIELDS = (
+        "id",
+        "title",
+        "slug",
+        "price",
+        "old_price",
+        "discount_percentage",
+        "stock",
+        "is_trending",
+        "rating_avg",
+        "rating_count",
+        "created_at",
+    )
+    CARD_TAGS = 2
+
+    def with_primary_image(self):
+        """Annotate ``primary_image``, the file name of the product's primary (or first) image."""
+        images = ProductImage.objects.filter(product=models.OuterRef("pk")).order_by("-is_primary", "pk")
+        return self.annotate(primary_image=models.Subquery(images.values("image")[:1]))
+
+    def cards(self, tag_limit: int = CARD_TAGS):
+        """
+        Only the columns a product card shows, plus ``primary_image`` and
+        ``tag_name_0`` .. ``tag_name_{tag_limit - 1}`` as correlated subqueries,
+        so a whole grid renders from a single query.
+        """
+        tags = Tag.objects.filter(products=models.OuterRef("pk")).order_by("name")
+        annotations = {}
+        for position in range(tag_limit):
+            annotations[f"tag_name_{position}"] = models.Subquery(tags.values("name")[position:position + 1])
+        return (
+            self.select_related(None)
+            .prefetch_related(None)
+            .only(*self.CARD_FIELDS)
+            .with_primary_image()
+            .annotate(**annotations)
+        )
+
+
 class Product(models.Model):
     category = models.ForeignKey(Category, on_delete=models.PROTECT, related_name="products")
     title = models.CharField(max_length=255)
@@ -54,11 +94,22 @@ class Product(models.Model):
     is_trending = models.BooleanField(default=False)
     is_published = models.BooleanField(default=True)
     metadata = models.JSONField(default=dict, blank=True)
+    # Review aggregates, maintained by store.ratings.
+    rating_avg = models.DecimalField(max_digits=3, decimal_places=2, default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_histogram = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Keyset pagination sort keys (see store.pagination).
+            models.Index(fields=["created_at", "id"], name="product_created_id_idx"),
+            models.Index(fields=["price", "id"], name="product_price_id_idx"),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -76,7 +127,17 @@ class Product(models.Model):
 
     @property
     def rating(self):
-        return self.reviews.aggregate(models.Avg("rating")).get("rating__avg") or 0
+        return self.rating_avg
+
+    @property
+    def rating_breakdown(self):
+        """``(stars, count, percent)`` rows from five stars down to one."""
+        rows = []
+        for stars in range(5, 0, -1):
+            count = self.rating_histogram.get(str(stars), 0)
+            percent = round(count * 100 / self.rating_count) if self.rating_count else 0
+            rows.append((stars, count, percent))
+        return rows
 
 
 class ProductImage(models.Model):
@@ -105,5 +166,10 @@ class Review(models.Model):
         unique_together = ("product", "user")
         ordering = ["-created_at"]
 
+    def save(self, *args, **kwargs):
+        # The post_save rating recompute (store.signals) commits with the row.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.product} - {self.rating}"
@@ -0,0 +1,197 @@
+"""
+Keyset ("cursor") pagination for product listings.
+
+Pages are addressed by the sort key of the row they start after instead of
+a page number, so fetching page 500 is the same index range scan as page 1:
+no ``COUNT(*)`` and no ``OFFSET``. Every ordering ends in ``id`` to make the
+key unique, and ``Product`` carries matching composite indexes.
+"""
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+# ordering parameter -> sort key columns
+ORDERINGS = {
+    "-created_at": ("-created_at", "-id"),
+    "created_at": ("created_at", "id"),
+    "-price": ("-price", "-id"),
+    "price": ("price", "id"),
+    "-is_trending": ("-is_trending", "-created_at", "-id"),
+    "is_trending": ("is_trending", "created_at", "id"),
+    "-relevance_score": ("-relevance_score", "-id"),
+}
+DEFAULT_ORDERING = "-created_at"
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _dump(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(ordering: str, values: list, backwards: bool = False) -> str:
+    data = {"o": ordering, "k": [_dump(value) for value in values], "b": int(backwards)}
+    return base64.urlsafe_b64encode(json.dumps(data, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, ordering: str, model) -> tuple[list, bool]:
+    """``(key values, backwards)`` for ``cursor``; raises ``InvalidCursor``."""
+    keys = ORDERINGS[ordering]
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        raw_values, backwards = list(data["k"]), bool(data["b"])
+        matches = data["o"] == ordering and len(raw_values) == len(keys)
+    except (TypeError, KeyError, ValueError) as exc:
+        raise InvalidCursor("Malformed cursor.") from exc
+    if not matches:
+        raise InvalidCursor("Cursor does not match the requested ordering.")
+    values = []
+    for name, raw in zip(keys, raw_values):
+        try:
+            field = model._meta.get_field(name.lstrip("-"))
+        except FieldDoesNotExist:
+            # Annotations such as relevance_score are stored as plain JSON.
+            values.append(raw)
+            continue
+        try:
+            values.append(field.to_python(raw))
+        except ValidationError as exc:
+            raise InvalidCursor("Malformed cursor.") from exc
+    return values, backwards
+
+
+def _seek(keys, values, backwards: bool) -> Q:
+    """Rows strictly after ``values`` in ``keys`` order (before, if ``backwards``)."""
+    condition = Q()
+    equal = Q()
+    for name, value in zip(keys, values):
+        column = name.lstrip("-")
+        ascending = not name.startswith("-")
+        lookup = "gt" if ascending != backwards else "lt"
+        condition |= equal & Q(**{f"{column}__{lookup}": value})
+        equal &= Q(**{column: value})
+    return condition
+
+
+def _sortable(queryset, keys) -> bool:
+    for name in keys:
+        name = name.lstrip("-")
+        if name in queryset.query.annotations:
+            continue
+        try:
+            queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return False
+    return True
+
+
+class KeysetPage:
+    """One page of rows plus the cursors of its neighbours."""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def paginate(queryset, ordering: str, cursor: str | None, page_size: int) -> KeysetPage:
+    """
+    Return the page of ``queryset`` that ``cursor`` points at.
+
+    Unknown orderings fall back to ``DEFAULT_ORDERING``; a cursor that does
+    not decode raises ``InvalidCursor``.
+    """
+    if ordering not in ORDERINGS or not _sortable(queryset, ORDERINGS[ordering]):
+        ordering = DEFAULT_ORDERING
+    keys = ORDERINGS[ordering]
+    values, backwards = decode_cursor(cursor, ordering, queryset.model) if cursor else (None, False)
+    queryset = queryset.order_by(*keys)
+    if backwards:
+        queryset = queryset.reverse()
+    if values is not None:
+        queryset = queryset.filter(_seek(keys, values, backwards))
+    rows = list(queryset[: page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+    if not rows:
+        return KeysetPage(rows)
+
+    def key_of(row):
+        return [getattr(row, name.lstrip("-")) for name in keys]
+
+    more_after = has_more if not backwards else True
+    more_before = has_more if backwards else values is not None
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor(ordering, key_of(rows[-1])) if more_after else None,
+        previous_cursor=encode_cursor(ordering, key_of(rows[0]), backwards=True) if more_before else None,
+    )
+
+
+class KeysetPagination(BasePagination):
+    """DRF pagination over ``paginate()``, driven by the ``ordering`` query parameter."""
+
+    cursor_query_param = "cursor"
+    ordering_query_param = "ordering"
+    page_size = api_settings.PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        ordering = request.query_params.get(self.ordering_query_param, DEFAULT_ORDERING)
+        try:
+            self.page = paginate(queryset, ordering, request.query_params.get(self.cursor_query_param), self.page_size)
+        except InvalidCursor as exc:
+            raise NotFound(str(exc)) from exc
+        return self.page.object_list
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self._link(self.page.next_cursor),
+                "previous": self._link(self.page.previous_cursor),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
@@ -0,0 +1,59 @@
+"""
+Denormalized review aggregates on ``Product``.
+
+``rating_avg``, ``rating_count`` and ``rating_histogram`` are recomputed from
+the review table whenever a review changes, so pages can show ratings without
+aggregating reviews per product.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .models import Product, Review
+
+STARS = range(1, 6)
+RATING_FIELDS = ("rating_avg", "rating_count", "rating_histogram")
+
+
+def _histograms(product_ids) -> dict[int, dict[str, int]]:
+    rows = (
+        Review.objects.filter(product_id__in=product_ids)
+        .values("product_id")
+        .annotate(**{f"star_{stars}": Count("id", filter=Q(rating=stars)) for stars in STARS})
+    )
+    return {
+        row["product_id"]: {str(stars): row[f"star_{stars}"] for stars in STARS if row[f"star_{stars}"]}
+        for row in rows
+    }
+
+
+def _apply(product: Product, histogram: dict[str, int]):
+    count = sum(histogram.values())
+    total = sum(int(stars) * votes for stars, votes in histogram.items())
+    product.rating_count = count
+    product.rating_histogram = histogram
+    product.rating_avg = (
+        (Decimal(total) / count).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP) if count else Decimal("0")
+    )
+
+
+@transaction.atomic
+def refresh_product_ratings(product_ids) -> int:
+    """
+    Recompute the rating aggregates of ``product_ids`` in two queries plus one update.
+
+    The product rows are locked first, so concurrent review writes for the
+    same product serialize and the last recompute sees every review.
+    """
+    product_ids = sorted(set(product_ids))
+    if not product_ids:
+        return 0
+    products = list(
+        Product.objects.select_for_update().filter(pk__in=product_ids).order_by("pk").only("pk", *RATING_FIELDS)
+    )
+    histograms = _histograms(product_ids)
+    for product in products:
+        _apply(product, histograms.get(product.pk, {}))
+    Product.objects.bulk_update(products, RATING_FIELDS)
+    return len(products)
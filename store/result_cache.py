@@ -0,0 +1,113 @@
+"""
+Cache of fully built result pages: ranked, already-serialized rows plus the
+counts needed to paginate them.
+
+Entries are never deleted explicitly. Each one records the version counter
+of every product it shows and of the listing scope it was computed over
+(one category, or the whole catalog), and is discarded on read as soon as
+any of those counters has moved. Serving a warm page therefore costs two
+cache round-trips and no SQL.
+
+Counters start from a random value rather than 1, so a counter that was
+evicted and later recreated never matches the version an older entry
+recorded.
+"""
+import hashlib
+import json
+import random
+
+from django.core.cache import cache
+
+
+class ResultPageCache:
+    """Version-validated cache for search and listing result pages."""
+
+    TIMEOUT = 300  # 5 minutes
+    PRODUCT_VERSION_KEY = "catalog:version:product:{}"
+    CATEGORY_VERSION_KEY = "catalog:version:category:{}"
+    CATALOG_VERSION_KEY = "catalog:version:all"
+    # Moves with every product bump; guards builds against changes made while they ran.
+    PRODUCTS_EPOCH_KEY = "catalog:version:products"
+
+    @classmethod
+    def make_key(cls, shape: str, params: dict) -> str:
+        """Cache key for one page of ``shape`` rows under ``params``."""
+        key_str = json.dumps(params, sort_keys=True, default=str)
+        return f"results:{shape}:{hashlib.md5(key_str.encode()).hexdigest()}"
+
+    @classmethod
+    def _scope_key(cls, category: str | None) -> str:
+        if category:
+            return cls.CATEGORY_VERSION_KEY.format(category)
+        return cls.CATALOG_VERSION_KEY
+
+    @staticmethod
+    def _seed() -> int:
+        # Integers, so cache.incr keeps working; 62 bits stay inside Redis' signed range.
+        return random.getrandbits(62)
+
+    @classmethod
+    def _current_versions(cls, keys: list[str]) -> dict:
+        versions = cache.get_many(keys)
+        missing = {key: cls._seed() for key in keys if key not in versions}
+        if missing:
+            cache.set_many(missing, None)
+            versions.update(missing)
+        return versions
+
+    @classmethod
+    def get(cls, key: str):
+        entry = cache.get(key)
+        if entry is None:
+            return None
+        if cache.get_many(list(entry["versions"])) != entry["versions"]:
+            return None
+        return entry["payload"]
+
+    @classmethod
+    def get_or_build(cls, key: str, build, category: str | None = None):
+        """
+        Return the cached payload for ``key`` or compute it.
+
+        ``build`` returns ``(payload, product_ids)``. The scope version and
+        the products epoch are read before building, so a concurrent catalog
+        change cannot be cached under the newer version. The displayed
+        products are only known once ``build`` has run; if any product was
+        bumped meanwhile the payload is returned without being cached.
+        """
+        payload = cls.get(key)
+        if payload is not None:
+            return payload
+        before = cls._current_versions([cls._scope_key(category), cls.PRODUCTS_EPOCH_KEY])
+        epoch = before.pop(cls.PRODUCTS_EPOCH_KEY)
+        payload, product_ids = build()
+        versions = cls._current_versions(
+            [cls.PRODUCTS_EPOCH_KEY, *(cls.PRODUCT_VERSION_KEY.format(pk) for pk in product_ids)]
+        )
+        if versions.pop(cls.PRODUCTS_EPOCH_KEY) != epoch:
+            return payload
+        versions.update(before)
+        cache.set(key, {"versions": versions, "payload": payload}, cls.TIMEOUT)
+        return payload
+
+    @classmethod
+    def _bump(cls, key: str):
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Evicted: restart from a fresh random value so entries that
+            # recorded the old counter can never match a recreated one.
+            cache.set(key, cls._seed(), None)
+
+    @classmethod
+    def bump_product(cls, product_id: int):
+        """Invalidate pages that display ``product_id``."""
+        cls._bump(cls.PRODUCT_VERSION_KEY.format(product_id))
+        cls._bump(cls.PRODUCTS_EPOCH_KEY)
+
+    @classmethod
+    def bump_listing(cls, *category_slugs: str):
+        """Invalidate listings of the given categories and of the whole catalog."""
+        for slug in category_slugs:
+            cls._bump(cls.CATEGORY_VERSION_KEY.format(slug))
+        cls._bump(cls.CATALOG_VERSION_KEY)
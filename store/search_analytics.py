@@ -0,0 +1,191 @@
+"""
+Search analytics: time-bucketed query counters and trending queries.
+
+Counts are kept in Redis sorted sets (one per time bucket) when
+``SEARCH_ANALYTICS_REDIS_URL`` is configured, and in a bounded in-process
+counter otherwise. Requests only append to a local buffer; a background
+thread flushes it in one pipeline every few seconds.
+"""
+import atexit
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+try:
+    import redis
+except ImportError:  # pragma: no cover
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+# resolution -> (bucket length in seconds, retention in seconds)
+RESOLUTIONS = {
+    "5m": (300, 2 * 3600),
+    "1h": (3600, 8 * 86400),
+}
+# window -> (resolution, number of buckets)
+WINDOWS = {
+    "hour": ("5m", 12),
+    "day": ("1h", 24),
+    "week": ("1h", 168),
+}
+DEFAULT_WINDOW = "day"
+
+
+def normalize_query(query: str) -> str:
+    return WHITESPACE_RE.sub(" ", (query or "").strip().lower())[:100]
+
+
+def bucket_key(resolution: str, index: int) -> str:
+    return f"search:queries:{resolution}:{index}"
+
+
+def window_keys(window: str, now: float) -> list[str]:
+    """Bucket keys covering ``window``, newest first; no key scanning needed."""
+    resolution, count = WINDOWS[window]
+    current = int(now // RESOLUTIONS[resolution][0])
+    return [bucket_key(resolution, index) for index in range(current, current - count, -1)]
+
+
+class MemoryAnalyticsStore:
+    """Bounded per-process fallback used when Redis is not configured."""
+
+    MAX_TERMS_PER_BUCKET = 1000
+
+    def __init__(self):
+        self.buckets: dict[str, Counter] = {}
+        self.expiry: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _purge(self, now: float):
+        for key in [key for key, expires in self.expiry.items() if expires <= now]:
+            self.buckets.pop(key, None)
+            self.expiry.pop(key, None)
+
+    def add(self, counts: dict[tuple[str, str], int], now: float):
+        with self._lock:
+            self._purge(now)
+            for (key, query), count in counts.items():
+                bucket = self.buckets.setdefault(key, Counter())
+                bucket[query] += count
+                if len(bucket) > self.MAX_TERMS_PER_BUCKET:
+                    # Keep the heavy hitters; the long tail never trends anyway.
+                    self.buckets[key] = Counter(dict(bucket.most_common(self.MAX_TERMS_PER_BUCKET // 2)))
+                resolution = key.split(":")[2]
+                self.expiry.setdefault(key, now + RESOLUTIONS[resolution][1])
+
+    def top(self, keys: list[str], limit: int) -> list[tuple[str, float]]:
+        total = Counter()
+        with self._lock:
+            for key in keys:
+                total.update(self.buckets.get(key, {}))
+        return total.most_common(limit)
+
+
+class RedisAnalyticsStore:
+    """One sorted set per bucket; windows are merged with ZUNIONSTORE."""
+
+    UNION_TTL = 60
+
+    def __init__(self, client):
+        self.client = client
+
+    def add(self, counts: dict[tuple[str, str], int], now: float):
+        pipe = self.client.pipeline(transaction=False)
+        for (key, query), count in counts.items():
+            pipe.zincrby(key, count, query)
+        for key in {key for key, _ in counts}:
+            resolution = key.split(":")[2]
+            pipe.expire(key, RESOLUTIONS[resolution][1])
+        pipe.execute()
+
+    def top(self, keys: list[str], limit: int) -> list[tuple[str, float]]:
+        # The merged window is cached briefly under a name tied to the newest bucket.
+        union_key = f"search:popular:{keys[0]}:{len(keys)}"
+        if not self.client.exists(union_key):
+            pipe = self.client.pipeline()
+            pipe.zunionstore(union_key, keys)
+            pipe.expire(union_key, self.UNION_TTL)
+            pipe.execute()
+        rows = self.client.zrevrange(union_key, 0, limit - 1, withscores=True)
+        return [(member.decode() if isinstance(member, bytes) else member, score) for member, score in rows]
+
+
+class SearchAnalytics:
+    """Buffers query counts and flushes them to the store off the request path."""
+
+    FLUSH_INTERVAL = 5  # seconds
+    MAX_BUFFER = 1000
+
+    def __init__(self, store=None):
+        self._store = store
+        self._buffer: Counter = Counter()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._flusher_pid = None
+
+    @property
+    def store(self):
+        if self._store is None:
+            url = getattr(settings, "SEARCH_ANALYTICS_REDIS_URL", "")
+            if url and redis is not None:
+                self._store = RedisAnalyticsStore(redis.Redis.from_url(url, socket_timeout=1))
+            else:
+                self._store = MemoryAnalyticsStore()
+        return self._store
+
+    def _ensure_flusher(self):
+        # Threads do not survive a fork, so each worker starts its own.
+        if self._flusher_pid == os.getpid():
+            return
+        self._flusher_pid = os.getpid()
+        threading.Thread(target=self._run_flusher, name="search-analytics", daemon=True).start()
+
+    def _run_flusher(self):
+        while True:
+            self._wakeup.wait(self.FLUSH_INTERVAL)
+            self._wakeup.clear()
+            self.flush()
+
+    def record(self, query: str, now: float | None = None):
+        query = normalize_query(query)
+        if len(query) < 2:
+            return
+        now = time.time() if now is None else now
+        with self._lock:
+            for resolution, (seconds, _) in RESOLUTIONS.items():
+                self._buffer[(bucket_key(resolution, int(now // seconds)), query)] += 1
+            full = len(self._buffer) >= self.MAX_BUFFER
+        self._ensure_flusher()
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        with self._lock:
+            counts, self._buffer = self._buffer, Counter()
+        if not counts:
+            return
+        try:
+            self.store.add(counts, time.time())
+        except Exception:
+            logger.warning("Dropping %d search analytics counters", len(counts), exc_info=True)
+
+    def popular(self, limit: int = 10, window: str = DEFAULT_WINDOW, now: float | None = None) -> list[tuple[str, float]]:
+        """Most searched queries over the sliding ``window``."""
+        now = time.time() if now is None else now
+        try:
+            return self.store.top(window_keys(window, now), limit)
+        except Exception:
+            logger.warning("Could not read popular searches", exc_info=True)
+            return []
+
+
+search_analytics = SearchAnalytics()
+atexit.register(search_analytics.flush)
@@ -0,0 +1,390 @@
+"""
+Pluggable search backends for the product catalog.
+
+``SearchService`` asks the configured backend (``settings.SEARCH_BACKEND``)
+for ranked product IDs and only touches the database to hydrate those rows
+by primary key. When no backend is configured one is picked for the active
+database vendor: a ``tsvector`` shadow table on PostgreSQL, an FTS5 shadow
+table on SQLite, and an in-process inverted index everywhere else. All of
+them are kept current through model signals.
+"""
+import math
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.utils import DatabaseError
+from django.utils.module_loading import import_string
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOP_WORDS = frozenset(
+    {"a", "an", "and", "are", "as", "at", "by", "for", "in", "is", "of", "on", "or", "the", "to", "with"}
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase ``text`` and split it into alphanumeric terms."""
+    if not text:
+        return []
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOP_WORDS]
+
+
+def product_document(product) -> dict[str, str]:
+    """Searchable text of a product, split by field."""
+    return {
+        "title": product.title,
+        "description": product.description,
+        "tags": " ".join(tag.name for tag in product.tags.all()),
+    }
+
+
+def indexable_products():
+    from .models import Product
+
+    return (
+        Product.objects.filter(is_published=True)
+        .only("id", "title", "description")
+        .prefetch_related("tags")
+    )
+
+
+class BaseSearchBackend:
+    """Interface implemented by every search backend."""
+
+    def search(self, query: str, limit: int | None = None) -> list[tuple[int, float]]:
+        """Return ``(product_id, score)`` pairs, best match first."""
+        raise NotImplementedError
+
+    def index_product(self, product) -> None:
+        """Add or refresh a single product."""
+
+    def remove_product(self, product_id: int) -> None:
+        """Drop a product from the index."""
+
+    def rebuild(self) -> None:
+        """Re-index the whole catalog."""
+
+
+class InvertedIndex:
+    """
+    Term -> postings index scored with BM25.
+
+    Title, tag and description terms share one posting list per term but
+    contribute different weights to the term frequency, so a title hit
+    outranks the same word buried in a description.
+    """
+
+    K1 = 1.2
+    B = 0.75
+    FIELD_WEIGHTS = {"title": 3.0, "tags": 2.0, "description": 1.0}
+    PREFIX_BOOST = 0.5
+    MAX_PREFIX_EXPANSIONS = 20
+
+    def __init__(self):
+        self.postings: dict[str, dict[int, float]] = {}
+        self.doc_terms: dict[int, dict[str, float]] = {}
+        self.doc_lengths: dict[int, float] = {}
+        self.total_length = 0.0
+        self._vocabulary: list[str] | None = None
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.doc_lengths
+
+    def add(self, doc_id: int, fields: dict[str, str]):
+        self.remove(doc_id)
+        terms: dict[str, float] = defaultdict(float)
+        for field, text in fields.items():
+            weight = self.FIELD_WEIGHTS.get(field, 1.0)
+            for token in tokenize(text):
+                terms[token] += weight
+        if not terms:
+            return
+        for term, tf in terms.items():
+            docs = self.postings.get(term)
+            if docs is None:
+                docs = self.postings[term] = {}
+                self._vocabulary = None
+            docs[doc_id] = tf
+        length = sum(terms.values())
+        self.doc_terms[doc_id] = dict(terms)
+        self.doc_lengths[doc_id] = length
+        self.total_length += length
+
+    def remove(self, doc_id: int):
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            docs = self.postings.get(term)
+            if docs is None:
+                continue
+            docs.pop(doc_id, None)
+            if not docs:
+                del self.postings[term]
+                self._vocabulary = None
+        self.total_length -= self.doc_lengths.pop(doc_id, 0.0)
+
+    def _expand(self, token: str) -> list[tuple[str, float]]:
+        """Exact term plus a bounded number of prefix completions."""
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        vocabulary = self._vocabulary
+        expansions = [(token, 1.0)] if token in self.postings else []
+        position = bisect_left(vocabulary, token)
+        while position < len(vocabulary) and len(expansions) <= self.MAX_PREFIX_EXPANSIONS:
+            term = vocabulary[position]
+            if not term.startswith(token):
+                break
+            if term != token:
+                expansions.append((term, self.PREFIX_BOOST))
+            position += 1
+        return expansions
+
+    def search(self, query: str, limit: int | None = None) -> list[tuple[int, float]]:
+        tokens = tokenize(query)
+        doc_count = len(self.doc_lengths)
+        if not tokens or not doc_count:
+            return []
+        avg_length = self.total_length / doc_count
+        scores: dict[int, float] = defaultdict(float)
+        for token in dict.fromkeys(tokens):
+            for term, boost in self._expand(token):
+                docs = self.postings[term]
+                idf = math.log(1 + (doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+                for doc_id, tf in docs.items():
+                    norm = tf + self.K1 * (1 - self.B + self.B * self.doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] += boost * idf * tf * (self.K1 + 1) / norm
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+        return ranked[:limit] if limit else ranked
+
+
+class SharedGenerationMixin:
+    """
+    Keeps a process-local structure in step with other worker processes.
+
+    Each worker owns its own copy, built by ``_build()``. Mutations bump a
+    shared generation counter in the cache; a process that notices a
+    generation it did not produce itself rebuilds on its next read.
+    """
+
+    GENERATION_KEY = ""
+
+    def __init__(self):
+        self._index = None
+        self._generation = None
+        self._lock = threading.RLock()
+
+    def _build(self):
+        raise NotImplementedError
+
+    def _get_generation(self):
+        return cache.get(self.GENERATION_KEY, 0)
+
+    def _bump_generation(self):
+        cache.add(self.GENERATION_KEY, 0, None)
+        try:
+            generation = cache.incr(self.GENERATION_KEY)
+        except ValueError:
+            generation = None
+        if self._generation is not None and generation == self._generation + 1:
+            self._generation = generation
+        else:
+            self._index = None
+
+    def _ensure_index(self):
+        generation = self._get_generation()
+        with self._lock:
+            if self._index is None or generation != self._generation:
+                self._index = self._build()
+                self._generation = generation
+            return self._index
+
+    def rebuild(self) -> None:
+        with self._lock:
+            self._index = None
+            self._bump_generation()
+            self._ensure_index()
+
+
+class InvertedIndexBackend(SharedGenerationMixin, BaseSearchBackend):
+    """In-process BM25 index over published products."""
+
+    GENERATION_KEY = "search:index:generation"
+
+    def _build(self) -> InvertedIndex:
+        index = InvertedIndex()
+        for product in indexable_products().iterator(chunk_size=1000):
+            index.add(product.pk, product_document(product))
+        return index
+
+    def search(self, query: str, limit: int | None = None) -> list[tuple[int, float]]:
+        index = self._ensure_index()
+        with self._lock:
+            return index.search(query, limit=limit)
+
+    def index_product(self, product) -> None:
+        with self._lock:
+            if self._index is not None:
+                if product.is_published:
+                    self._index.add(product.pk, product_document(product))
+                else:
+                    self._index.remove(product.pk)
+            self._bump_generation()
+
+    def remove_product(self, product_id: int) -> None:
+        with self._lock:
+            if self._index is not None:
+                self._index.remove(product_id)
+            self._bump_generation()
+
+
+class DatabaseSearchBackend(BaseSearchBackend):
+    """
+    Shared plumbing for backends that keep a full-text shadow table.
+
+    The tables are created by migration ``store.0004_search_shadow_tables``.
+    Rows are written by the model signals inside the same transaction as
+    the product change, so the index commits or rolls back with it.
+    """
+
+    vendor = ""
+    table_name = ""
+    key_column = ""
+
+    def _upsert(self, cursor, product_id: int, document: dict[str, str]) -> None:
+        raise NotImplementedError
+
+    def index_product(self, product) -> None:
+        if not product.is_published:
+            self.remove_product(product.pk)
+            return
+        with connection.cursor() as cursor:
+            self._upsert(cursor, product.pk, product_document(product))
+
+    def remove_product(self, product_id: int) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table_name} WHERE {self.key_column} = %s", [product_id])
+
+    def rebuild(self) -> None:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table_name}")
+            for product in indexable_products().iterator(chunk_size=1000):
+                self._upsert(cursor, product.pk, product_document(product))
+
+    @staticmethod
+    def _terms(query: str) -> list[str]:
+        return list(dict.fromkeys(tokenize(query)))
+
+
+class SQLiteFTSSearchBackend(DatabaseSearchBackend):
+    """FTS5 shadow table ranked with ``bm25()``."""
+
+    vendor = "sqlite"
+    table_name = "store_product_fts"
+    key_column = "rowid"
+    # bm25() column weights, in column order: title, description, tags
+    COLUMN_WEIGHTS = (10.0, 1.0, 5.0)
+
+    @staticmethod
+    def is_supported(conn=connection) -> bool:
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("CREATE VIRTUAL TABLE temp.store_fts5_probe USING fts5(body)")
+                cursor.execute("DROP TABLE temp.store_fts5_probe")
+        except DatabaseError:
+            return False
+        return True
+
+    def _upsert(self, cursor, product_id: int, document: dict[str, str]) -> None:
+        cursor.execute(f"DELETE FROM {self.table_name} WHERE rowid = %s", [product_id])
+        cursor.execute(
+            f"INSERT INTO {self.table_name} (rowid, title, description, tags) VALUES (%s, %s, %s, %s)",
+            [product_id, document["title"], document["description"], document["tags"]],
+        )
+
+    def search(self, query: str, limit: int | None = None) -> list[tuple[int, float]]:
+        terms = self._terms(query)
+        if not terms:
+            return []
+        weights = ", ".join(str(weight) for weight in self.COLUMN_WEIGHTS)
+        sql = (
+            f"SELECT rowid, bm25({self.table_name}, {weights}) AS rank FROM {self.table_name} "
+            f"WHERE {self.table_name} MATCH %s ORDER BY rank, rowid DESC"
+        )
+        params: list = [" OR ".join(f'"{term}"*' for term in terms)]
+        if limit:
+            sql += " LIMIT %s"
+            params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            # bm25() is lower-is-better; flip it so scores sort descending
+            return [(row[0], -row[1]) for row in cursor.fetchall()]
+
+
+class PostgresSearchBackend(DatabaseSearchBackend):
+    """Weighted ``tsvector`` shadow table with a GIN index, ranked with ``ts_rank``."""
+
+    vendor = "postgresql"
+    table_name = "store_product_search"
+    key_column = "product_id"
+    CONFIG = "english"
+
+    def _upsert(self, cursor, product_id: int, document: dict[str, str]) -> None:
+        cursor.execute(
+            f"INSERT INTO {self.table_name} (product_id, document) VALUES ("
+            "%(id)s, "
+            "setweight(to_tsvector(%(config)s, %(title)s), 'A') || "
+            "setweight(to_tsvector(%(config)s, %(tags)s), 'B') || "
+            "setweight(to_tsvector(%(config)s, %(description)s), 'C')) "
+            "ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document",
+            {"id": product_id, "config": self.CONFIG, **document},
+        )
+
+    def search(self, query: str, limit: int | None = None) -> list[tuple[int, float]]:
+        terms = self._terms(query)
+        if not terms:
+            return []
+        sql = (
+            f"SELECT product_id, ts_rank(document, query) AS rank "
+            f"FROM {self.table_name}, to_tsquery(%s, %s) AS query "
+            f"WHERE document @@ query ORDER BY rank DESC, product_id DESC"
+        )
+        params: list = [self.CONFIG, " | ".join(f"{term}:*" for term in terms)]
+        if limit:
+            sql += " LIMIT %s"
+            params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [(row[0], float(row[1])) for row in cursor.fetchall()]
+
+_backend: BaseSearchBackend | None = None
+
+
+def default_backend_path() -> str:
+    """Pick the best backend for the active database vendor."""
+    if connection.vendor == "postgresql":
+        return "store.search_backends.PostgresSearchBackend"
+    if connection.vendor == "sqlite" and SQLiteFTSSearchBackend.is_supported():
+        return "store.search_backends.SQLiteFTSSearchBackend"
+    return "store.search_backends.InvertedIndexBackend"
+
+
+def get_search_backend() -> BaseSearchBackend:
+    """Return the process-wide backend configured by ``SEARCH_BACKEND``."""
+    global _backend
+    if _backend is None:
+        backend_path = getattr(settings, "SEARCH_BACKEND", "") or default_backend_path()
+        _backend = import_string(backend_path)()
+    return _backend
+
+
+def reset_search_backend():
+    global _backend
+    _backend = None
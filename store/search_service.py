@@ -1,53 +1,54 @@
 """
-Enhanced search service with caching and analytics.
-Can be extended to use Elasticsearch/Haystack when configured.
+Enhanced search service with ranking and analytics.
+Matching and ranking are delegated to the backend in ``search_backends``;
+result pages are cached by ``result_cache``.
 """
-import hashlib
-import json
 from typing import Any
 
 from django.conf import settings
-from django.core.cache import cache
-from django.db.models import Q, QuerySet, Count, F
+from django.db.models import Case, F, FloatField, QuerySet, Value, When
 from django.utils.text import slugify
 
+from .autocomplete import autocomplete
 from .models import Product
+from .search_analytics import DEFAULT_WINDOW, search_analytics
+from .search_backends import get_search_backend
 
 
 class SearchService:
-    """Enhanced search with caching, ranking, and analytics."""
+    """Enhanced search with ranking and analytics."""
 
-    CACHE_TIMEOUT = 300  # 5 minutes
     MAX_SUGGESTIONS = 10
-    POPULAR_QUERIES_KEY = "search:popular"
-    SEARCH_ANALYTICS_KEY = "search:analytics"
+    MAX_RESULTS = 500
+    FILTER_BATCH_SIZE = 1000
 
     @classmethod
-    def _cache_key(cls, query: str, filters: dict) -> str:
-        """Generate cache key for search query."""
-        key_data = {"q": query, **filters}
-        key_str = json.dumps(key_data, sort_keys=True)
-        return f"search:{hashlib.md5(key_str.encode()).hexdigest()}"
+    def track_query(cls, query: str):
+        """Count a search for the popular-searches windows."""
+        search_analytics.record(query)
 
     @classmethod
-    def _track_query(cls, query: str):
-        """Track search query for analytics."""
-        if not query or len(query.strip()) < 2:
-            return
-        query = query.strip().lower()
-        cache_key = f"{cls.SEARCH_ANALYTICS_KEY}:{query}"
-        cache.incr(cache_key, 1)
-        cache.expire(cache_key, 86400 * 30)  # 30 days
+    def _filter_ranked(cls, ranked: list[tuple[int, float]], qs: QuerySet) -> list[tuple[int, float]]:
+        """The best ``MAX_RESULTS`` of ``ranked`` that are in ``qs``, checked a batch at a time in rank order."""
+        candidates = qs.select_related(None).prefetch_related(None).order_by()
+        kept = []
+        for start in range(0, len(ranked), cls.FILTER_BATCH_SIZE):
+            batch = ranked[start:start + cls.FILTER_BATCH_SIZE]
+            allowed = set(candidates.filter(id__in=[product_id for product_id, _ in batch]).values_list("id", flat=True))
+            kept.extend(match for match in batch if match[0] in allowed)
+            if len(kept) >= cls.MAX_RESULTS:
+                break
+        return kept[:cls.MAX_RESULTS]
 
     @classmethod
-    def _get_popular_queries(cls, limit: int = 10) -> list[str]:
-        """Get popular search queries from cache."""
-        # This is a simplified version; in production, use Redis sorted sets
-        return []
+    def _build_search_queryset(cls, query: str, base_qs: QuerySet, filtered: bool = False) -> QuerySet:
+        """
+        Restrict ``base_qs`` to the backend's ranked matches, keeping their scores.
 
-    @classmethod
-    def _build_search_queryset(cls, query: str, base_qs: QuerySet) -> QuerySet:
-        """Build optimized search queryset with ranking."""
+        When ``base_qs`` is already filtered (category, price), every match is
+        fetched and the ``MAX_RESULTS`` cut is taken after the filter, so a
+        product ranked below the cut overall is still found within its filter.
+        """
         if not query:
             return base_qs
 
@@ -55,64 +56,21 @@ class SearchService:
         if len(query) < 2:
             return base_qs.none()
 
-        # Split query into words
-        words = query.split()
-        
-        # Build Q objects with priority:
-        # 1. Exact title match
-        # 2. Title contains (all words)
-        # 3. Title contains (any word)
-        # 4. Description contains
-        # 5. Tags match
-        
-        q_objects = Q()
-        
-        # Exact title match (highest priority)
-        q_objects |= Q(title__iexact=query)
-        
-        # Title contains all words
-        title_all = Q()
-        for word in words:
-            title_all &= Q(title__icontains=word)
-        q_objects |= title_all
-        
-        # Title contains any word
-        title_any = Q()
-        for word in words:
-            title_any |= Q(title__icontains=word)
-        q_objects |= title_any
-        
-        # Description contains
-        desc_q = Q()
-        for word in words:
-            desc_q |= Q(description__icontains=word)
-        q_objects |= desc_q
-        
-        # Tags match
-        tags_q = Q()
-        for word in words:
-            tags_q |= Q(tags__name__icontains=word)
-        q_objects |= tags_q
+        backend = get_search_backend()
+        if filtered:
+            ranked = cls._filter_ranked(backend.search(query), base_qs)
+        else:
+            ranked = backend.search(query, limit=cls.MAX_RESULTS)
+        if not ranked:
+            return base_qs.none()
 
-        results = base_qs.filter(q_objects).distinct()
-        
-        # Annotate with relevance score (simplified ranking)
-        # Products with exact title match get highest score
-        results = results.annotate(
-            relevance_score=Count(
-                "id",
-                filter=Q(title__iexact=query)
-            ) * 100
-            + Count(
-                "id",
-                filter=Q(title__icontains=query)
-            ) * 50
-            + Count(
-                "id",
-                filter=Q(description__icontains=query)
-            ) * 10
+        relevance = Case(
+            *[When(id=product_id, then=Value(score)) for product_id, score in ranked],
+            default=Value(0.0),
+            output_field=FloatField(),
         )
-        
+        results = base_qs.filter(id__in=[product_id for product_id, _ in ranked])
+        results = results.annotate(relevance_score=relevance)
         return results.order_by("-relevance_score", "-is_trending", "-created_at")
 
     @classmethod
@@ -123,10 +81,13 @@ class SearchService:
         min_price: float | None = None,
         max_price: float | None = None,
         ordering: str = "-created_at",
-        use_cache: bool = True,
     ) -> QuerySet:
         """
-        Search products with caching and ranking.
+        Search products with ranking.
+
+        Whole result pages are cached by the callers through
+        ``ResultPageCache``, so this always builds a fresh queryset. Callers
+        also count the query with ``track_query`` so cache hits are counted.
         
         Args:
             query: Search query string
@@ -134,48 +95,27 @@ class SearchService:
             min_price: Minimum price filter
             max_price: Maximum price filter
             ordering: Ordering field
-            use_cache: Whether to use cache
             
         Returns:
             QuerySet of products
         """
-        # Track query for analytics
-        if query:
-            cls._track_query(query)
-
-        # Build cache key
-        filters = {
-            "category": category or "",
-            "min_price": str(min_price) if min_price else "",
-            "max_price": str(max_price) if max_price else "",
-            "ordering": ordering,
-        }
-        cache_key = cls._cache_key(query, filters)
-
-        # Try cache first
-        if use_cache:
-            cached = cache.get(cache_key)
-            if cached is not None:
-                # Return queryset from cached IDs
-                product_ids = cached
-                return Product.objects.filter(id__in=product_ids).order_by(ordering)
-
         # Build base queryset
         qs = Product.objects.filter(is_published=True).select_related("category").prefetch_related("tags", "images")
 
-        # Apply search query
-        if query:
-            qs = cls._build_search_queryset(query, qs)
-        else:
-            qs = qs.annotate(relevance_score=F("id") * 0)  # No relevance for non-search
-
-        # Apply filters
+        # Apply filters before the search, which caps its matches
         if category:
             qs = qs.filter(category__slug=category)
         if min_price is not None:
             qs = qs.filter(price__gte=min_price)
         if max_price is not None:
             qs = qs.filter(price__lte=max_price)
+        filtered = bool(category) or min_price is not None or max_price is not None
+
+        # Apply search query
+        if query:
+            qs = cls._build_search_queryset(query, qs, filtered=filtered)
+        else:
+            qs = qs.annotate(relevance_score=F("id") * 0)  # No relevance for non-search
 
         # Apply ordering (if not already ordered by relevance)
         if not query or ordering != "-relevance_score":
@@ -184,17 +124,12 @@ class SearchService:
             else:
                 qs = qs.order_by(ordering, "-created_at")
 
-        # Cache results (store IDs only)
-        if use_cache:
-            product_ids = list(qs.values_list("id", flat=True)[:100])  # Limit cache size
-            cache.set(cache_key, product_ids, cls.CACHE_TIMEOUT)
-
         return qs
 
     @classmethod
     def get_suggestions(cls, query: str, limit: int = 5) -> list[dict]:
         """
-        Get search suggestions with fuzzy matching.
+        Get search suggestions from the in-memory autocomplete index.
         
         Args:
             query: Partial search query
@@ -205,49 +140,9 @@ class SearchService:
         """
         if not query or len(query.strip()) < 2:
             return []
-
-        query = query.strip().lower()
-        cache_key = f"search:suggestions:{hashlib.md5(query.encode()).hexdigest()}"
-
-        # Try cache
-        cached = cache.get(cache_key)
-        if cached is not None:
-            return cached
-
-        # Build suggestions
-        suggestions = []
-        
-        # Exact title matches (highest priority)
-        exact_matches = Product.objects.filter(
-            title__iexact=query, is_published=True
-        ).values("title", "slug")[:limit]
-        for item in exact_matches:
-            suggestions.append({**item, "match_type": "exact"})
-
-        # Title starts with
-        if len(suggestions) < limit:
-            starts_with = Product.objects.filter(
-                title__istartswith=query, is_published=True
-            ).exclude(slug__in=[s["slug"] for s in suggestions]).values("title", "slug")[:limit - len(suggestions)]
-            for item in starts_with:
-                suggestions.append({**item, "match_type": "starts_with"})
-
-        # Title contains
-        if len(suggestions) < limit:
-            contains = Product.objects.filter(
-                title__icontains=query, is_published=True
-            ).exclude(slug__in=[s["slug"] for s in suggestions]).values("title", "slug")[:limit - len(suggestions)]
-            for item in contains:
-                suggestions.append({**item, "match_type": "contains"})
-
-        # Cache suggestions
-        cache.set(cache_key, suggestions, cls.CACHE_TIMEOUT)
-
-        return suggestions
+        return autocomplete.suggest(query, limit=min(limit, cls.MAX_SUGGESTIONS))
 
     @classmethod
-    def get_popular_searches(cls, limit: int = 10) -> list[str]:
-        """Get popular search queries."""
-        # Simplified implementation; in production, use Redis sorted sets
-        return []
-
+    def get_popular_searches(cls, limit: int = 10, window: str = DEFAULT_WINDOW) -> list[str]:
+        """Most searched queries over the last hour, day or week."""
+        return [query for query, _ in search_analytics.popular(limit=limit, window=window)]
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 
-from .models import Category, Product, ProductImage, Review, Tag
+from .compiled_serializers import CompiledSerializerMixin
+from .models import Category, Product, ProductImage, ProductQuerySet, Review, Tag
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -23,7 +24,7 @@ class ReviewSerializer(serializers.ModelSerializer):
         fields = ("id", "user", "rating", "headline", "body", "created_at")
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(CompiledSerializerMixin, serializers.ModelSerializer):
     category = CategorySerializer()
     images = ProductImageSerializer(many=True)
     reviews = ReviewSerializer(many=True)
@@ -42,9 +43,119 @@ class ProductSerializer(serializers.ModelSerializer):
             "discount_percentage",
             "sku",
             "is_trending",
+            "rating_avg",
+            "rating_count",
+            "rating_histogram",
             "category",
             "images",
             "tags",
             "reviews",
         )
 
+
+def _query_list(request, name: str) -> list[str]:
+    if request is None:
+        return []
+    values = request.query_params.getlist(name)
+    return [part.strip() for value in values for part in value.split(",") if part.strip()]
+
+
+class ProductListSerializer(CompiledSerializerMixin, serializers.ModelSerializer):
+    """
+    Compact product row for list endpoints.
+
+    ``?fields=id,title,price`` trims the row and ``?expand=images,reviews``
+    adds nested relations; ``ProductViewSet`` prefetches only what is asked for.
+    """
+
+    category = serializers.SlugRelatedField(slug_field="slug", read_only=True)
+    tags = serializers.SlugRelatedField(many=True, read_only=True, slug_field="name")
+    image = serializers.SerializerMethodField()
+
+    EXPANDABLE_FIELDS = {
+        "category": CategorySerializer,
+        "description": serializers.CharField,
+        "images": lambda: ProductImageSerializer(many=True),
+        "reviews": lambda: ReviewSerializer(many=True),
+    }
+
+    class Meta:
+        model = Product
+        fields = (
+            "id",
+            "title",
+            "slug",
+            "price",
+            "old_price",
+            "discount_percentage",
+            "stock",
+            "sku",
+            "is_trending",
+            "rating_avg",
+            "rating_count",
+            "category",
+            "tags",
+            "image",
+        )
+
+    @classmethod
+    def requested_fields(cls, request) -> tuple[list[str], set[str]]:
+        """Output field names and expanded relations for ``request``; ``id`` is always kept."""
+        expand = {name for name in _query_list(request, "expand") if name in cls.EXPANDABLE_FIELDS}
+        available = list(cls.Meta.fields) + sorted(expand - set(cls.Meta.fields))
+        only = set(_query_list(request, "fields"))
+        if only:
+            available = [name for name in available if name in only or name in expand or name == "id"]
+        return available, expand
+
+    def get_fields(self):
+        fields = super().get_fields()
+        names, expand = self.requested_fields(self.context.get("request"))
+        for name in expand:
+            fields[name] = self.EXPANDABLE_FIELDS[name]()
+        return {name: fields[name] for name in names}
+
+    def get_image(self, obj):
+        if not obj.primary_image:
+            return None
+        url = ProductImage._meta.get_field("image").storage.url(obj.primary_image)
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request is not None else url
+
+
+class ProductCardSerializer(serializers.ModelSerializer):
+    """
+    Flat payload rendered by ``store/partials/product_card.html``.
+
+    Expects rows from ``Product.objects.cards()``.
+    """
+
+    current_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    image_url = serializers.SerializerMethodField()
+    tag_names = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Product
+        fields = (
+            "id",
+            "title",
+            "slug",
+            "current_price",
+            "old_price",
+            "discount_percentage",
+            "stock",
+            "is_trending",
+            "rating_avg",
+            "rating_count",
+            "image_url",
+            "tag_names",
+        )
+
+    def get_image_url(self, obj):
+        if not obj.primary_image:
+            return ""
+        return ProductImage._meta.get_field("image").storage.url(obj.primary_image)
+
+    def get_tag_names(self, obj):
+        names = (getattr(obj, f"tag_name_{position}", None) for position in range(ProductQuerySet.CARD_TAGS))
+        return [name for name in names if name]
@@ -0,0 +1,151 @@
+from django.core.signals import setting_changed
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .autocomplete import autocomplete
+from .models import Category, Product, ProductImage, Review, Tag
+from .ratings import refresh_product_ratings
+from .result_cache import ResultPageCache
+from .search_backends import get_search_backend, reset_search_backend
+
+# Product fields that change how a product card looks but not which
+# listings it appears in or where it sorts.
+DISPLAY_ONLY_FIELDS = frozenset({"stock", "updated_at"})
+
+
+def _invalidate_results(product_ids, category_ids=()):
+    for product_id in product_ids:
+        ResultPageCache.bump_product(product_id)
+    slugs = Category.objects.filter(pk__in=category_ids).values_list("slug", flat=True) if category_ids else []
+    ResultPageCache.bump_listing(*slugs)
+
+
+def _reindex(product_ids):
+    backend = get_search_backend()
+    products = list(Product.objects.filter(pk__in=product_ids))
+    for product in products:
+        backend.index_product(product)
+        autocomplete.index_product(product)
+    _invalidate_results(
+        [product.pk for product in products], {product.category_id for product in products}
+    )
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    get_search_backend().index_product(instance)
+    autocomplete.index_product(instance)
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    get_search_backend().remove_product(instance.pk)
+    autocomplete.remove_product(instance.pk)
+
+
+@receiver(pre_save, sender=Product)
+def remember_previous_category(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or instance.pk is None or (update_fields is not None and "category" not in update_fields):
+        return
+    instance._previous_category_id = (
+        Product.objects.filter(pk=instance.pk).values_list("category_id", flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Product)
+def invalidate_product_results(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and set(update_fields) <= DISPLAY_ONLY_FIELDS:
+        ResultPageCache.bump_product(instance.pk)
+        return
+    previous_category_id = getattr(instance, "_previous_category_id", None)
+    _invalidate_results([instance.pk], {instance.category_id, previous_category_id} - {None})
+
+
+@receiver(post_delete, sender=Product)
+def invalidate_deleted_product_results(sender, instance, **kwargs):
+    _invalidate_results([instance.pk], [instance.category_id])
+
+
+@receiver(pre_save, sender=Review)
+def remember_previous_product(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or instance.pk is None or (update_fields is not None and "product" not in update_fields):
+        return
+    instance._previous_product_id = (
+        Review.objects.filter(pk=instance.pk).values_list("product_id", flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def refresh_review_ratings(sender, instance, raw=False, **kwargs):
+    # Connected before the cache bump below so rebuilt pages see the new rating.
+    # Review.save and deletes are atomic, so the recompute commits with the row.
+    if raw:
+        return
+    previous_product_id = getattr(instance, "_previous_product_id", None)
+    refresh_product_ratings({instance.product_id, previous_product_id} - {None})
+    if previous_product_id not in (None, instance.product_id):
+        ResultPageCache.bump_product(previous_product_id)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def invalidate_product_display(sender, instance, raw=False, **kwargs):
+    if not raw:
+        ResultPageCache.bump_product(instance.product_id)
+
+
+@receiver(post_save, sender=Category)
+def invalidate_category_results(sender, instance, raw=False, **kwargs):
+    if not raw:
+        ResultPageCache.bump_listing(instance.slug)
+
+
+@receiver(m2m_changed, sender=Product.tags.through)
+def reindex_product_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == "pre_clear":
+        # Remember which products lose this tag; pk_set is None on clear.
+        instance._search_product_ids = list(instance.products.values_list("pk", flat=True))
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        get_search_backend().index_product(instance)
+        autocomplete.index_product(instance)
+        _invalidate_results([instance.pk], [instance.category_id])
+    elif action == "post_clear":
+        _reindex(getattr(instance, "_search_product_ids", []))
+    else:
+        _reindex(pk_set)
+
+
+@receiver(post_save, sender=Tag)
+def reindex_tagged_products(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    autocomplete.index_tag(instance)
+    if not created:
+        _reindex(instance.products.values_list("pk", flat=True))
+
+
+@receiver(pre_delete, sender=Tag)
+def remember_tagged_products(sender, instance, **kwargs):
+    instance._search_product_ids = list(instance.products.values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+def reindex_untagged_products(sender, instance, **kwargs):
+    autocomplete.remove_tag(instance.pk)
+    _reindex(getattr(instance, "_search_product_ids", []))
+
+
+@receiver(setting_changed)
+def reset_backend_on_setting_change(sender, setting, **kwargs):
+    if setting == "SEARCH_BACKEND":
+        reset_search_backend()
@@ -2,12 +2,23 @@
 Tests for store app - products, categories, reviews, search
 """
 from decimal import Decimal
+from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase, Client
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from .models import Category, Product, Tag, Review
+from .models import Category, Product, ProductImage, Tag, Review
+from .autocomplete import AutocompleteIndex, autocomplete
+from .compiled_serializers import uncompiled
+from .pagination import paginate
+from .ratings import refresh_product_ratings
+from .search_backends import InvertedIndex, SQLiteFTSSearchBackend, get_search_backend
+from .result_cache import ResultPageCache
+from .search_analytics import MemoryAnalyticsStore, SearchAnalytics
 from .search_service import SearchService
 
 User = get_user_model()
@@ -138,26 +149,26 @@ class StorefrontViewTest(TestCase):
         response = self.client.get(reverse("store:home"))
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, "store/home.html")
-        self.assertIn(self.product, response.context["products"])
+        self.assertIn(self.product.id, [card["id"] for card in response.context["products"]])
 
     def test_storefront_search(self):
         response = self.client.get(reverse("store:home"), {"q": "Test"})
         self.assertEqual(response.status_code, 200)
-        self.assertIn(self.product, response.context["products"])
+        self.assertIn(self.product.id, [card["id"] for card in response.context["products"]])
 
     def test_storefront_category_filter(self):
         response = self.client.get(
             reverse("store:home"), {"category": "electronics"}
         )
         self.assertEqual(response.status_code, 200)
-        self.assertIn(self.product, response.context["products"])
+        self.assertIn(self.product.id, [card["id"] for card in response.context["products"]])
 
     def test_storefront_price_filter(self):
         response = self.client.get(
             reverse("store:home"), {"min_price": "50", "max_price": "150"}
         )
         self.assertEqual(response.status_code, 200)
-        self.assertIn(self.product, response.context["products"])
+        self.assertIn(self.product.id, [card["id"] for card in response.context["products"]])
 
     def test_product_detail_view(self):
         response = self.client.get(
@@ -233,3 +244,530 @@ class SearchServiceTest(TestCase):
     def test_get_suggestions_empty_query(self):
         suggestions = SearchService.get_suggestions("")
         self.assertEqual(len(suggestions), 0)
+
+
+class SearchResultCapTest(TestCase):
+    """Filters must narrow the ranked matches before ``MAX_RESULTS`` cuts them."""
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Electronics", slug="electronics")
+        other = Category.objects.create(name="Cases", slug="cases")
+        self.phone = Product.objects.create(
+            title="Phone", slug="phone", sku="PHONE-1", description="", price=Decimal("999.00"),
+            category=self.category,
+        )
+        cases = Product.objects.bulk_create(
+            Product(
+                title=f"Phone case {number}", slug=f"phone-case-{number}", sku=f"CASE-{number}",
+                description="", price=Decimal("10.00"), category=other,
+            )
+            for number in range(SearchService.MAX_RESULTS + 20)
+        )
+        # Every case outranks the phone, which lands past the cut.
+        ranked = [(case.pk, 2.0) for case in cases] + [(self.phone.pk, 1.0)]
+
+        class Backend:
+            def search(self, query, limit=None):
+                return ranked[:limit] if limit else ranked
+
+        patcher = patch("store.search_service.get_search_backend", return_value=Backend())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_category_filter_finds_match_past_the_cut(self):
+        results = SearchService.search_products(query="phone", category="electronics")
+        self.assertEqual(list(results), [self.phone])
+
+    def test_price_filter_finds_match_past_the_cut(self):
+        results = SearchService.search_products(query="phone", min_price=900)
+        self.assertEqual(list(results), [self.phone])
+
+    def test_unfiltered_search_is_capped(self):
+        results = SearchService.search_products(query="phone")
+        self.assertEqual(results.count(), SearchService.MAX_RESULTS)
+        self.assertNotIn(self.phone, results)
+
+
+class InvertedIndexTest(TestCase):
+    """Test the in-process BM25 index."""
+
+    def setUp(self):
+        self.index = InvertedIndex()
+        self.index.add(1, {"title": "Wireless Mouse", "description": "Ergonomic mouse", "tags": ""})
+        self.index.add(2, {"title": "Mouse Pad", "description": "Large desk pad", "tags": "gaming"})
+        self.index.add(3, {"title": "Desk Lamp", "description": "LED lamp for a wireless desk", "tags": ""})
+
+    def test_title_hits_outrank_description_hits(self):
+        ranked = [doc_id for doc_id, _ in self.index.search("wireless")]
+        self.assertEqual(ranked, [1, 3])
+
+    def test_prefix_expansion(self):
+        ranked = [doc_id for doc_id, _ in self.index.search("gam")]
+        self.assertEqual(ranked, [2])
+
+    def test_remove(self):
+        self.index.remove(1)
+        ranked = [doc_id for doc_id, _ in self.index.search("mouse")]
+        self.assertEqual(ranked, [2])
+        self.assertNotIn(1, self.index)
+
+
+class SearchBackendSignalsMixin:
+    """Test that model signals keep the search index current."""
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Audio", slug="audio")
+        self.product = Product.objects.create(
+            title="Studio Headphones",
+            description="Closed back monitoring headphones",
+            price=Decimal("149.00"),
+            sku="AUD-001",
+            category=self.category,
+        )
+        get_search_backend().rebuild()
+
+    def _ids(self, query):
+        return [product_id for product_id, _ in get_search_backend().search(query)]
+
+    def test_new_product_is_indexed(self):
+        speaker = Product.objects.create(
+            title="Bookshelf Speaker",
+            description="Passive speaker",
+            price=Decimal("99.00"),
+            sku="AUD-002",
+            category=self.category,
+        )
+        self.assertEqual(self._ids("speaker"), [speaker.id])
+
+    def test_title_change_is_reindexed(self):
+        self.product.title = "Studio Monitors"
+        self.product.save()
+        self.assertEqual(self._ids("monitors"), [self.product.id])
+        self.assertEqual(self._ids("headphones"), [self.product.id])  # still in description
+        self.assertEqual(self._ids("studio"), [self.product.id])
+
+    def test_unpublished_product_is_dropped(self):
+        self.product.is_published = False
+        self.product.save()
+        self.assertEqual(self._ids("headphones"), [])
+
+    def test_deleted_product_is_dropped(self):
+        self.product.delete()
+        self.assertEqual(self._ids("headphones"), [])
+
+    def test_tags_are_indexed(self):
+        self.product.tags.add(Tag.objects.create(name="Bluetooth"))
+        self.assertEqual(self._ids("bluetooth"), [self.product.id])
+
+    def test_search_queryset_is_ranked(self):
+        other = Product.objects.create(
+            title="Headphone Stand",
+            description="Holds studio headphones",
+            price=Decimal("19.00"),
+            sku="AUD-003",
+            category=self.category,
+        )
+        results = SearchService._build_search_queryset("studio headphones", Product.objects.all())
+        self.assertEqual(list(results), [self.product, other])
+        self.assertGreater(results[0].relevance_score, results[1].relevance_score)
+
+
+@override_settings(SEARCH_BACKEND="store.search_backends.InvertedIndexBackend")
+class InvertedIndexBackendTest(SearchBackendSignalsMixin, TestCase):
+    pass
+
+
+@override_settings(SEARCH_BACKEND="store.search_backends.SQLiteFTSSearchBackend")
+class SQLiteFTSSearchBackendTest(SearchBackendSignalsMixin, TestCase):
+    def test_backend_is_chosen_for_sqlite(self):
+        with override_settings(SEARCH_BACKEND=""):
+            self.assertIsInstance(get_search_backend(), SQLiteFTSSearchBackend)
+
+
+class AutocompleteTest(TestCase):
+    """Test the in-memory autocomplete index."""
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Audio", slug="audio")
+        self.product = Product.objects.create(
+            title="Studio Headphones",
+            description="Closed back monitoring headphones",
+            price=Decimal("149.00"),
+            sku="AUD-001",
+            category=self.category,
+        )
+        self.stand = Product.objects.create(
+            title="Headphone Stand",
+            description="Holds studio headphones",
+            price=Decimal("19.00"),
+            sku="AUD-003",
+            category=self.category,
+        )
+        autocomplete.rebuild()
+
+    def _titles(self, query):
+        return [(item["title"], item["match_type"]) for item in SearchService.get_suggestions(query)]
+
+    def test_suggestions_without_queries(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self._titles("head"),
+                [("Headphone Stand", "starts_with"), ("Studio Headphones", "contains")],
+            )
+        self.assertEqual(self._titles("headphone stand"), [("Headphone Stand", "exact")])
+
+    def test_incremental_updates(self):
+        self.stand.title = "Desk Hanger"
+        self.stand.save()
+        self.product.is_published = False
+        self.product.save()
+        self.assertEqual(self._titles("head"), [])
+        self.assertEqual(self._titles("hang"), [("Desk Hanger", "contains")])
+
+    def test_tags_of_published_products(self):
+        tag = Tag.objects.create(name="Headband")
+        self.assertEqual(self._titles("headb"), [])
+        self.product.tags.add(tag)
+        self.assertEqual(self._titles("headb"), [("Headband", "tag")])
+        self.product.delete()
+        self.assertEqual(self._titles("headb"), [])
+
+    def test_bulk_build_matches_incremental_inserts(self):
+        tags = [(1, "Wireless", "wireless"), (2, "Studio Gear", "studio-gear")]
+        products = [(3, "Studio Headphones", "studio-headphones", [1]), (4, "Headphone Stand", "stand", [1, 2])]
+        built = AutocompleteIndex.build(tags, products)
+        incremental = AutocompleteIndex()
+        for tag in tags:
+            incremental.set_tag(*tag)
+        for product in reversed(products):
+            incremental.set_product(*product)
+        self.assertEqual(built.entries, incremental.entries)
+        self.assertEqual(built.tag_counts, incremental.tag_counts)
+        self.assertEqual(built.suggest("stud", 5), incremental.suggest("stud", 5))
+
+
+@override_settings(
+    STORAGES={
+        "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+        "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    }
+)
+class ResultPageCacheTest(TestCase):
+    """Test the version-validated result page cache."""
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Audio", slug="audio")
+        self.other_category = Category.objects.create(name="Books", slug="books")
+        self.product = Product.objects.create(
+            title="Studio Headphones",
+            description="Closed back monitoring headphones",
+            price=Decimal("149.00"),
+            stock=10,
+            sku="AUD-001",
+            category=self.category,
+        )
+        self.builds = 0
+
+    def _get(self, key, category=None):
+        def build():
+            self.builds += 1
+            return {"build": self.builds}, [self.product.id]
+
+        return ResultPageCache.get_or_build(key, build, category=category)
+
+    def test_entries_are_reused_until_a_version_moves(self):
+        key = ResultPageCache.make_key("test", {"case": self.id()})
+        self.assertEqual(self._get(key, "audio"), {"build": 1})
+        self.assertEqual(self._get(key, "audio"), {"build": 1})
+        self.product.stock = 3
+        self.product.save(update_fields=["stock"])
+        self.assertEqual(self._get(key, "audio"), {"build": 2})
+        Product.objects.create(
+            title="Novel", description="", price=Decimal("9.00"), sku="BK-001", category=self.other_category
+        )
+        self.assertEqual(self._get(key, "audio"), {"build": 2})
+        Product.objects.create(
+            title="Earbuds", description="", price=Decimal("49.00"), sku="AUD-002", category=self.category
+        )
+        self.assertEqual(self._get(key, "audio"), {"build": 3})
+
+    def test_evicted_counter_does_not_revive_stale_entries(self):
+        cache.clear()
+        key = ResultPageCache.make_key("test", {"case": self.id()})
+        other = ResultPageCache.make_key("test", {"case": f"{self.id()}-other"})
+        self.assertEqual(self._get(key), {"build": 1})
+        cache.delete(ResultPageCache.PRODUCT_VERSION_KEY.format(self.product.id))
+        ResultPageCache.bump_product(self.product.id)
+        # Another page build recreates the counter; the first entry must stay invalid.
+        self._get(other)
+        self.assertEqual(self._get(key), {"build": 3})
+
+    def test_product_change_during_build_is_not_cached(self):
+        key = ResultPageCache.make_key("test", {"case": self.id()})
+
+        def build():
+            self.builds += 1
+            ResultPageCache.bump_product(self.product.id)
+            return {"build": self.builds}, [self.product.id]
+
+        self.assertEqual(ResultPageCache.get_or_build(key, build), {"build": 1})
+        self.assertIsNone(ResultPageCache.get(key))
+
+    def test_warm_storefront_page_skips_product_queries(self):
+        url = reverse("store:home") + "?category=audio"
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([card["id"] for card in response.context["products"]], [self.product.id])
+        self.assertFalse([query for query in queries if "store_product" in query["sql"]])
+        self.assertContains(response, "Studio Headphones")
+
+
+class SearchAnalyticsTest(TestCase):
+    """Test bucketed query counts and popular-query windows."""
+
+    NOW = 1_700_000_000
+
+    def setUp(self):
+        self.analytics = SearchAnalytics(store=MemoryAnalyticsStore())
+
+    def test_queries_are_normalized_and_ranked(self):
+        for query in ["Headphones", "  headphones ", "laptop", "x"]:
+            self.analytics.record(query, now=self.NOW)
+        self.analytics.flush()
+        self.assertEqual(
+            self.analytics.popular(window="hour", now=self.NOW), [("headphones", 2), ("laptop", 1)]
+        )
+
+    def test_windows_slide(self):
+        self.analytics.record("headphones", now=self.NOW - 2 * 3600)
+        self.analytics.record("laptop", now=self.NOW)
+        self.analytics.flush()
+        self.assertEqual(self.analytics.popular(window="hour", now=self.NOW), [("laptop", 1)])
+        self.assertEqual(
+            {query for query, _ in self.analytics.popular(window="day", now=self.NOW)},
+            {"headphones", "laptop"},
+        )
+        self.assertEqual(self.analytics.popular(window="day", now=self.NOW + 2 * 86400), [])
+
+    def test_buckets_are_bounded(self):
+        store = self.analytics.store
+        store.MAX_TERMS_PER_BUCKET = 10
+        for number in range(25):
+            self.analytics.record(f"query {number}", now=self.NOW)
+        self.analytics.flush()
+        self.assertTrue(all(len(bucket) <= 10 for bucket in store.buckets.values()))
+
+
+class RatingAggregatesTest(TestCase):
+    """Test the denormalized rating aggregates on Product."""
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Audio", slug="audio")
+        self.product = Product.objects.create(
+            title="Studio Headphones", description="", price=Decimal("99.00"), sku="RATE-001", category=self.category
+        )
+        self.users = [
+            User.objects.create_user(username=f"rater{number}", email=f"rater{number}@example.com", password="pass")
+            for number in range(3)
+        ]
+
+    def _review(self, user, rating):
+        return Review.objects.create(product=self.product, user=user, rating=rating, headline="", body="")
+
+    def test_reviews_maintain_aggregates(self):
+        first = self._review(self.users[0], 5)
+        self._review(self.users[1], 4)
+        self._review(self.users[2], 4)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.rating_count, 3)
+        self.assertEqual(self.product.rating_avg, Decimal("4.33"))
+        self.assertEqual(self.product.rating_histogram, {"4": 2, "5": 1})
+
+        first.rating = 1
+        first.save()
+        first.delete()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.rating_count, 2)
+        self.assertEqual(self.product.rating_avg, Decimal("4.00"))
+        self.assertEqual(self.product.rating_breakdown[1], (4, 2, 100))
+
+    def test_moved_review_refreshes_both_products(self):
+        other = Product.objects.create(
+            title="Earbuds", description="", price=Decimal("49.00"), sku="RATE-002", category=self.category
+        )
+        review = self._review(self.users[0], 5)
+        review.product = other
+        review.save()
+        self.product.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((self.product.rating_count, self.product.rating_histogram), (0, {}))
+        self.assertEqual((other.rating_count, other.rating_avg), (1, Decimal("5.00")))
+
+    def test_failed_recompute_rolls_back_the_review(self):
+        with patch("store.signals.refresh_product_ratings", side_effect=DatabaseError("lost")):
+            with self.assertRaises(DatabaseError):
+                self._review(self.users[0], 5)
+        self.assertFalse(Review.objects.exists())
+
+    def test_bulk_recompute(self):
+        self._review(self.users[0], 2)
+        Product.objects.filter(pk=self.product.pk).update(rating_avg=0, rating_count=0, rating_histogram={})
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(refresh_product_ratings([self.product.pk]), 1)
+        self.assertEqual(len([query for query in queries if "SAVEPOINT" not in query["sql"]]), 3)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.rating_count, self.product.rating_avg), (1, Decimal("2.00")))
+
+
+@override_settings(
+    STORAGES={
+        "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+        "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    }
+)
+class ProductCardQueryTest(TestCase):
+    """Test that product grids render from the card projection."""
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Audio", slug="audio")
+        self.tags = [Tag.objects.create(name=name) for name in ("wireless", "bass", "studio")]
+
+    def _create_products(self, count, offset=0):
+        for number in range(offset, offset + count):
+            product = Product.objects.create(
+                title=f"Speaker {number}",
+                description="",
+                price=Decimal("10.00"),
+                stock=5,
+                sku=f"CARD-{number:03d}",
+                category=self.category,
+                is_trending=True,
+            )
+            product.tags.set(self.tags)
+            ProductImage.objects.create(product=product, image=f"products/{number}-side.jpg")
+            ProductImage.objects.create(product=product, image=f"products/{number}.jpg", is_primary=True)
+
+    def _product_queries(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("store:home"))
+        self.assertEqual(response.status_code, 200)
+        return response, [query for query in queries if "store_product" in query["sql"]]
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        self._create_products(2)
+        _, small = self._product_queries()
+        self._create_products(18, offset=2)
+        response, large = self._product_queries()
+        # Page rows and the trending strip; keyset pages need no COUNT(*).
+        self.assertEqual(len(small), 2)
+        self.assertEqual(len(large), 2)
+        card = response.context["products"][0]
+        self.assertEqual(card["tag_names"], ["bass", "studio"])
+        self.assertTrue(card["image_url"].endswith("products/19.jpg"))
+
+
+class KeysetPaginationTest(TestCase):
+    """Test cursor pagination over composite sort keys."""
+
+    def setUp(self):
+        category = Category.objects.create(name="Audio", slug="audio")
+        for number in range(7):
+            Product.objects.create(
+                title=f"Cable {number}",
+                description="",
+                price=Decimal("5.00") if number % 2 else Decimal("9.00"),
+                sku=f"KEY-{number:03d}",
+                category=category,
+            )
+        self.queryset = Product.objects.all()
+
+    def _walk(self, ordering):
+        ids, cursor, pages = [], None, []
+        while True:
+            page = paginate(self.queryset, ordering, cursor, 3)
+            pages.append(page)
+            ids.extend(product.id for product in page.object_list)
+            if not page.has_next():
+                return ids, pages
+            cursor = page.next_cursor
+
+    def test_pages_cover_every_row_once(self):
+        for ordering, expected in [
+            ("-created_at", self.queryset.order_by("-created_at", "-id")),
+            ("price", self.queryset.order_by("price", "id")),
+        ]:
+            with self.subTest(ordering=ordering):
+                ids, pages = self._walk(ordering)
+                self.assertEqual(ids, [product.id for product in expected])
+                self.assertEqual(len(pages), 3)
+                self.assertFalse(pages[0].has_previous())
+
+    def test_previous_cursor_returns_the_prior_page(self):
+        _, pages = self._walk("price")
+        previous = paginate(self.queryset, "price", pages[2].previous_cursor, 3)
+        self.assertEqual(previous.object_list, pages[1].object_list)
+        self.assertEqual(previous.next_cursor, pages[1].next_cursor)
+
+    def test_deep_pages_use_no_offset_or_count(self):
+        _, pages = self._walk("price")
+        with CaptureQueriesContext(connection) as queries:
+            paginate(self.queryset, "price", pages[1].next_cursor, 3)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("OFFSET", queries[0]["sql"].upper())
+
+
+class CompiledSerializerTest(TestCase):
+    """Test that compiled serializers match plain DRF output."""
+
+    def setUp(self):
+        from accounts.models import Address
+        from cart.models import Cart
+        from orders.models import Order, OrderItem
+
+        self.user = User.objects.create_user(username="compiled", email="compiled@example.com", password="pass")
+        parent = Category.objects.create(name="Electronics", slug="electronics")
+        category = Category.objects.create(name="Audio", slug="audio", parent=parent)
+        self.product = Product.objects.create(
+            title="Headphones", description="Closed back", price=Decimal("149.99"), old_price=Decimal("199.00"),
+            sku="COMP-001", category=category,
+        )
+        self.product.tags.set([Tag.objects.create(name="wireless")])
+        ProductImage.objects.create(product=self.product, image="products/headphones.jpg", is_primary=True)
+        Review.objects.create(product=self.product, user=self.user, rating=5, headline="Great", body="Loud")
+        self.cart = Cart.objects.create(user=self.user)
+        self.cart.add_item(self.product, 2)
+        address = Address.objects.create(
+            user=self.user, full_name="Compiled", phone_number="100", address_line_1="1 Road", city="City",
+            state="State", postal_code="100001",
+        )
+        self.order = Order.objects.create(
+            user=self.user, shipping_address=address, subtotal=Decimal("299.98"), total=Decimal("299.98")
+        )
+        OrderItem.objects.create(
+            order=self.order, product=self.product, product_title="Headphones", quantity=2, unit_price=Decimal("149.99")
+        )
+
+    def _assert_same(self, make_serializer):
+        with uncompiled():
+            expected = make_serializer().data
+        self.assertEqual(make_serializer().data, expected)
+
+    def test_output_matches_drf(self):
+        from rest_framework.request import Request
+        from rest_framework.test import APIRequestFactory
+
+        from cart.serializers import CartSerializer
+        from orders.serializers import OrderSerializer
+
+        from .serializers import ProductListSerializer, ProductSerializer
+
+        request = Request(APIRequestFactory().get("/api/products/", {"expand": "images,reviews,category"}))
+        products = Product.objects.with_primary_image()
+        self._assert_same(lambda: ProductSerializer(Product.objects.all(), many=True))
+        self._assert_same(lambda: ProductListSerializer(products, many=True, context={"request": request}))
+        self._assert_same(lambda: CartSerializer(self.cart))
+        self._assert_same(lambda: OrderSerializer(self.order))
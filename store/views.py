@@ -5,7 +5,10 @@ from django.views.generic import DetailView, ListView, View
 
 from .forms import ProductFilterForm, ReviewForm
 from .models import Category, Product
+from .pagination import DEFAULT_ORDERING, InvalidCursor, KeysetPage, paginate
+from .result_cache import ResultPageCache
 from .search_service import SearchService
+from .serializers import ProductCardSerializer
 
 
 class StorefrontView(ListView):
@@ -13,27 +16,78 @@ class StorefrontView(ListView):
     model = Product
     paginate_by = 12
     context_object_name = "products"
+    trending_limit = 8
 
-    def get_queryset(self):
+    def get_filters(self) -> dict:
         form = ProductFilterForm(self.request.GET)
         if not form.is_valid():
-            return Product.objects.filter(is_published=True)
+            return {}
         data = form.cleaned_data
-        return SearchService.search_products(
-            query=data.get("q", ""),
-            category=data.get("category"),
-            min_price=data.get("min_price"),
-            max_price=data.get("max_price"),
-            ordering=data.get("ordering") or "-created_at",
-        )
+        return {
+            "query": data.get("q", ""),
+            "category": data.get("category") or None,
+            "min_price": data.get("min_price"),
+            "max_price": data.get("max_price"),
+            "ordering": data.get("ordering") or "-created_at",
+        }
+
+    def get_queryset(self):
+        # Left unevaluated: the filtered, ranked results are only built on a
+        # result-cache miss in paginate_queryset().
+        return Product.objects.filter(is_published=True)
+
+    def get_search_queryset(self, filters: dict):
+        if not filters:
+            return self.get_queryset()
+        return SearchService.search_products(**filters)
+
+    def paginate_queryset(self, queryset, page_size):
+        """Serve the requested page of product cards from ``ResultPageCache``."""
+        filters = self.get_filters()
+        cursor = self.request.GET.get("cursor") or None
+        if cursor is None:
+            # Counted before the cache lookup so cached result pages still trend.
+            SearchService.track_query(filters.get("query", ""))
+
+        def build():
+            results = self.get_search_queryset(filters).cards()
+            ordering = filters.get("ordering", DEFAULT_ORDERING)
+            try:
+                page = paginate(results, ordering, cursor, page_size)
+            except InvalidCursor:
+                page = paginate(results, ordering, None, page_size)
+            cards = list(ProductCardSerializer(page.object_list, many=True).data)
+            payload = {"cards": cards, "next": page.next_cursor, "previous": page.previous_cursor}
+            return payload, [card["id"] for card in cards]
+
+        key = ResultPageCache.make_key("storefront", {**filters, "cursor": cursor, "size": page_size})
+        payload = ResultPageCache.get_or_build(key, build, category=filters.get("category"))
+        page = KeysetPage(payload["cards"], payload["next"], payload["previous"])
+        return None, page, page.object_list, page.has_other_pages()
+
+    def _page_url(self, cursor):
+        params = self.request.GET.copy()
+        params.pop("page", None)
+        params["cursor"] = cursor
+        return f"?{params.urlencode()}"
+
+    def get_trending_cards(self):
+        def build():
+            products = Product.objects.filter(is_trending=True, is_published=True).cards()[: self.trending_limit]
+            cards = list(ProductCardSerializer(products, many=True).data)
+            return cards, [card["id"] for card in cards]
+
+        key = ResultPageCache.make_key("trending", {"limit": self.trending_limit})
+        return ResultPageCache.get_or_build(key, build)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["categories"] = Category.objects.filter(is_active=True)
         context["filter_form"] = ProductFilterForm(self.request.GET)
-        context["trending_products"] = Product.objects.filter(
-            is_trending=True, is_published=True
-        )[:8]
+        context["trending_products"] = self.get_trending_cards()
+        page = context["page_obj"]
+        context["next_page_url"] = self._page_url(page.next_cursor) if page.has_next() else None
+        context["previous_page_url"] = self._page_url(page.previous_cursor) if page.has_previous() else None
         return context
 
 
@@ -47,9 +101,10 @@ class ProductDetailView(DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["review_form"] = ReviewForm()
-        context["related_products"] = Product.objects.filter(
+        related_products = Product.objects.filter(
             category=self.object.category, is_published=True
-        ).exclude(id=self.object.id)[:4]
+        ).exclude(id=self.object.id).cards()[:4]
+        context["related_products"] = ProductCardSerializer(related_products, many=True).data
         return context
 
 